@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     bench_classifier.py
+Intro:    Per-line cost of the level classifier against the old split/check_level path
+Author:   Sunic
+
+Usage:    python -m benchmarks.bench_classifier [lines]
+'''
+
+import re
+import sys
+import timeit
+
+from src.level_classifier import LevelClassifier
+from src.level_dict import level_dict
+
+def _old_split_page_num(bookmark):
+    bookmark = bookmark.strip()
+    bookmark_list = re.split(r'([-]?\d*$)', bookmark)
+
+    if len(bookmark_list) > 1:
+        return bookmark_list[0].rstrip(' .-'), int(bookmark_list[1] or 0)
+
+    return bookmark_list[0], 0
+
+def _old_is_in(title, level_exp):
+    return bool(re.match(level_exp, title)) if level_exp else False
+
+def _old_check_level(title, level0_re, level1_re, level2_re, other=0):
+    if _old_is_in(title, level2_re):
+        return 2
+    elif _old_is_in(title, level1_re):
+        return 1
+    elif _old_is_in(title, level0_re):
+        return 0
+    return other
+
+def make_toc(lines):
+    toc = []
+    for i in range(lines):
+        chapter, section, sub = i // 100 + 1, i // 10 % 10 + 1, i % 10 + 1
+        if i % 100 == 0:
+            toc.append('第%d章 Chapter title %d' % (chapter, i + 1))
+        elif i % 10 == 0:
+            toc.append('%d.%d Section title ...... %d' % (chapter, section, i + 1))
+        else:
+            toc.append('%d.%d.%d Subsection title %d' % (chapter, section, sub, i + 1))
+    return toc
+
+def run(lines=20000, repeat=5):
+    toc       = make_toc(lines)
+    level_res = (level_dict['level0']['第1章'], level_dict['level1']['1.1'], level_dict['level2']['1.1.1'])
+
+    def old():
+        for line in toc:
+            title, num = _old_split_page_num(line)
+            _old_check_level(title, *level_res)
+
+    def new():
+        classifier = LevelClassifier(*level_res)
+        for line in toc:
+            classifier.parse(line)
+
+    results = {}
+    for name, func in (('old', old), ('classifier', new)):
+        best          = min(timeit.repeat(func, number=1, repeat=repeat))
+        results[name] = best / lines * 1e9
+        print('%-12s %8.1f ns/line' % (name, results[name]))
+
+    print('speedup      %8.2fx' % (results['old'] / results['classifier']))
+    return results
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
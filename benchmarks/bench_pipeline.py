@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     bench_pipeline.py
+Intro:    Time the parse, tree, open, bookmark and save stages on synthetic files, and compare to a baseline
+Author:   Sunic
+
+Usage:    python -m benchmarks.bench_pipeline [--suite quick|full] [--output results.json]
+                                              [--baseline baseline.json] [--tolerance 0.2]
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import PyPDF4
+
+from benchmarks.synthetic import cached_pdf, make_toc, toc_styles
+from pdf.bookmark import _add_bookmark
+from pdf.pdf import PDF
+from src.bookmark_dict_generator import outline_generator
+from src.level_dict import get_level_res
+
+MB = 1024 * 1024
+
+# pdfs: (pages, image bytes per page), tocs: lines, bookmarks: entries written to each pdf.
+SUITES = {
+    'quick': {'pdfs': [(1, 0), (100, 0), (100, MB // 4)],
+              'tocs': [100, 1000],
+              'bookmarks': 200},
+    'full':  {'pdfs': [(1, 0), (100, 0), (10000, 0), (1, 4 * MB), (100, MB), (10000, 16 * 1024)],
+              'tocs': [100, 1000, 10000, 100000],
+              'bookmarks': 200},
+}
+MODES  = ('default', 'incremental', 'streaming')
+STAGES = ('parse', 'tree', 'open', 'bookmark', 'save')
+
+def _record(results, stage, case, times, **info):
+    record = {'stage': stage, 'case': case, 'best': min(times), 'median': statistics.median(times),
+              'repeat': len(times)}
+    record.update(info)
+    results['%s/%s' % (stage, case)] = record
+    print('%-48s best %10.4fs  median %10.4fs' % ('%s/%s' % (stage, case), record['best'], record['median']))
+
+def _timed(func, *args, **kwargs):
+    start  = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def bench_parse(results, tocs, repeat):
+    for style, examples in toc_styles().items():
+        level_res = get_level_res(examples)
+        for lines in tocs:
+            text  = make_toc(lines, examples)
+            times = [_timed(outline_generator, text, 0, level_res=level_res)[0] for _ in range(repeat)]
+            _record(results, 'parse', '%s/%d' % (style, lines), times, lines=lines)
+
+def bench_tree(results, tocs, repeat):
+    """
+    Fill a TreeWidget without a window and lay it out, skipped if PyQt5 can't start.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication, QTreeView
+        from gui.tree_widget import TreeWidget
+    except ImportError as e:
+        print('[-]: tree stage skipped, %s' % e)
+        return
+
+    app         = QApplication.instance() or QApplication([])
+    widget_type = type('BenchTreeWidget', (QTreeView, TreeWidget), {})
+    level_res   = get_level_res(['第1章', '1.1', '1.1.1'])
+
+    def fill(widget, outline):
+        widget.from_outline(outline)
+        widget.expand_all_items()
+        app.processEvents()
+
+    for lines in tocs:
+        outline = outline_generator(make_toc(lines), 0, level_res=level_res)
+        widget  = widget_type()
+        widget.init_connect()
+        times   = [_timed(fill, widget, outline)[0] for _ in range(repeat)]
+        widget.clear()
+        _record(results, 'tree', str(lines), times, lines=lines)
+
+    app.processEvents()
+
+def bench_write(results, pdfs, bookmarks, work_dir, repeat, modes=MODES):
+    outline = outline_generator(make_toc(bookmarks), 0, level_res=get_level_res(['第1章', '1.1', '1.1.1']))
+    out     = os.path.join(work_dir, 'out.pdf')
+
+    for pages, image_bytes in pdfs:
+        path = cached_pdf(work_dir, pages, image_bytes)
+        size = os.path.getsize(path)
+
+        for mode in modes:
+            case  = '%dp-%dk/%s' % (pages, image_bytes // 1024, mode)
+            times = {'open': [], 'bookmark': [], 'save': []}
+
+            for _ in range(repeat):
+                seconds, pdf = _timed(PDF, path, out, incremental=mode == 'incremental', streaming=mode == 'streaming')
+                times['open'].append(seconds)
+                times['bookmark'].append(_timed(_add_bookmark, pdf, outline)[0])
+                times['save'].append(_timed(pdf.save_pdf)[0])
+                pdf.close()
+                os.remove(out)
+
+            for stage, stage_times in times.items():
+                _record(results, stage, case, stage_times, pages=pages, bytes=size, bookmarks=len(outline))
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare the best times to a baseline.
+        :return: list of (name, baseline best, best, ratio) slower than 1 + tolerance.
+    """
+    slower = []
+    print('\n%-48s %10s %10s %8s' % ('name', 'baseline', 'now', 'ratio'))
+
+    for name, record in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old['best']:
+            continue
+        ratio = record['best'] / old['best']
+        mark  = ' <-' if ratio > 1 + tolerance else ''
+        print('%-48s %10.4f %10.4f %7.2fx%s' % (name, old['best'], record['best'], ratio, mark))
+        if mark:
+            slower.append((name, old['best'], record['best'], ratio))
+
+    return slower
+
+def _meta(suite, repeat):
+    meta = {'suite': suite, 'repeat': repeat, 'python': platform.python_version(), 'platform': platform.platform(),
+            'pypdf4': getattr(PyPDF4, '__version__', ''), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+        meta['pyqt5'], meta['qt'] = PYQT_VERSION_STR, QT_VERSION_STR
+    except ImportError:
+        pass
+    return meta
+
+def run(suite='quick', repeat=3, work_dir=None, stages=STAGES):
+    """
+    Run a suite.
+        :return: dict, {'meta': {...}, 'results': {'stage/case': {'best': seconds, 'median': seconds ...}}}
+    """
+    config   = SUITES[suite]
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'pdfbookmark_bench')
+    os.makedirs(work_dir, exist_ok=True)
+    results  = {}
+
+    if 'parse' in stages:
+        bench_parse(results, config['tocs'], repeat)
+    if 'tree' in stages:
+        bench_tree(results, config['tocs'], repeat)
+    if set(stages) & {'open', 'bookmark', 'save'}:
+        bench_write(results, config['pdfs'], config['bookmarks'], work_dir, repeat)
+
+    results = {name: record for name, record in results.items() if record['stage'] in stages}
+    return {'meta': _meta(suite, repeat), 'results': results}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the stages of adding bookmarks.')
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick', help='quick: small files, full: up to 10k pages')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each case, the best and the median are kept')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated, from: %s' % ','.join(STAGES))
+    parser.add_argument('--work-dir', default=None, help='where the synthetic pdfs are kept between runs')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='compare to the results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='a case slower than baseline * (1 + tolerance) fails')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args   = parse_args(argv)
+    report = run(args.suite, max(args.repeat, 1), args.work_dir, args.stages.split(','))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline:
+            slower = compare(report['results'], json.load(baseline), args.tolerance)
+        if slower:
+            print('[-]: %d cases slower than the baseline.' % len(slower))
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     import_budget.py
+Intro:    Cold start budget of the entry points, measured with python -X importtime
+Author:   Sunic
+
+Usage:    python -m benchmarks.import_budget [--repeat 5] [--scale 1.0] [--output times.json]
+'''
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# {module: (budget in ms, the packages it must not import)}, a one-shot job is mostly import time.
+PARSER_ONLY = ('PyPDF4', 'PyQt5', 'pdf', 'concurrent.futures', 'multiprocessing')
+BUDGETS = {
+    'src.level_dict':              (30,  PARSER_ONLY),
+    'src.bookmark_dict_generator': (45,  PARSER_ONLY),
+    'src.add_bookmark_wrapper':    (50,  PARSER_ONLY),
+    'run':                         (60,  PARSER_ONLY),
+    'src.batch':                   (120, ('PyPDF4', 'PyQt5', 'pdf')),
+    'gui.gui':                     (200, ('PyPDF4', 'pdf', 'webbrowser', 'concurrent.futures')),
+}
+
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+def import_time(module):
+    """
+    Import a module in a fresh interpreter.
+        :return: (cumulative ms of the module, set of all the modules imported)
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                             cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode:
+        raise RuntimeError("import %s failed:\n%s" % (module, process.stderr))
+
+    cumulative = None
+    imported   = set()
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if not match:
+            continue
+        imported.add(match.group(4))
+        if match.group(4) == module:
+            cumulative = int(match.group(2)) / 1000
+    return cumulative, imported
+
+def forbidden(imported, packages):
+    return sorted(name for name in imported if any(name == p or name.startswith(p + '.') for p in packages))
+
+def run(modules=None, repeat=5, scale=1.0):
+    """
+    Measure the modules, the best of repeat runs.
+        :param scale: float, multiplies the budgets, for slower machines.
+        :return: dict, {module: {'best': ms, 'budget': ms, 'forbidden': [module ...]}}
+    """
+    results = {}
+    for module in modules or BUDGETS:
+        budget, packages = BUDGETS[module]
+        times, imported  = [], set()
+        for _ in range(repeat):
+            ms, names = import_time(module)
+            times.append(ms)
+            imported |= names
+        results[module] = {'best': min(times), 'budget': budget * scale, 'forbidden': forbidden(imported, packages)}
+    return results
+
+def report(results):
+    """
+    Print the results.
+        :return: list of the modules over their budget or importing a forbidden package.
+    """
+    failed = []
+    print('%-32s %10s %10s' % ('module', 'best ms', 'budget ms'))
+    for module, record in results.items():
+        over = record['best'] > record['budget'] or record['forbidden']
+        print('%-32s %10.1f %10.1f%s' % (module, record['best'], record['budget'], ' <-' if over else ''))
+        if record['forbidden']:
+            print('    imports %s' % ', '.join(record['forbidden']))
+        if over:
+            failed.append(module)
+    return failed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check the import time of the entry points against their budgets.')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per module, the best time is kept')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the budgets, for slower machines')
+    parser.add_argument('--modules', default=','.join(BUDGETS), help='comma separated, from: %s' % ','.join(BUDGETS))
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args    = parse_args(argv)
+    results = run(args.modules.split(','), max(args.repeat, 1), args.scale)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=1)
+
+    failed = report(results)
+    if failed:
+        print('[-]: %d modules over their import budget.' % len(failed))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     synthetic.py
+Intro:    Generate PDF files and bookmark texts for the benchmarks, the same bytes on every run
+Author:   Sunic
+'''
+
+import os
+import random
+
+from src.level_dict import level_dict
+
+ROMAN    = ((1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+            (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I'))
+CHINESE  = '零一二三四五六七八九'
+
+def to_roman(num):
+    roman = ''
+    for value, letters in ROMAN:
+        while num >= value:
+            roman += letters
+            num   -= value
+    return roman
+
+def to_chinese(num):
+    if num < 10:
+        return CHINESE[num]
+    if num < 100:
+        tens = '十' if num < 20 else CHINESE[num // 10] + '十'
+        return tens + (CHINESE[num % 10] if num % 10 else '')
+    if num < 1000:
+        rest = num % 100
+        return CHINESE[num // 100] + '百' + ('' if not rest else '零' + CHINESE[rest] if rest < 10 else
+                                             CHINESE[rest // 10] + '十' + (CHINESE[rest % 10] if rest % 10 else ''))
+    return to_chinese(num // 1000) + '千' + (to_chinese(num % 1000) if num % 1000 else '')
+
+# the title prefix of each level_dict example, from the numbers of the path, like (2, 3) for '2.3'.
+PREFIX = {
+    '1':           lambda path: '%d' % path[-1],
+    'I':           lambda path: to_roman(path[-1]),
+    '一':          lambda path: to_chinese(path[-1]),
+    '第1章':       lambda path: '第%d章' % path[-1],
+    '第I章':       lambda path: '第%s章' % to_roman(path[-1]),
+    '第一章':      lambda path: '第%s章' % to_chinese(path[-1]),
+    '第1节':       lambda path: '第%d节' % path[-1],
+    '第一节':      lambda path: '第%s节' % to_chinese(path[-1]),
+}
+
+def _prefix(example, path):
+    if example in PREFIX:
+        return PREFIX[example](path)
+    # dotted examples, '1.1' is the last two numbers of the path.
+    depth = example.count('.') + 1
+    return '.'.join('%d' % num for num in path[-depth:])
+
+def toc_styles():
+    """
+    One style for each level0 example of level_dict, with the level1 and level2 examples in turn.
+        :return: dict, {name: [level0 example, level1 example, level2 example]}
+    """
+    level1 = list(level_dict['level1'])
+    level2 = list(level_dict['level2'])
+    return {example: [example, level1[i % len(level1)], level2[-1 - i % len(level2)]]
+            for i, example in enumerate(level_dict['level0'])}
+
+def make_toc(lines, examples=('第1章', '1.1', '1.1.1'), fanout=10, pages_per_line=1):
+    """
+    A bookmark text of the given number of lines, a tree of fanout children per title.
+        :param examples: the level_dict examples of level0, level1, level2 ...
+        :return: str
+    """
+    toc      = []
+    depth    = len(examples)
+    counters = [0] * depth
+
+    for i in range(lines):
+        # like a counter with fanout digits, the line starting a block of fanout is one level up.
+        level, rest = depth - 1, i
+        while level and rest % fanout == 0:
+            level -= 1
+            rest  //= fanout
+
+        counters[level] += 1
+        counters[level + 1:] = [0] * (depth - level - 1)
+        path = [max(num, 1) for num in counters[:level + 1]]
+
+        toc.append('%s Title of line %d ...... %d' % (_prefix(examples[level], path), i + 1, i * pages_per_line + 1))
+
+    return '\n'.join(toc)
+
+def make_pdf(path, pages, image_bytes=0, seed=0):
+    """
+    Write a PDF file with a content stream on every page, and an image of image_bytes on every page if set.
+    The image bytes are random, so they don't compress, like photos in a scanned book.
+        :return: path
+    """
+    rand    = random.Random(seed)
+    offsets = []
+
+    with open(path, 'wb') as pdf:
+        def write_object(body, stream=None):
+            offsets.append(pdf.tell())
+            pdf.write(b'%d 0 obj\n' % len(offsets))
+            if stream is None:
+                pdf.write(body + b'\nendobj\n')
+            else:
+                pdf.write(body % len(stream) + b'\nstream\n' + stream + b'\nendstream\nendobj\n')
+
+        # 1: catalog, 2: page tree, 3: info, then page, content and image of every page.
+        per_page = 3 if image_bytes else 2
+        kids     = b' '.join(b'%d 0 R' % (4 + i * per_page) for i in range(pages))
+
+        pdf.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        write_object(b'<< /Type /Catalog /Pages 2 0 R >>')
+        write_object(b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % pages)
+        write_object(b'<< /Producer (PDFBookmark benchmarks) /Title (Synthetic %d pages) >>' % pages)
+
+        width  = 256
+        height = max(image_bytes // width, 1)
+
+        for i in range(pages):
+            page_id   = 4 + i * per_page
+            resources = b'<< /XObject << /Im0 %d 0 R >> >>' % (page_id + 2) if image_bytes else b'<< >>'
+            write_object(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources ' + resources +
+                         b' /Contents %d 0 R >>' % (page_id + 1))
+
+            content = b'0 0 m 612 792 l S 0 792 m 612 0 l S\n%% page %d\n' % (i + 1)
+            if image_bytes:
+                content += b'q 612 0 0 792 0 0 cm /Im0 Do Q\n'
+            write_object(b'<< /Length %d >>', content)
+
+            if image_bytes:
+                write_object(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+                             b'/ColorSpace /DeviceGray /BitsPerComponent 8 /Length %%d >>' % (width, height),
+                             rand.randbytes(width * height))
+
+        xref = pdf.tell()
+        pdf.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(offsets) + 1))
+        pdf.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+        pdf.write(b'trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(offsets) + 1, xref))
+
+    return path
+
+def cached_pdf(directory, pages, image_bytes=0):
+    """
+    make_pdf into directory, unless the file is there already.
+    """
+    path = os.path.join(directory, 'synthetic_%d_%d.pdf' % (pages, image_bytes))
+    if not os.path.isfile(path):
+        os.makedirs(directory, exist_ok=True)
+        make_pdf(path + '.tmp', pages, image_bytes)
+        os.replace(path + '.tmp', path)
+    return path
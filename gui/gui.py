@@ -5,17 +5,17 @@ The main GUI model of project.
 """
 import os
 import sys
-import webbrowser
+from functools import partial
 
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import QErrorMessage
 
 from gui.main_ui import Ui_PDFBookMark
 from gui.tree_widget import TreeWidget
-from pdf.bookmark import add_bookmark
+from gui.tree_builder import IncrementalTreeBuilder
 from src.level_dict import level_dict
-from src.bookmark_dict_generator import text_to_list, split_page_num, check_level
 from src.level_dict import get_level_re
+from src.parse_cache import get_parse_cache
 
 def dynamic_base_class(instance, cls_name, new_class, **kwargs):
     instance.__class__ = type(cls_name, (new_class, instance.__class__), kwargs)
@@ -56,11 +56,42 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         self.bookmark_tree_widget = dynamic_base_class(self.bookmark_tree_widget, 'TreeWidget', TreeWidget)
         self.bookmark_tree_widget.init_connect(parents=[self, self.bookmark_tree_widget])
         self.add_page_num_box.setMinimum(-1000)
+        self._init_tree_builder()
+        self._init_export_pool()
         self._set_connect()
         self._set_action()
         self._set_level_edit_unwritable()
         self._set_level_re_box_uncheckable()
 
+    def _init_tree_builder(self):
+        # rebuild the tree once typing pauses, and only the lines that changed.
+        self.tree_builder = IncrementalTreeBuilder(self.bookmark_tree_widget, cache=get_parse_cache())
+        self.tree_update_timer = QtCore.QTimer(self)
+        self.tree_update_timer.setSingleShot(True)
+        self.tree_update_timer.setInterval(300)
+        self.tree_update_timer.timeout.connect(self.update_tree_widget)
+
+    def _init_export_pool(self):
+        # exports queue up on one thread, the writer is cpu bound anyway.
+        self.export_pool = QtCore.QThreadPool(self)
+        self.export_pool.setMaxThreadCount(1)
+        self.export_workers = []
+        self._reader_pool   = None
+        self.toc_worker     = None
+
+        self.export_cancel_button = QtWidgets.QPushButton(u'取消')
+        self.export_cancel_button.clicked.connect(self.cancel_exports)
+        self.export_cancel_button.hide()
+        self.statusbar.addPermanentWidget(self.export_cancel_button)
+
+    @property
+    def reader_pool(self):
+        # repeat exports of a file reuse its parsed reader, PyPDF4 is imported on the first one.
+        if self._reader_pool is None:
+            from pdf.reader_pool import get_reader_pool
+            self._reader_pool = get_reader_pool()
+        return self._reader_pool
+
     def _set_connect(self):
         self.open_button.clicked.connect(self.open_pdf_file_dialog)
         self.bookmark_open_button.clicked.connect(self.open_bookmark_file_dialog)
@@ -69,7 +100,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         self.open_bt.clicked.connect(self.expand_tree_widget)
         self.close_bt.clicked.connect(self.collapses_tree_widget)
         self.bookmark_save_bt.clicked.connect(self.save_bookmark)
-        self.bookmark_text_edit.textChanged.connect(self.to_tree_widget)
+        self.bookmark_text_edit.textChanged.connect(self.tree_update_timer.start)
 
         self.level0_box.clicked.connect(self._change_level0_writable)
         self.level1_box.clicked.connect(self._change_level1_writable)
@@ -77,12 +108,19 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
 
         self.add_page_num_to_selected_button.clicked.connect(self._add_selected_page_num)
         self.add_page_num_to_all_button.clicked.connect(self._add_all_page_num)
+        self.bookmark_tree_widget.add_action(u'修改此页及之后', self._add_following_page_num)
 
     def _set_action(self):
         self.home_page_action.triggered.connect(self._open_home_page)
         self.help_action.triggered.connect(self._open_help_page)
         self.english_action.triggered.connect(self.to_english)
         self.chinese_action.triggered.connect(self.to_chinese)
+        self.extract_toc_action = self.menu_2.addAction(u'从PDF提取目录')
+        self.extract_toc_action.triggered.connect(self.extract_toc_from_pdf)
+        self.detect_offset_action = self.menu_2.addAction(u'检测页码偏移')
+        self.detect_offset_action.triggered.connect(self.detect_page_offset)
+        self.merge_action = self.menu_2.addAction(u'保留PDF原有书签')
+        self.merge_action.setCheckable(True)
 
     def _set_level_edit_unwritable(self):
         self.level0_edit.setEnabled(False)
@@ -117,36 +155,50 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         self.level2_edit.setEnabled(True if self.level2_box.isChecked() else False)
         self.level2_re_box.setEnabled(True if self.level2_box.isChecked() else False)
 
-    def _add_page_num_to_item(self, item):
-        current_num = int(item.text(1))
-        add_num = self.add_page_num_box.value()
-        self.bookmark_tree_widget.set_page_num(item, max(current_num + add_num, 0))
+    def _shift_page_num(self, entries):
+        # one change of the model for all entries, the tree keeps it for undo.
+        shift = self.bookmark_tree_widget.shift_pages(entries, self.add_page_num_box.value())
+        if len(shift.entries):
+            self.statusbar.showMessage(u"[+]: %d bookmarks %+d pages, Ctrl+Z to undo" %
+                                       (len(shift.entries), shift.delta), 3000)
 
     def _add_selected_page_num(self):
-        selected_items = self.bookmark_tree_widget.selectedItems()
-        for item in selected_items:
-            self._add_page_num_to_item(item)
+        tree = self.bookmark_tree_widget
+        self._shift_page_num(tree.model().subtree_ids(tree.selected_items()))
+
+    def _add_following_page_num(self):
+        tree  = self.bookmark_tree_widget
+        entry = tree.current_item
+        if entry is not None:
+            self._shift_page_num(tree.model().ids_in_pages(tree.page_num(entry)))
 
     def _add_all_page_num(self):
-        for item in self.bookmark_tree_widget.all_items:
-            self._add_page_num_to_item(item)
+        self._shift_page_num(self.bookmark_tree_widget.all_items)
 
     @staticmethod
     def _open_home_page():
+        import webbrowser
         webbrowser.open('https://github.com/SunicYosen/PDFBookmark', new=1)
 
     @staticmethod
     def _open_help_page():
+        import webbrowser
         webbrowser.open('https://github.com/SunicYosen/PDFBookmark/issues/new', new=1)
 
     def to_english(self):
         self.trans.load("./language/en")
         self.app.installTranslator(self.trans)
         self.retranslateUi(self)
+        self._retranslate_tree()
 
     def to_chinese(self):
         self.app.removeTranslator(self.trans)
         self.retranslateUi(self)
+        self._retranslate_tree()
+
+    def _retranslate_tree(self):
+        # the model gives the column names, translated when asked.
+        self.bookmark_tree_widget.model().headerDataChanged.emit(QtCore.Qt.Horizontal, 0, 1)
 
     def _get_args(self):
         self.pdf_file_path      = self.pdf_path_edit.text()
@@ -162,6 +214,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         self.level0_re      = get_level_re('level0', self.level0_example, is_re=self.level0_is_re)
         self.level1_re      = get_level_re('level1', self.level1_example, is_re=self.level1_is_re)
         self.level2_re      = get_level_re('level2', self.level2_example, is_re=self.level2_is_re)
+        self.level_res      = [self.level0_re, self.level1_re, self.level2_re]
 
     @property
     def pdf_path(self):
@@ -185,9 +238,74 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         else:
             self.statusbar.showMessage(u"[-]: %s Bookmark file doesn't exists" % self.pdf_path, 3000)
 
+    def extract_toc_from_pdf(self):
+        """
+        Fill the bookmark text with the contents pages of the pdf file.
+        """
+        if not os.path.isfile(self.pdf_path):
+            self.statusbar.showMessage(u"[-]: %s file does not exists！" % self.pdf_path, 3000)
+            return
+
+        if self.toc_worker is not None:
+            return
+
+        from gui.worker import TocWorker
+        # the scan runs in a worker thread, its pages in worker processes.
+        self.toc_worker = TocWorker(self.pdf_path)
+        self.toc_worker.signals.finished.connect(self._toc_extracted)
+        self.toc_worker.signals.failed.connect(self._toc_failed)
+        self.extract_toc_action.setEnabled(False)
+        self.statusbar.showMessage(u"[*]: Reading the contents pages of %s" % self.pdf_path)
+        QtCore.QThreadPool.globalInstance().start(self.toc_worker)
+
+    def _toc_done(self):
+        pdf_path        = self.toc_worker.pdf_path
+        self.toc_worker = None
+        self.extract_toc_action.setEnabled(True)
+        return pdf_path
+
+    def _toc_extracted(self, bookmark_text):
+        pdf_path = self._toc_done()
+        if bookmark_text:
+            self.bookmark_text_edit.setPlainText(bookmark_text)
+            self.statusbar.showMessage(u"[+]: %d bookmarks found in %s" % (bookmark_text.count('\n') + 1, pdf_path), 3000)
+        else:
+            self.statusbar.showMessage(u"[-]: %s No contents page found" % pdf_path, 3000)
+
+    def _toc_failed(self, message):
+        self._toc_done()
+        self.statusbar.clearMessage()
+        self.error_message.showMessage(message)
+
+    def detect_page_offset(self):
+        """
+        Set the offset from the page numbers printed on the pages of the pdf file.
+        """
+        if not os.path.isfile(self.pdf_path):
+            self.statusbar.showMessage(u"[-]: %s file does not exists！" % self.pdf_path, 3000)
+            return
+
+        from pdf.page_offset import detect_offset
+        try:
+            guess = detect_offset(self.pdf_path, reader_pool=self.reader_pool)
+        except Exception as e:
+            self.error_message.showMessage(u"[-]: %s: %s" % (type(e).__name__, e))
+            return
+
+        if guess.offset is None:
+            self.statusbar.showMessage(u"[-]: %s No page number found" % self.pdf_path, 3000)
+            return
+
+        # used by the next refresh of the tree and by the export.
+        self.add_page_num_box.setValue(guess.offset)
+        self.statusbar.showMessage(u"[+]: Page offset %d, confidence %d%%" % (guess.offset, guess.confidence * 100), 5000)
+
     def tree_to_dict(self):
         return self.bookmark_tree_widget.tree_to_dict()
 
+    def tree_to_outline(self):
+        return self.bookmark_tree_widget.tree_to_outline()
+
     def refresh_tree_widget(self):
         self.to_tree_widget()
 
@@ -208,48 +326,96 @@ class MainWindow(QtWidgets.QMainWindow, Ui_PDFBookMark, ControlButtonMixin):
         else:
             self.statusbar.showMessage(u"[-]: %s file does not exists！" % filename, 3000)
 
-    def to_tree_widget(self):
-        self.bookmark_tree_widget.clear()
+    def to_tree_widget(self, level_res=None):
+        """
+        level_res: list, the expressions of level0, level1 ... default are the three levels of the window.
+        """
+        self.tree_update_timer.stop()
         self._get_args()
-        bookmark_list = text_to_list(self.bookmark_text)
-
-        last_num = 0
-        level0_parent_item = None
-        level1_parent_item = None
+        self.tree_builder.rebuild(self.bookmark_text, level_res or self.level_res, self.offset)
 
-        for book_mark in bookmark_list:
-            title, num = split_page_num(book_mark)
-            bm_level   = check_level(title, self.level0_re, self.level1_re, self.level2_re)
-            page_num   = num + self.offset
-            page_num   = max(page_num, last_num)
-            last_num   = page_num
-
-            if bm_level == 2:
-                qtree_item = QtWidgets.QTreeWidgetItem([str(title), str(page_num)])
-                level1_parent_item.addChild(qtree_item)
-
-            elif bm_level == 1:
-                qtree_item = QtWidgets.QTreeWidgetItem([str(title), str(page_num)])
-                level0_parent_item.addChild(qtree_item)
-                level1_parent_item = qtree_item
-
-            else:
-                qtree_item = QtWidgets.QTreeWidgetItem([str(title), str(page_num)])
-                self.bookmark_tree_widget.addTopLevelItem(qtree_item)
-                level0_parent_item = qtree_item
+    def update_tree_widget(self):
+        """
+        Patch the tree with the lines changed since the last update.
+        """
+        self._get_args()
+        self.tree_builder.update(self.bookmark_text, self.level_res, self.offset)
 
     def write_tree_to_pdf(self):
         if os.path.isfile(self.pdf_path):
-            try:
-                new_path = self.dict_to_pdf(self.pdf_path, self.tree_to_dict())
-                self.statusbar.showMessage(u"[+]: %s Finished！" % new_path, 3000)
-            except PermissionError:
-                self.error_message.showMessage(u"[-]: Permission denied！")
+            # the bookmarks are checked before any page is copied, a problem is asked about first.
+            self._start_export(self.pdf_path, self.tree_to_outline(), self.merge_action.isChecked(), 'fail')
         else:
             self.statusbar.showMessage(u"[-]: %s PDF file doesn't exists" % self.pdf_path, 3000)
 
+    def _start_export(self, pdf_path, outline, merge, policy):
+        from gui.worker import ExportWorker
+        from src.outline_check import OutlineCheck
+        worker = ExportWorker(pdf_path, outline, reader_pool=self.reader_pool, merge=merge,
+                              validate=OutlineCheck(policy))
+        worker.signals.progress.connect(partial(self._export_progress, worker))
+        worker.signals.finished.connect(partial(self._export_finished, worker))
+        worker.signals.failed.connect(partial(self._export_failed, worker))
+        worker.signals.cancelled.connect(partial(self._export_cancelled, worker))
+        worker.signals.invalid.connect(partial(self._export_invalid, worker))
+
+        self.export_workers.append(worker)
+        self.export_pool.start(worker)
+        self._export_state_changed()
+
+    def cancel_exports(self):
+        for worker in list(self.export_workers):
+            if self.export_pool.tryTake(worker):
+                self.export_workers.remove(worker)
+            else:
+                worker.cancel()
+        self._export_state_changed()
+
+    def _export_state_changed(self):
+        self.export_cancel_button.setVisible(bool(self.export_workers))
+
+    def _export_done(self, worker):
+        if worker in self.export_workers:
+            self.export_workers.remove(worker)
+        self._export_state_changed()
+
+    def _export_progress(self, worker, stage, percent):
+        queued = len(self.export_workers) - 1
+        message = u"[*]: %s %s %d%%" % (os.path.basename(worker.pdf_path), stage, percent)
+        self.statusbar.showMessage(message + (u" (%d queued)" % queued if queued else u""))
+
+    def _export_finished(self, worker, new_path):
+        self._export_done(worker)
+        stages = u", ".join(u"%s %.2fs" % item for item in worker.stage_seconds().items())
+        self.statusbar.showMessage(u"[+]: %s Finished！ (%s)" % (new_path, stages), 5000)
+
+    def _export_invalid(self, worker, issues):
+        # nothing was written, write the bookmarks as they are only if asked to.
+        self._export_done(worker)
+        self.statusbar.clearMessage()
+        listed = u"\n".join(str(issue) for issue in issues[:10])
+        if len(issues) > 10:
+            listed += u"\n... %d more" % (len(issues) - 10)
+        answer = QtWidgets.QMessageBox.question(
+            self, u"PDF Bookmark", u"[-]: %s: %d bookmark issues\n%s\n\nWrite the bookmarks anyway?" %
+            (worker.pdf_path, len(issues), listed))
+        if answer == QtWidgets.QMessageBox.Yes:
+            self._start_export(worker.pdf_path, worker.outline, worker.options['merge'], 'warn')
+        else:
+            self.statusbar.showMessage(u"[-]: %s Not written, %d bookmark issues" % (worker.pdf_path, len(issues)), 5000)
+
+    def _export_failed(self, worker, message):
+        self._export_done(worker)
+        self.statusbar.clearMessage()
+        self.error_message.showMessage(message)
+
+    def _export_cancelled(self, worker):
+        self._export_done(worker)
+        self.statusbar.showMessage(u"[-]: %s Cancelled" % worker.pdf_path, 3000)
+
     @staticmethod
     def dict_to_pdf(pdf_path, index_dict):
+        from pdf.bookmark import add_bookmark
         return add_bookmark(pdf_path, index_dict)
 
 def run():
@@ -259,7 +425,10 @@ def run():
     app.installTranslator(trans)
     window = MainWindow(app, trans)
     window.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    if window._reader_pool is not None:
+        window._reader_pool.close()
+    sys.exit(code)
 
 sys._excepthook = sys.excepthook
 
@@ -114,19 +114,13 @@ class Ui_PDFBookMark(object):
         self.refresh_bt.setObjectName("refresh_bt")
         self.horizontalLayout_2.addWidget(self.refresh_bt)
         self.verticalLayout_2.addLayout(self.horizontalLayout_2)
-        self.bookmark_tree_widget = QtWidgets.QTreeWidget(self.layoutWidget1)
+        self.bookmark_tree_widget = QtWidgets.QTreeView(self.layoutWidget1)
         self.bookmark_tree_widget.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.bookmark_tree_widget.setAcceptDrops(True)
         self.bookmark_tree_widget.setDragDropMode(QtWidgets.QAbstractItemView.DragDrop)
         self.bookmark_tree_widget.setDefaultDropAction(QtCore.Qt.MoveAction)
         self.bookmark_tree_widget.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.bookmark_tree_widget.setObjectName("bookmark_tree_widget")
-        font = QtGui.QFont()
-        font.setFamily("黑体")
-        self.bookmark_tree_widget.headerItem().setFont(0, font)
-        font = QtGui.QFont()
-        font.setFamily("黑体")
-        self.bookmark_tree_widget.headerItem().setFont(1, font)
         self.verticalLayout_2.addWidget(self.bookmark_tree_widget)
         self.layoutWidget2 = QtWidgets.QWidget(self.splitter)
         self.layoutWidget2.setObjectName("layoutWidget2")
@@ -290,8 +284,6 @@ class Ui_PDFBookMark(object):
 "</style></head><body style=\" font-family:\'Microsoft YaHei UI\',\'Microsoft YaHei UI\'; font-size:8pt; font-weight:400; font-style:normal;\">\n"
 "<p style=\"-qt-paragraph-type:empty; margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; -qt-block-indent:0; text-indent:0px; font-family:\'SimSun\';\"><br /></p></body></html>"))
         self.label_3.setText(_translate("PDFBookMark", "书签预览"))
-        self.bookmark_tree_widget.headerItem().setText(0, _translate("PDFBookMark", "目录"))
-        self.bookmark_tree_widget.headerItem().setText(1, _translate("PDFBookMark", "页数"))
         self.label_5.setText(_translate("PDFBookMark", "页数偏移"))
         self.label_6.setText(_translate("PDFBookMark", "目录层次"))
         self.level0_box.setText(_translate("PDFBookMark", "首级"))
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+
+"""
+The bookmark tree as a Qt item model over compact arrays, shown by a QTreeView.
+
+No object is made per entry: the view asks for the rows it shows, and the
+titles, pages and levels are read from the arrays then.
+"""
+
+from array import array
+from collections import namedtuple
+
+from PyQt5.QtCore import QAbstractItemModel, QCoreApplication, QMimeData, QModelIndex, Qt
+
+from src.outline import NO_INDEX, Outline, clamp_page_num
+
+LEVEL_ROLE = Qt.UserRole
+MIME_TYPE  = 'application/x-pdfbookmark-entries'
+TITLE, PAGE = 0, 1
+# made once, the view asks for the flags of every row it lays out.
+ENTRY_FLAGS = Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsDragEnabled | Qt.ItemIsDropEnabled
+# the parents told of a change of pages one by one, more get one layout change.
+MAX_CHANGED_PARENTS = 64
+
+class PageShift(namedtuple('PageShift', 'entries delta clamped')):
+    """
+    What OutlineModel.shift_pages did, the delta and not the pages, so undo costs no copy of the tree.
+        entries: array of the ids shifted.
+        delta  : int, added to each page.
+        clamped: {id: page before} of the entries stopped at the lowest page, delta does not undo them.
+    """
+    __slots__ = ()
+
+
+class OutlineModel(QAbstractItemModel):
+    """
+    An editable outline. Each entry has an id, its slot in the arrays, which never changes;
+    a removed entry keeps its slot until the next reset. The children of each parent are a list
+    of ids and the row of each entry is kept, so index() and parent() cost the same for any size.
+
+    Usage:
+
+    >>> model = OutlineModel()
+    >>> model.set_outline(outline)
+    >>> tree_view.setModel(model)
+    >>> model.set_entry(entry, page_num=12)
+    >>> shift = model.shift_pages(model.subtree_ids(selected), 2)
+    >>> model.undo_shift(shift)
+    >>> model.to_outline()
+
+    The ids of the methods are entry ids, None is the root.
+    """
+    def __init__(self, parent=None):
+        super(OutlineModel, self).__init__(parent)
+        self._clear()
+
+    def _clear(self):
+        self._titles   = []
+        self._pages    = array('i')
+        self._levels   = array('i')
+        self._parents  = array('i')
+        self._rows     = array('i')
+        # {parent id: [child ids]}, NO_INDEX is the root, a leaf has no list.
+        self._children = {NO_INDEX: []}
+
+    # the store.
+    def reset(self, titles=(), page_nums=(), levels=None, parents=None):
+        """
+        Replace all entries, the id of each is its index.
+            :param levels: the levels found by the classifier, LEVEL_ROLE, default 0.
+            :param parents: the parent indexes, NO_INDEX or None for a top level entry, a parent comes first.
+        """
+        self.beginResetModel()
+        self._clear()
+        self._titles  = [str(title) for title in titles]
+        self._pages   = array('i', page_nums)
+        count         = len(self._titles)
+        self._levels  = array('i', levels) if levels is not None else array('i', bytes(4 * count))
+        self._parents = array('i', (NO_INDEX if parent is None else parent for parent in parents)) \
+                        if parents is not None else array('i', [NO_INDEX]) * count
+        self._rows    = array('i', bytes(4 * count))
+
+        children = self._children
+        rows     = self._rows
+        for entry, parent in enumerate(self._parents):
+            siblings = children.get(parent)
+            if siblings is None:
+                siblings = children[parent] = []
+            rows[entry] = len(siblings)
+            siblings.append(entry)
+        self.endResetModel()
+
+    def set_outline(self, outline, levels=None):
+        outline = Outline.from_dict(outline)
+        count   = len(outline)
+        self.reset(outline.titles, (outline.page_num(index) for index in range(count)), levels,
+                   (outline.parent(index) for index in range(count)))
+
+    def new_entry(self, title='', page_num=0, level=0):
+        """
+        Add an entry which is not in the tree yet, see insert_entry.
+            :return: int, the id.
+        """
+        self._titles.append(str(title))
+        self._pages.append(page_num)
+        self._levels.append(level)
+        self._parents.append(NO_INDEX)
+        self._rows.append(-1)
+        return len(self._titles) - 1
+
+    def _renumber(self, parent, start=0):
+        rows     = self._rows
+        siblings = self._children.get(parent, ())
+        for row in range(start, len(siblings)):
+            rows[siblings[row]] = row
+
+    def _attached(self, entry):
+        """
+        True if the entry is in the tree, not under a detached entry. The root is always in the tree.
+        """
+        while entry != NO_INDEX:
+            if self._rows[entry] < 0:
+                return False
+            entry = self._parents[entry]
+        return True
+
+    def insert_entry(self, entry, parent=None, row=None):
+        """
+        Put an entry which is not in the tree, with its children, under parent at row, default the last row.
+        The parent may be a detached entry, then the view hears of it when the parent is inserted.
+        """
+        parent   = NO_INDEX if parent is None else parent
+        siblings = self._children.setdefault(parent, [])
+        row      = len(siblings) if row is None else row
+        visible  = self._attached(parent)
+
+        if visible:
+            self.beginInsertRows(self._index(parent), row, row)
+        siblings.insert(row, entry)
+        self._parents[entry] = parent
+        self._renumber(parent, row)
+        if visible:
+            self.endInsertRows()
+
+    def detach(self, entry):
+        """
+        Take an entry out of the tree, its children stay with it.
+        """
+        parent  = self._parents[entry]
+        row     = self._rows[entry]
+        if row < 0:
+            return
+        visible = self._attached(parent)
+
+        if visible:
+            self.beginRemoveRows(self._index(parent), row, row)
+        del self._children[parent][row]
+        self._parents[entry] = NO_INDEX
+        self._rows[entry]    = -1
+        self._renumber(parent, row)
+        if visible:
+            self.endRemoveRows()
+
+    def remove_entries(self, entries):
+        """
+        Remove entries with their children, one remove per run of rows under a parent.
+        """
+        entries = self.top_entries(entries)
+        runs    = {}
+        for entry in entries:
+            runs.setdefault(self._parents[entry], []).append(self._rows[entry])
+
+        for parent, rows in runs.items():
+            rows.sort(reverse=True)
+            siblings = self._children[parent]
+            while rows:
+                last = first = rows.pop(0)
+                while rows and rows[0] == first - 1:
+                    first = rows.pop(0)
+                self.beginRemoveRows(self._index(parent), first, last)
+                for entry in siblings[first:last + 1]:
+                    self._parents[entry] = NO_INDEX
+                    self._rows[entry]    = -1
+                del siblings[first:last + 1]
+                self._renumber(parent, first)
+                self.endRemoveRows()
+
+    def move_entries(self, entries, parent=None, row=None):
+        """
+        Move entries with their children under parent, before the entry at row, default after the last one.
+        An entry is not moved into itself or its children.
+            :return: bool, True if some entry moved.
+        """
+        parent   = NO_INDEX if parent is None else parent
+        siblings = self._children.setdefault(parent, [])
+        row      = len(siblings) if row is None or row < 0 else row
+        moved    = False
+
+        for entry in self.top_entries(entries):
+            if self.is_ancestor(entry, parent):
+                continue
+            source, source_row = self._parents[entry], self._rows[entry]
+            if source == parent and source_row in (row, row - 1):
+                # already there.
+                row = source_row + 1
+                continue
+            if not self.beginMoveRows(self._index(source), source_row, source_row, self._index(parent), row):
+                continue
+
+            del self._children[source][source_row]
+            self._renumber(source, source_row)
+            if source == parent and source_row < row:
+                row -= 1
+            siblings.insert(row, entry)
+            self._parents[entry] = parent
+            self._renumber(parent, row)
+            self.endMoveRows()
+            row  += 1
+            moved = True
+
+        return moved
+
+    def set_entry(self, entry, title=None, page_num=None, level=None):
+        """
+        Change the title, page number or level of an entry, None keeps it.
+        """
+        if title is not None:
+            self._titles[entry] = str(title)
+        if page_num is not None:
+            self._pages[entry]  = page_num
+        if level is not None:
+            self._levels[entry] = level
+
+        row = self._rows[entry]
+        if row >= 0 and self._attached(self._parents[entry]):
+            self.dataChanged.emit(self.createIndex(row, TITLE, entry), self.createIndex(row, PAGE, entry))
+
+    def shift_pages(self, entries, delta, minimum=0):
+        """
+        Add delta to the pages of entries, a page below minimum becomes minimum.
+        The arrays are changed in one go, the view hears of it once per parent, not once per entry.
+            :return: PageShift, give it to undo_shift.
+        """
+        pages   = self._pages
+        entries = array('i', dict.fromkeys(entries))
+        clamped = {}
+
+        def shift():
+            for entry in entries:
+                page = pages[entry] + delta
+                if page < minimum:
+                    clamped[entry] = pages[entry]
+                    page = minimum
+                pages[entry] = page
+
+        self._change_pages(entries, shift)
+        return PageShift(entries, delta, clamped)
+
+    def undo_shift(self, shift):
+        """
+        Take back a shift_pages, the pages changed since then by other means keep those changes.
+        """
+        pages = self._pages
+
+        def undo():
+            delta = shift.delta
+            for entry in shift.entries:
+                pages[entry] -= delta
+            for entry, page in shift.clamped.items():
+                pages[entry] = page
+
+        self._change_pages(shift.entries, undo)
+
+    def _change_pages(self, entries, change):
+        """
+        Call change(), which writes the pages of entries, and tell the views: a dataChanged for the rows
+        from the first to the last entry under each parent, or a layout change when there are many parents.
+        """
+        rows, parents = self._rows, self._parents
+        spans         = {}
+        for entry in entries:
+            row = rows[entry]
+            if row < 0:
+                continue
+            span = spans.get(parents[entry])
+            if span is None:
+                spans[parents[entry]] = [row, row]
+            elif row < span[0]:
+                span[0] = row
+            elif row > span[1]:
+                span[1] = row
+
+        if len(spans) > MAX_CHANGED_PARENTS:
+            # a view handles thousands of dataChanged slower than laying out the rows again.
+            self.layoutAboutToBeChanged.emit()
+            change()
+            self.layoutChanged.emit()
+            return
+
+        change()
+        roles = [Qt.DisplayRole, Qt.EditRole]
+        for parent, (first, last) in spans.items():
+            if not self._attached(parent):
+                continue
+            siblings = self._children[parent]
+            self.dataChanged.emit(self.createIndex(first, PAGE, siblings[first]),
+                                  self.createIndex(last, PAGE, siblings[last]), roles)
+
+    def title(self, entry):
+        return self._titles[entry]
+
+    def page_num(self, entry):
+        return self._pages[entry]
+
+    def level(self, entry):
+        return self._levels[entry]
+
+    def parent_id(self, entry):
+        parent = self._parents[entry]
+        return None if parent == NO_INDEX else parent
+
+    def row(self, entry):
+        return self._rows[entry]
+
+    def child_count(self, parent=None):
+        return len(self._children.get(NO_INDEX if parent is None else parent, ()))
+
+    def child_ids(self, parent=None):
+        return list(self._children.get(NO_INDEX if parent is None else parent, ()))
+
+    def is_ancestor(self, entry, other):
+        """
+        True if entry is other or one of its ancestors.
+        """
+        while other != NO_INDEX and other is not None:
+            if other == entry:
+                return True
+            other = self._parents[other]
+        return False
+
+    def top_entries(self, entries):
+        """
+        The entries which are in the tree and have no ancestor among them, in document order.
+        """
+        entries = set(entries)
+        paths   = []
+        for entry in entries:
+            if self._rows[entry] < 0:
+                continue
+            path, parent = [self._rows[entry]], self._parents[entry]
+            while parent != NO_INDEX:
+                if parent in entries:
+                    break
+                path.append(self._rows[parent])
+                parent = self._parents[parent]
+            else:
+                paths.append((path[::-1], entry))
+        return [entry for path, entry in sorted(paths)]
+
+    def entry_ids(self, parent=None):
+        """
+        Iterate the ids of the entries under parent, all entries by default, in document order.
+        """
+        children = self._children
+        stack    = list(reversed(children.get(NO_INDEX if parent is None else parent, ())))
+        while stack:
+            entry = stack.pop()
+            yield entry
+            if entry in children:
+                stack.extend(reversed(children[entry]))
+
+    def subtree_ids(self, entries):
+        """
+        Iterate the entries in the tree with all their children, each once, in document order.
+        """
+        for entry in self.top_entries(entries):
+            yield entry
+            for child in self.entry_ids(entry):
+                yield child
+
+    def ids_in_pages(self, first=None, last=None, entries=None):
+        """
+        The ids of entries, all by default, with a page from first to last, None is open ended.
+        """
+        pages = self._pages
+        first = -1 << 31 if first is None else first
+        last  = (1 << 31) - 1 if last is None else last
+        return [entry for entry in (self.entry_ids() if entries is None else entries)
+                if first <= pages[entry] <= last]
+
+    def to_outline(self):
+        outline = Outline()
+        new     = {}
+        for entry in self.entry_ids():
+            parent     = self._parents[entry]
+            new[entry] = outline.append(self._titles[entry], self._pages[entry],
+                                        None if parent == NO_INDEX else new[parent])
+        return outline
+
+    # QModelIndex <-> id.
+    def _index(self, entry, column=TITLE):
+        if entry == NO_INDEX or entry is None:
+            return QModelIndex()
+        return self.createIndex(self._rows[entry], column, entry)
+
+    def index_of(self, entry, column=TITLE):
+        return self._index(entry, column)
+
+    @staticmethod
+    def id_of(index):
+        return index.internalId() if index.isValid() else None
+
+    # QAbstractItemModel.
+    def index(self, row, column, parent=QModelIndex()):
+        siblings = self._children.get(parent.internalId() if parent.isValid() else NO_INDEX)
+        if siblings is None or not 0 <= row < len(siblings) or not 0 <= column < 2:
+            return QModelIndex()
+        return self.createIndex(row, column, siblings[row])
+
+    def parent(self, index=None):
+        if index is None:
+            # QObject.parent()
+            return super(OutlineModel, self).parent()
+        if not index.isValid():
+            return QModelIndex()
+        parent = self._parents[index.internalId()]
+        if parent == NO_INDEX:
+            return QModelIndex()
+        return self.createIndex(self._rows[parent], TITLE, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._children[NO_INDEX])
+        if parent.column() > 0:
+            return 0
+        return len(self._children.get(parent.internalId(), ()))
+
+    def hasChildren(self, parent=QModelIndex()):
+        return self.rowCount(parent) > 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = index.internalId()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if index.column() == TITLE:
+                return self._titles[entry]
+            return str(self._pages[entry]) if role == Qt.DisplayRole else self._pages[entry]
+        if role == LEVEL_ROLE:
+            return self._levels[entry]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        if index.column() == TITLE:
+            self.set_entry(index.internalId(), title=value)
+            return True
+        try:
+            self.set_entry(index.internalId(), page_num=clamp_page_num(int(value)))
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def flags(self, index):
+        return ENTRY_FLAGS if index.isValid() else Qt.ItemIsDropEnabled
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return QCoreApplication.translate("PDFBookMark", "目录" if section == TITLE else "页数")
+        return None
+
+    # drag and drop inside the view, the entries are moved, not copied and removed.
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [MIME_TYPE]
+
+    def mimeData(self, indexes):
+        entries = self.top_entries(index.internalId() for index in indexes if index.isValid())
+        data    = QMimeData()
+        data.setData(MIME_TYPE, ' '.join(map(str, entries)).encode('ascii'))
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(MIME_TYPE):
+            return False
+        entries = [int(entry) for entry in bytes(data.data(MIME_TYPE)).split()]
+        return self.move_entries(entries, self.id_of(parent), row)
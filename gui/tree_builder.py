@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep the bookmark tree in step with the bookmark text, patching only the changed lines.
+"""
+
+from src.level_classifier import LevelClassifier
+from src.parse_cache import parse_text
+
+def _chain(model, entry):
+    """
+    [(level, entry)] of the entry and its ancestors, from the top level down.
+    This is the parser stack right after the entry.
+    """
+    chain = []
+    while entry is not None:
+        chain.append((model.level(entry), entry))
+        entry = model.parent_id(entry)
+    chain.reverse()
+    return chain
+
+
+class IncrementalTreeBuilder(object):
+    """
+    One tree entry per text line, like src.bookmark_dict_generator.outline_generator.
+    The entries are kept in the gui.outline_model.OutlineModel of the tree.
+
+    On update, the common head and tail lines of the old and new text are kept.
+    The changed lines are parsed again, and the lines after them are walked only
+    until the parser state (page number and parent stack) is the same as in the
+    old tree. Only the entries of that window are touched.
+
+    Usage:
+
+    >>> builder = IncrementalTreeBuilder(tree_widget, cache=get_parse_cache())
+    >>> builder.update(text, level_res, pages_offset)
+
+    :param cache: src.parse_cache.ParseCache, used by the full rebuilds.
+    """
+    def __init__(self, tree, cache=None):
+        self.tree = tree
+        self.model = tree.model()
+        self.cache = cache
+        self._patching = False
+        self._reset()
+
+        model = self.model
+        model.modelReset.connect(self._tree_changed)
+        model.rowsInserted.connect(self._tree_changed)
+        model.rowsRemoved.connect(self._tree_changed)
+        model.rowsMoved.connect(self._tree_changed)
+        model.dataChanged.connect(self._tree_changed)
+        model.layoutChanged.connect(self._tree_changed)
+
+    def _reset(self):
+        self._lines      = []
+        self._items      = []
+        self._nums       = []
+        self._pages      = []
+        self._settings   = None
+        self._classifier = None
+
+    def _tree_changed(self, *args):
+        # the user changed the tree, the next update starts from scratch.
+        if not self._patching:
+            self._settings = None
+
+    def rebuild(self, text, level_res=(), pages_offset=0, other=0):
+        """
+        Build the whole tree again.
+        """
+        self._reset()
+        self._settings   = (tuple(level_res), pages_offset, other)
+        self._classifier = LevelClassifier(*level_res, other=other)
+        self._lines      = text.split('\n')
+
+        if self.cache is not None:
+            parsed = self.cache.parse(self._lines, level_res, other)
+        else:
+            parsed = parse_text(self._lines, level_res, other)
+
+        self._nums  = list(parsed.nums)
+        self._pages = list(parsed.page_nums(pages_offset))
+        # the id of each line is its index after a reset.
+        self._items = list(range(len(parsed)))
+
+        self._patching = True
+        try:
+            self.model.reset(parsed.titles, self._pages, parsed.levels, parsed.parents)
+        finally:
+            self._patching = False
+
+    def update(self, text, level_res=(), pages_offset=0, other=0):
+        """
+        Patch the tree with the lines changed since the last update or rebuild.
+        """
+        if (tuple(level_res), pages_offset, other) != self._settings:
+            return self.rebuild(text, level_res, pages_offset, other)
+
+        self._patch(text.split('\n'), pages_offset)
+
+    def _diff(self, lines):
+        old    = self._lines
+        limit  = min(len(old), len(lines))
+        prefix = 0
+        while prefix < limit and old[prefix] == lines[prefix]:
+            prefix += 1
+
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+
+        return prefix, len(old) - prefix - suffix, len(lines) - prefix - suffix
+
+    def _patch(self, lines, pages_offset):
+        start, removed, added = self._diff(lines)
+        if not removed and not added:
+            return
+
+        parsed   = [self._classifier.parse(line) for line in lines[start:start + added]]
+        kept     = self._items[start:start + min(removed, added)]
+        deleted  = self._items[start + added:start + removed]
+        items    = kept + [self.model.new_entry() for _ in range(added - len(kept))]
+
+        page     = self._pages[start - 1] if start else 0
+        stack    = _chain(self.model, self._items[start - 1]) if start else []
+        window   = []
+
+        def place(item, title, num, level):
+            nonlocal page
+            page = max(page, num + pages_offset)
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            window.append((item, title, page, level, stack[-1][1] if stack else None))
+            stack.append((level, item))
+
+        for item, (title, num, level) in zip(items, parsed):
+            place(item, title, num, level)
+
+        # walk the old tail until the parser state is the same as before.
+        old_index = start + removed
+        while old_index < len(self._lines):
+            old_page  = self._pages[old_index - 1] if old_index else 0
+            old_chain = _chain(self.model, self._items[old_index - 1]) if old_index else []
+            if page == old_page and stack == old_chain:
+                break
+            item = self._items[old_index]
+            place(item, None, self._nums[old_index], self.model.level(item))
+            old_index += 1
+
+        self._lines = lines
+        self._items[start:start + removed] = items
+        self._nums[start:start + removed]  = [num for title, num, level in parsed]
+        self._pages[start:start + removed] = [entry[2] for entry in window[:added]]
+        for index, entry in enumerate(window[added:], start=start + added):
+            self._pages[index] = entry[2]
+
+        self._patching = True
+        try:
+            self._apply(start, window, deleted)
+        finally:
+            self._patching = False
+
+    def _apply(self, start, window, deleted):
+        model = self.model
+
+        # an entry keeping its parent keeps its place too, only the ones changing parent are moved.
+        moved = set(item for item, title, page, level, parent in window
+                    if model.row(item) < 0 or model.parent_id(item) != parent)
+
+        for item in deleted:
+            model.detach(item)
+        for item in moved:
+            model.detach(item)
+
+        for index, (item, title, page, level, parent) in enumerate(window, start=start):
+            model.set_entry(item, title, page, level)
+            if item not in moved:
+                continue
+
+            previous = self._items[index - 1] if index else None
+            if previous is None or previous == parent:
+                position = 0
+            else:
+                # the previous sibling is the ancestor of the previous line under the same parent.
+                while model.parent_id(previous) != parent:
+                    previous = model.parent_id(previous)
+                position = model.row(previous) + 1
+
+            model.insert_entry(item, parent, position)
@@ -1,8 +1,12 @@
 
 from functools import partial
 
-from PyQt5.QtWidgets import QTreeWidget, QMenu, QTreeWidgetItemIterator
-from PyQt5.QtCore import pyqtSlot, Qt, QPoint
+from PyQt5.QtWidgets import QAbstractItemView, QMenu
+from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QFont, QKeySequence
+
+from gui.outline_model import OutlineModel
+from src.outline import Outline
 
 class MixinContextMenu(object):
     def __init__(self, parents=None):
@@ -32,13 +36,14 @@ class MixinContextMenu(object):
         self._base_pos = value
 
     def _show_context_menu(self, pos):
-        if self.currentItem():
+        if self.currentIndex().isValid():
             self.context_menu.exec_(self.viewport().mapToGlobal(pos))
 
     def add_action(self, name, handler, menu=None):
         menu = menu or self.context_menu
         action = menu.addAction(name)
         action.triggered.connect(handler)
+        return action
 
     def add_menu(self, name, menu=None):
         menu = menu or self.context_menu
@@ -48,151 +53,113 @@ class MixinContextMenu(object):
         return child_menu
 
 
+# the page shifts kept for undo, each is an array of ids and a delta.
+MAX_PAGE_SHIFTS = 100
+
 class TreeWidget(MixinContextMenu):
+    """
+    The bookmark tree, mixed into a QTreeView showing a gui.outline_model.OutlineModel.
+    The entries are the ids of the model, only the rows on screen are asked for.
+    """
     def init_connect(self, parents=None):
         super(TreeWidget, self).__init__(parents)
-        self.itemPressed.connect(self.close_editor)
-        self.itemDoubleClicked.connect(self.item_double_clicked)
+        self.setModel(OutlineModel(self))
+        # the rows are never measured one by one.
+        self.setUniformRowHeights(True)
+        self.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        font = QFont()
+        font.setFamily("黑体")
+        self.header().setFont(font)
         self.add_action('删除', self.item_remove_current)
-        self.last_item = None
-        self.last_column = None
 
-    # TODO: Fix page num when drop item
+        self.page_shifts = []
+        # the ids of a reset model are other entries, the shifts kept cannot be undone.
+        self.model().modelReset.connect(self.page_shifts.clear)
+        undo_action = self.add_action('撤销修改页码', self.undo_page_shift)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.setShortcutContext(Qt.WidgetShortcut)
+        self.addAction(undo_action)
+
     def dropEvent(self, event):
         """
+        The model moves the entries itself, the view must not remove them after the drop.
         """
-        # self.current_item.setText('')
         super(TreeWidget, self).dropEvent(event)
+        if event.source() is self and event.isAccepted() and event.dropAction() == Qt.MoveAction:
+            event.setDropAction(Qt.CopyAction)
 
     @property
     def current_item(self):
-        return self.currentItem()
+        return self.model().id_of(self.currentIndex())
 
     @property
     def all_items(self):
-        it = QTreeWidgetItemIterator(self)
-        while it.value():
-            yield it.value()
-            it += 1
+        return self.model().entry_ids()
 
-    def _set_all_items(self, items):
-        self.clear()
-        self.addTopLevelItems(items)
+    def selected_items(self):
+        """
+        The ids of the selected entries, in document order.
+        """
+        model = self.model()
+        return model.top_entries(model.id_of(index) for index in self.selectionModel().selectedRows())
 
     def expand_all_items(self):
-        iterator = QTreeWidgetItemIterator(self)
-        while iterator.value():
-            item = iterator.value()
-            item.setExpanded(True)
-            iterator.__iadd__(1)
+        self.expandAll()
 
     def collapses_all_items(self):
-        iterator = QTreeWidgetItemIterator(self)
-        while iterator.value():
-            item = iterator.value()
-            item.setExpanded(False)
-            iterator.__iadd__(1)
-
-    def set_items(self, items):
-        self._set_all_items(items)
-
-    def close_editor(self, *args):
-        if None not in (self.last_item, self.last_column):
-            self.closePersistentEditor(self.last_item, self.last_column)
-
-    def item_clicked(self, item):
-        self.closePersistentEditor(item, self.currentColumn())
-
-    def item_double_clicked(self, item):
-        current_column = self.currentColumn()
-        if self.last_item == item:
-            if self.last_column == current_column:
-                self.closePersistentEditor(item, current_column)
-                return
-            else:
-                self.closePersistentEditor(item, self.last_column)
-
-        self.openPersistentEditor(item, current_column)
-        self.last_item = item
-        self.last_column = current_column
-
-    def remove_item(self, item):
-        parent = item.parent()
-        if parent:
-            parent.removeChild(item)
-        else:
-            self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+        self.collapseAll()
 
-    def item_remove_current(self):
-        selecteds = self.selectedItems()
-        for item in selecteds:
-            self.remove_item(item)
-
-    def children(self, item):
-        child_items = []
-        for i in range(item.childCount()):
-            child_item = item.child(i)
-            if not hasattr(child_item, '__hash__'):
-                child_item.__hash__ = lambda: child_item.id
-            child_items.append((child_item, self.children(child_item)))
-        return child_items
+    def set_items(self, outline):
+        self.model().set_outline(outline)
 
-    def qtree_to_list(self):
-        items = []
+    def clear(self):
+        self.model().reset()
 
-        for top_index in range(self.topLevelItemCount()):
-            item = self.topLevelItem(top_index)
-            items.append((item, self.children(item)))
-
-        return items
+    def item_remove_current(self):
+        self.model().remove_entries(self.model().id_of(index) for index in self.selectionModel().selectedRows())
 
-    def children_to_list(self, children, parent_index):
-        children_list = []
-        counter       = parent_index
+    def tree_to_outline(self):
+        return self.model().to_outline()
 
-        for child in children:
-            counter += 1
-            top_item, children_items = child
-            children_list.append({'title': top_item.text(0), 'page_num': int(top_item.text(1)), 'parent': parent_index})
-            grand_children_list, counter = self.children_to_list(children_items, counter)
-            children_list.extend(grand_children_list)
+    def tree_to_dict(self):
+        return self.tree_to_outline().to_dict()
 
-        return children_list, counter
+    def save_tree_widget_to_file(self, file_ptr):
+        model = self.model()
+        for entry in model.entry_ids():
+            file_ptr.write("%s %d\n" % (model.title(entry), model.page_num(entry)))
 
-    def tree_to_dict(self):
-        qtrees_list = self.qtree_to_list()
-        count = 0
-        bookmark_dict = {}
-        for sub_tree in qtrees_list:
-            level0_item, children_items = sub_tree
-            bookmark_dict[count] = {'title': level0_item.text(0), 'page_num': int(level0_item.text(1))}
+    def page_num(self, entry):
+        return self.model().page_num(entry)
 
-            children_list, counter_temp = self.children_to_list(children_items, count)
+    def set_page_num(self, entry, num):
+        self.model().set_entry(entry, page_num=num)
 
-            for child_item in children_list:
-                count += 1
-                bookmark_dict[count] = child_item
+    def shift_pages(self, entries, delta):
+        """
+        Add delta to the pages of entries as one change of the model, a page stops at 0.
+        The shift is kept for undo_page_shift.
+            :return: gui.outline_model.PageShift
+        """
+        shift = self.model().shift_pages(entries, delta)
+        if len(shift.entries):
+            self.page_shifts.append(shift)
+            del self.page_shifts[:-MAX_PAGE_SHIFTS]
+        return shift
 
-            count += 1
-        return bookmark_dict
+    def undo_page_shift(self):
+        """
+        Undo the last shift_pages.
+            :return: the PageShift undone, None if there is none.
+        """
+        if not self.page_shifts:
+            return None
+        shift = self.page_shifts.pop()
+        self.model().undo_shift(shift)
+        return shift
 
-    def save_tree_widget_to_file(self, file_ptr):
-        iterator = QTreeWidgetItemIterator(self)
-        while iterator.value():
-            item = iterator.value()
-            item_cols = item.columnCount()
-            for i in range(item_cols):
-                text = item.text(i)
-                if i == item_cols - 1:
-                    file_ptr.write(text + '\n')
-                else:
-                    file_ptr.write(text + " ")
-                    
-            iterator.__iadd__(1)
-
-    @staticmethod
-    def set_page_num(item, num):
-        item.setText(1, str(num))
+    def from_outline(self, outline):
+        self.model().set_outline(outline)
 
     def from_dict(self, bookmark_dict):
-        pass
\ No newline at end of file
+        self.from_outline(Outline.from_dict(bookmark_dict))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export bookmarks to a pdf file, or read the contents pages of one, in a worker thread.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from pdf.bookmark import add_bookmark
+from src.metrics import Metrics
+from src.outline_check import OutlineError
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportSignals(QObject):
+    progress  = pyqtSignal(str, int)
+    finished  = pyqtSignal(str)
+    failed    = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    # the src.outline_check.Issue list of a validate 'fail', nothing was copied or written.
+    invalid   = pyqtSignal(object)
+
+
+class ExportWorker(QRunnable):
+    """
+    Write an outline to a pdf file off the main thread.
+    The signals are emitted from the worker thread, and delivered to the slots in the main thread.
+
+    Usage:
+
+    >>> worker = ExportWorker('/home/sun/test.pdf', outline)
+    >>> worker.signals.finished.connect(on_finished)
+    >>> QThreadPool.globalInstance().start(worker)
+    >>> worker.cancel()
+    """
+    def __init__(self, pdf_path, outline, **options):
+        super(ExportWorker, self).__init__()
+        # the window keeps the worker, Qt must not delete it after run().
+        self.setAutoDelete(False)
+        self.pdf_path   = pdf_path
+        self.outline    = outline
+        self.options    = options
+        self.signals    = ExportSignals()
+        self._cancelled = False
+        # the spans and counters of the export, read them once finished.
+        self.events     = []
+        self.options.setdefault('metrics', Metrics(self.events.append))
+
+    def cancel(self):
+        self._cancelled = True
+
+    def stage_seconds(self):
+        """
+        {span name: seconds} of the finished export.
+        """
+        seconds = {}
+        for event in self.events:
+            if event['event'] == 'span':
+                seconds[event['name']] = seconds.get(event['name'], 0) + event['seconds']
+        return seconds
+
+    def _progress(self, stage, done, total):
+        if self._cancelled:
+            raise ExportCancelled()
+        self.signals.progress.emit(stage, int(done * 100 / total) if total else 100)
+
+    def run(self):
+        try:
+            new_path = add_bookmark(self.pdf_path, self.outline, progress=self._progress, **self.options)
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+        except OutlineError as e:
+            self.signals.invalid.emit(e.issues)
+        except PermissionError:
+            self.signals.failed.emit(u"[-]: Permission denied！")
+        except Exception as e:
+            self.signals.failed.emit(u"[-]: %s: %s" % (type(e).__name__, e))
+        else:
+            self.signals.finished.emit(new_path)
+
+
+class TocSignals(QObject):
+    finished = pyqtSignal(str)
+    failed   = pyqtSignal(str)
+
+
+class TocWorker(QRunnable):
+    """
+    Read the bookmark text from the contents pages of a pdf file off the main thread,
+    see pdf.contents.extract_toc_text, the window stays responsive during the scan.
+
+    Usage:
+
+    >>> worker = TocWorker('/home/sun/test.pdf')
+    >>> worker.signals.finished.connect(on_finished)
+    >>> QThreadPool.globalInstance().start(worker)
+    """
+    def __init__(self, pdf_path, **options):
+        super(TocWorker, self).__init__()
+        self.setAutoDelete(False)
+        self.pdf_path = pdf_path
+        self.options  = options
+        self.signals  = TocSignals()
+
+    def run(self):
+        from pdf.contents import extract_toc_text
+        try:
+            bookmark_text = extract_toc_text(self.pdf_path, **self.options)
+        except Exception as e:
+            self.signals.failed.emit(u"[-]: %s: %s" % (type(e).__name__, e))
+        else:
+            self.signals.finished.emit(bookmark_text)
@@ -5,44 +5,131 @@ Add directory bookmarks to the pdf file.
 
 Public:
 
-- function: add_bookmark(path, bookmark_dict)
+- function: add_bookmark(path, bookmark_dict, incremental=False, in_place=False, streaming=False, progress=None,
+                         reader_pool=None, metrics=None, fsync=False, by_label=False, merge=False, use_mmap=False,
+                         output=None, as_bytes=False, validate=None)
 
 """
 
+from src.metrics import get_metrics
+from src.outline import Outline
+from src.outline_check import OutlineCheck
+from .merge import OutlineMerger
 from .pdf import PDF
 
-def _add_bookmark(pdf, bookmark_dict):
+def _page_index(page_labels, outline, bookmark_index, last_index):
+    # the label of the entry, or its page number as a label, an unknown label keeps the page before.
+    label = outline.label(bookmark_index)
+    if label is None and outline.page_num(bookmark_index) > 0:
+        label = str(outline.page_num(bookmark_index))
 
-    if not bookmark_dict:
+    page_index = page_labels.find(label) if label is not None else None
+    return last_index if page_index is None else page_index
+
+def _add_bookmark(pdf, bookmark_dict, progress=None, by_label=False, merger=None):
+
+    outline = Outline.from_dict(bookmark_dict)
+
+    if not outline:
         return None
 
-    bookmark_num = max(bookmark_dict.keys())
+    bookmark_refs = []
+    max_page_num  = pdf.writer.getNumPages() - 1
+    step          = max(len(outline) // 100, 1)
+    page_labels   = pdf.page_labels if by_label else None
+    page_num      = 0
 
-    parent_dict  = {}
-    max_page_num = pdf.writer.getNumPages() - 1
+    for bookmark_index in range(len(outline)):
+        if progress and bookmark_index % step == 0:
+            progress('bookmark', bookmark_index, len(outline))
 
-    for bookmark_index in range(bookmark_num + 1):
-        value        = bookmark_dict[bookmark_index]
-        title        = value.get('title', '')
-        page_num     = min(value.get('page_num', 1) - 1, max_page_num)
-        parent       = parent_dict.get(value.get('parent'))
-        
-        bookmark_ref = pdf.add_bookmark(title    = title,
-                                        page_num = page_num,
-                                        parent   = parent)
+        parent       = outline.parent(bookmark_index)
+        if page_labels is not None:
+            page_num = _page_index(page_labels, outline, bookmark_index, page_num)
+        else:
+            page_num = min(outline.page_num(bookmark_index) - 1, max_page_num)
 
-        parent_dict[bookmark_index] = bookmark_ref
+        parent_ref   = None if parent is None else bookmark_refs[parent]
+        if merger is not None:
+            bookmark_ref = merger.add(outline.title(bookmark_index), page_num, parent_ref)
+        else:
+            bookmark_ref = pdf.add_bookmark(title    = outline.title(bookmark_index),
+                                            page_num = page_num,
+                                            parent   = parent_ref)
 
+        bookmark_refs.append(bookmark_ref)
 
-def add_bookmark(pdf_path, bookmark_dict):
+
+def add_bookmark(pdf_path, bookmark_dict, incremental=False, in_place=False, streaming=False, progress=None,
+                 reader_pool=None, metrics=None, fsync=False, by_label=False, merge=False, use_mmap=False,
+                 output=None, as_bytes=False, validate=None):
     """
     Add directory bookmarks to the pdf file.
-        :param pdf_path: pdf file path.
-        :param bookmark_dict: bookmarks dict, like {0:{'title':'A', 'page_num':1}, 1:{'title':'B', page_num:2, parent: 0} ......}
+        :param pdf_path: pdf file path, or the pdf as bytes or a readable binary stream, like sys.stdin.buffer.
+        :param bookmark_dict: src.outline.Outline, or bookmarks dict, like {0:{'title':'A', 'page_num':1}, 1:{'title':'B', page_num:2, parent: 0} ......}
+        :param incremental: bool, append only the outlines to the file instead of rewriting all pages.
+        :param in_place: bool, with incremental, update the original file instead of 'name_new.pdf'.
+        :param streaming: bool, copy the objects one by one, the memory does not grow with the pages.
+        :param progress: callable(stage, done, total), stage is 'open', 'bookmark' or 'save'.
+                         It may raise to cancel, then no partial output is left.
+        :param reader_pool: pdf.reader_pool.ReaderPool, reuse the parsed file across calls.
+        :param metrics: src.metrics.Metrics or callable(event), gets the time of each stage and the counters.
+        :param fsync: bool, flush the new file to the disk before returning.
+        :param by_label: bool, the page numbers and labels of the bookmarks are the printed page labels of
+                         the file, like 'xii' or '42', instead of page numbers with an offset.
+        :param merge: bool, keep the bookmarks of the file, and write only the new and moved ones,
+                      see pdf.merge. It is an incremental update unless streaming.
+        :param use_mmap: bool, read a memory map of the file, reader_pool is not used then.
+        :param output: str, the path of the new file instead of 'name_new.pdf', or a writable binary stream,
+                       like sys.stdout.buffer. A pdf read from a stream needs an output or as_bytes.
+        :param as_bytes: bool, return the new file as bytes, no file is written.
+        :param validate: 'fail', 'warn' or 'fix', or a src.outline_check.OutlineCheck. The outline is checked
+                         against the pages of the file before they are copied, see src.outline_check.
+                         With by_label the pages are not checked.
+        :return: the path of the new file, the output stream, or the bytes.
     """
-
-    pdf = PDF(pdf_path)
-    _add_bookmark(pdf, bookmark_dict)
-
-    return pdf.save_pdf()
+    metrics = get_metrics(metrics)
+
+    if merge and not streaming:
+        incremental = True
+
+    if progress:
+        progress('open', 0, 1)
+
+    path_new = output if isinstance(output, str) else None
+    if path_new is not None:
+        output = None
+
+    check   = None
+    outline = Outline.from_dict(bookmark_dict)
+    if validate is not None:
+        if isinstance(validate, str):
+            validate = OutlineCheck(validate)
+
+        def check(num_pages):
+            nonlocal outline
+            with metrics.span('validate', entries=len(outline)):
+                outline = validate(outline, None if by_label else num_pages)
+            metrics.count('outline_issues', len(validate.issues))
+
+    with PDF(pdf_path, path_new, incremental=incremental, streaming=streaming, reader_pool=reader_pool,
+             metrics=metrics, use_mmap=use_mmap, check=check) as pdf:
+        if progress:
+            progress('open', 1, 1)
+
+        with metrics.span('outline_build', entries=len(outline)):
+            merger = OutlineMerger(pdf.writer) if merge else None
+            _add_bookmark(pdf, outline, progress, by_label, merger)
+
+        if merger is not None:
+            metrics.count('bookmarks_kept', merger.kept)
+            metrics.count('bookmarks_updated', merger.updated)
+            metrics.count('bookmarks_added', merger.added)
+
+        if as_bytes:
+            new_pdf = pdf.save_bytes(progress=progress)
+        else:
+            new_pdf = pdf.save_pdf(in_place=in_place, progress=progress, fsync=fsync, output=output)
+        metrics.flush(pdf=pdf.name, output=new_pdf if isinstance(new_pdf, str) else None)
+        return new_pdf
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Find the printed contents pages of a pdf file, and read the bookmark lines from them.
+
+The early pages are scanned in parallel, a few at a time, and the scan
+stops at the first page after the contents which is not a contents page.
+The lines are 'title page_num', ready for src.bookmark_dict_generator.
+
+public:
+- function: extract_toc(path, first_page=0, max_pages=40, workers=None)
+- function: extract_toc_text(path, **kwargs)
+"""
+
+import os
+import re
+
+from PyPDF4 import PdfFileReader
+
+from .source import open_source
+from .text_lines import page_lines
+
+CONTENTS_HEADING_RE = re.compile(r'^\s*(目\s*录|目\s*次|table\s+of\s+contents|contents)\s*$', re.I)
+# a title, then leaders or spaces, then the page number, so 'Chapter 1 ..... 5' is title 'Chapter 1'.
+# a page glued to the title needs a title ending in no digit, '1.1' is not a page.
+TOC_LINE_RE         = re.compile(r'^(?=.*\d$)(?P<title>.*?\S)(?:\s*(?:[.…·．_]\s*){2,}|\s+[.…·．_]?\s*|(?<=[^\d\s.…·．_]))'
+                                 r'(?P<page>\d{1,4})$')
+LEADERS_RE          = re.compile(r'\s*[.…·．_]{2,}\s*|\s{2,}')
+
+MIN_ENTRIES = 4
+MIN_RATIO   = 0.4
+
+def toc_entries(lines):
+    """
+    The bookmark lines of a page, and whether it looks like a contents page.
+    A title wrapped over lines is joined to the line with its page number.
+        :return: (list of 'title page_num', bool)
+    """
+    entries = []
+    pending = []
+    heading = False
+    total   = 0
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if CONTENTS_HEADING_RE.match(line):
+            heading = True
+            continue
+
+        total += 1
+        match  = TOC_LINE_RE.match(line)
+        if match:
+            title = LEADERS_RE.sub(' ', ' '.join(pending + [match.group('title')])).strip()
+            entries.append('%s %s' % (title, match.group('page')))
+            pending = []
+        else:
+            # at most two wrapped lines, longer text is not a title.
+            pending = (pending + [line])[-2:]
+
+    enough = len(entries) >= (2 if heading else MIN_ENTRIES)
+    return entries, enough and len(entries) >= total * MIN_RATIO
+
+
+def _scan_page(reader, index):
+    try:
+        return toc_entries(page_lines(reader.getPage(index)))
+    except Exception:
+        # a broken content stream is not a contents page.
+        return [], False
+
+# the reader of a worker process.
+_reader = None
+
+def _open_reader(path):
+    global _reader
+    _reader = PdfFileReader(open(path, 'rb'), strict=False)
+
+def _scan_worker_page(index):
+    return _scan_page(_reader, index)
+
+def _scan(path, indexes, workers):
+    """
+    Yield the scan of the pages in order, workers pages at a time.
+    """
+    if workers <= 1:
+        with open_source(path) as stream:
+            reader = PdfFileReader(stream, strict=False)
+            for index in indexes:
+                yield _scan_page(reader, index)
+        return
+
+    # the process pool, and multiprocessing with it, only for a parallel scan.
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_reader, initargs=(path,)) as pool:
+        for start in range(0, len(indexes), workers):
+            futures = [pool.submit(_scan_worker_page, index) for index in indexes[start:start + workers]]
+            for future in futures:
+                yield future.result()
+
+def extract_toc(path, first_page=0, max_pages=40, workers=None):
+    """
+    Read the bookmark lines from the contents pages of a pdf file.
+        :param path: str, or a seekable binary stream of the pdf, which is scanned in this process.
+        :param first_page: int, the index of the first page scanned.
+        :param max_pages: int, the most pages scanned, the contents are near the front.
+        :param workers: int, the pages scanned at once in worker processes, 1 scans in this process.
+                        Default is the cpu count, at most 8.
+        :return: list of 'title page_num', empty if no contents page is found.
+    """
+    with open_source(path) as stream:
+        num_pages = PdfFileReader(stream, strict=False).getNumPages()
+    if not isinstance(path, str):
+        workers = 1
+
+    indexes   = list(range(first_page, min(first_page + max_pages, num_pages)))
+    workers   = workers or min(os.cpu_count() or 1, 8)
+    toc       = []
+
+    scan = _scan(path, indexes, min(workers, len(indexes)))
+    try:
+        for entries, is_contents in scan:
+            if is_contents:
+                toc.extend(entries)
+            elif toc:
+                # the contents ended.
+                break
+    finally:
+        scan.close()
+
+    return toc
+
+def extract_toc_text(path, **kwargs):
+    """
+    extract_toc as a bookmark text, the arguments are the same.
+    """
+    return '\n'.join(extract_toc(path, **kwargs))
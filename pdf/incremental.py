@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+"""
+Incremental update writer for an exist pdf file.
+
+Instead of re-serializing every page, only the new outline objects, an
+updated catalog, a new xref section and a new trailer are appended after
+the original bytes (PDF 32000-1:2008, 7.5.6 Incremental Updates).
+The write time depends on the number of bookmarks, not on the size of the file.
+
+public:
+- class: IncrementalWriter(reader, page_refs=None)
+"""
+
+import struct
+
+from PyPDF4 import utils
+from PyPDF4.generic import (ArrayObject, DictionaryObject, FloatObject, IndirectObject,
+                            NameObject, NullObject, NumberObject, StreamObject, TreeObject,
+                            createStringObject)
+
+from .page_tree import page_references
+
+def find_startxref(stream):
+    """
+    Find the offset of the last cross-reference section of a pdf stream.
+        :return: (offset, is_xref_stream)
+    """
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(max(size - 1024, 0), 0)
+    tail = stream.read()
+
+    pos = tail.rfind(b'startxref')
+    if pos < 0:
+        raise utils.PdfReadError("startxref not found")
+
+    startxref = int(tail[pos + 9:].split()[0])
+
+    stream.seek(startxref, 0)
+    is_xref_stream = not stream.read(16).lstrip().startswith(b'xref')
+
+    return startxref, is_xref_stream
+
+
+class IncrementalWriter(object):
+    """
+    A writer with the bookmark api of PdfFileWriter, which only keeps the new objects.
+
+    Usage:
+
+    >>> writer = IncrementalWriter(reader)
+    >>> b0 = writer.addBookmark('First bookmark', 0)
+    >>> writer.addBookmark('Child bookmark', 1, parent=b0)
+
+    # the stream must contain the original bytes and be positioned at its end.
+    >>> writer.write(stream)
+
+    Objects of the original file can be updated too, adopt() copies one, and the
+    copy is written with the original object number, see pdf.merge.
+
+    page_refs: list of IndirectObject, the pages of the reader if they are known already.
+    """
+    def __init__(self, reader, page_refs=None):
+        if reader.isEncrypted:
+            raise utils.PdfReadError("Incremental update of an encrypted pdf is not supported")
+
+        self.reader    = reader
+        self._objects  = {}
+        # the generations of the adopted objects of the reader, the new objects are generation 0.
+        self._adopted  = {}
+        self._next_id  = self._max_idnum(reader) + 1
+        self._pages    = page_refs
+        self._outlines = None
+
+        self.objects_written = 0
+
+        self._root        = reader.trailer.raw_get('/Root')
+        self._root_object = DictionaryObject(reader.trailer['/Root'])
+
+    @staticmethod
+    def _max_idnum(reader):
+        idnums = [int(reader.trailer.get('/Size', 1)) - 1]
+        idnums.extend(max(xref) for xref in reader.xref.values() if xref)
+        if reader.xref_objStm:
+            idnums.append(max(reader.xref_objStm))
+        return max(idnums)
+
+    def _addObject(self, obj):
+        ref = IndirectObject(self._next_id, 0, self)
+        self._objects[self._next_id] = obj
+        self._next_id += 1
+        return ref
+
+    def adopt(self, ref):
+        """
+        Copy an object of the reader to change it, the copy replaces the original when written.
+            :param ref: IndirectObject of the reader.
+            :return: IndirectObject of this writer, with the original object number.
+        """
+        if ref.idnum not in self._objects:
+            original = self.reader.getObject(IndirectObject(ref.idnum, ref.generation, self.reader))
+            self._objects[ref.idnum] = DictionaryObject(original)
+            self._adopted[ref.idnum] = ref.generation
+        return IndirectObject(ref.idnum, self._adopted.get(ref.idnum, 0), self)
+
+    def _writable(self, ref):
+        return ref if ref.pdf is self else self.adopt(ref)
+
+    def getObject(self, ido):
+        if ido.pdf != self:
+            raise ValueError("pdf must be self")
+        return self._objects[ido.idnum]
+
+    @property
+    def page_refs(self):
+        if self._pages is None:
+            self._pages = page_references(self.reader)
+        return self._pages
+
+    def getNumPages(self):
+        return len(self.page_refs)
+
+    def getOutlineRoot(self):
+        if self._outlines is None:
+            self._outlines = self._addObject(TreeObject())
+            self._root_object[NameObject('/Outlines')] = self._outlines
+        return self._outlines
+
+    def adopt_outline_root(self):
+        """
+        Add the new bookmarks to the outline of the file, instead of replacing it.
+        """
+        outlines = self._root_object.raw_get('/Outlines') if '/Outlines' in self._root_object else None
+        if self._outlines is None and isinstance(outlines, IndirectObject):
+            self._outlines = self.adopt(outlines)
+        return self.getOutlineRoot()
+
+    def _insert_child(self, parent_ref, child_ref, after_ref=None):
+        """
+        Link a child after the sibling after_ref, or first when after_ref is None.
+        The siblings and the parent are adopted when they are objects of the reader.
+        """
+        parent_ref = self._writable(parent_ref)
+        parent     = self.getObject(parent_ref)
+        child      = self.getObject(child_ref)
+
+        if after_ref is None:
+            next_ref = parent.raw_get('/First') if '/First' in parent else None
+            parent[NameObject('/First')] = child_ref
+        else:
+            after_ref = self._writable(after_ref)
+            after     = self.getObject(after_ref)
+            next_ref  = after.raw_get('/Next') if '/Next' in after else None
+            after[NameObject('/Next')] = child_ref
+            child[NameObject('/Prev')] = after_ref
+
+        if next_ref is None:
+            parent[NameObject('/Last')] = child_ref
+        else:
+            next_ref = self._writable(next_ref)
+            self.getObject(next_ref)[NameObject('/Prev')] = child_ref
+            child[NameObject('/Next')] = next_ref
+
+        # a negative count is a closed item, it stays closed.
+        count = parent.get('/Count', 0)
+        parent[NameObject('/Count')] = NumberObject(count - 1 if count < 0 else count + 1)
+        child[NameObject('/Parent')] = parent_ref
+
+    def _add_child(self, parent_ref, child_ref):
+        parent = self.getObject(self._writable(parent_ref))
+        self._insert_child(parent_ref, child_ref, parent.raw_get('/Last') if '/Last' in parent else None)
+
+    def _goto(self, pagenum, fit='/Fit', *args):
+        dest = ArrayObject([self.page_refs[pagenum], NameObject(fit)])
+        dest.extend(NumberObject(a) if a is not None else NullObject() for a in args)
+
+        action = DictionaryObject()
+        action.update({
+            NameObject('/D'): dest,
+            NameObject('/S'): NameObject('/GoTo')
+        })
+        return self._addObject(action)
+
+    def update_bookmark(self, ref, pagenum, fit='/Fit', *args):
+        """
+        Point a bookmark, of the reader or new, to another page.
+            :return: IndirectObject of this writer.
+        """
+        ref      = self._writable(ref)
+        bookmark = self.getObject(ref)
+        bookmark[NameObject('/A')] = self._goto(pagenum, fit, *args)
+        bookmark.pop(NameObject('/Dest'), None)
+        return ref
+
+    def insert_bookmark(self, title, pagenum, parent=None, after=None, fit='/Fit'):
+        """
+        Like addBookmark, linked after the sibling after, or first when after is None.
+        """
+        bookmark_ref = self._new_bookmark(title, pagenum, fit=fit)
+        self._insert_child(parent or self.getOutlineRoot(), bookmark_ref, after)
+        return bookmark_ref
+
+    def addBookmark(self, title, pagenum, parent=None, color=None, bold=False, italic=False, fit='/Fit', *args):
+        """
+        Same as PdfFileWriter.addBookmark, the page refers to the original page object.
+        """
+        bookmark_ref = self._new_bookmark(title, pagenum, color, bold, italic, fit, *args)
+        self._add_child(parent or self.getOutlineRoot(), bookmark_ref)
+
+        return bookmark_ref
+
+    def _new_bookmark(self, title, pagenum, color=None, bold=False, italic=False, fit='/Fit', *args):
+        bookmark = TreeObject()
+        bookmark.update({
+            NameObject('/A'): self._goto(pagenum, fit, *args),
+            NameObject('/Title'): createStringObject(title),
+        })
+
+        if color is not None:
+            bookmark[NameObject('/C')] = ArrayObject([FloatObject(c) for c in color])
+
+        format = (1 if italic else 0) + (2 if bold else 0)
+        if format:
+            bookmark[NameObject('/F')] = NumberObject(format)
+
+        return self._addObject(bookmark)
+
+    def _write_object(self, stream, idnum, generation, obj):
+        stream.write(b'%d %d obj\n' % (idnum, generation))
+        obj.writeToStream(stream, None)
+        stream.write(b'\nendobj\n')
+
+    def _trailer(self, prev=None):
+        trailer = DictionaryObject()
+        trailer.update({
+            NameObject('/Size'): NumberObject(self._next_id),
+            NameObject('/Root'): self._root,
+        })
+        if prev is not None:
+            trailer[NameObject('/Prev')] = NumberObject(prev)
+        for key in ('/Info', '/ID'):
+            if key in self.reader.trailer:
+                trailer[NameObject(key)] = self.reader.trailer.raw_get(key)
+        return trailer
+
+    @staticmethod
+    def _subsections(entries):
+        """
+        Group sorted (idnum, generation, offset) entries into contiguous runs.
+        """
+        sections = []
+        for entry in entries:
+            if sections and sections[-1][-1][0] + 1 == entry[0]:
+                sections[-1].append(entry)
+            else:
+                sections.append([entry])
+        return sections
+
+    def _write_xref_table(self, stream, entries, prev=None):
+        xref_location = stream.tell()
+        # the free entry 0 keeps readers from treating the table as not zero-indexed.
+        stream.write(b'xref\n0 1\n0000000000 65535 f \n')
+        for section in self._subsections(entries):
+            stream.write(b'%d %d\n' % (section[0][0], len(section)))
+            for idnum, generation, offset in section:
+                stream.write(b'%010d %05d n \n' % (offset, generation))
+
+        stream.write(b'trailer\n')
+        self._trailer(prev).writeToStream(stream, None)
+        return xref_location
+
+    def _write_xref_stream(self, stream, entries, prev):
+        xref_location = stream.tell()
+        xref_idnum    = self._next_id
+        self._next_id += 1
+        entries       = entries + [(xref_idnum, 0, xref_location)]
+
+        index = ArrayObject()
+        for section in self._subsections(entries):
+            index.extend([NumberObject(section[0][0]), NumberObject(len(section))])
+
+        xref = StreamObject()
+        xref.update(self._trailer(prev))
+        xref.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(8), NumberObject(2)]),
+            NameObject('/Index'): index,
+        })
+        xref._data = b''.join(struct.pack('>BQH', 1, offset, generation)
+                              for idnum, generation, offset in entries)
+
+        self._write_object(stream, xref_idnum, 0, xref)
+        return xref_location
+
+    def _write_objects(self, stream, entries):
+        for idnum, obj in self._objects.items():
+            generation = self._adopted.get(idnum, 0)
+            entries.append((idnum, generation, stream.tell()))
+            self._write_object(stream, idnum, generation, obj)
+
+    def write(self, stream):
+        """
+        Append the update section to a stream holding the original pdf bytes.
+        The stream must support write and tell, and be positioned at the end of the original bytes.
+        """
+        prev, is_xref_stream = find_startxref(self.reader.stream)
+
+        stream.write(b'\n')
+        entries = [(self._root.idnum, self._root.generation, stream.tell())]
+        self._write_object(stream, self._root.idnum, self._root.generation, self._root_object)
+
+        self._write_objects(stream, entries)
+
+        entries.sort()
+        self.objects_written = len(entries)
+        if is_xref_stream:
+            xref_location = self._write_xref_stream(stream, entries, prev)
+        else:
+            xref_location = self._write_xref_table(stream, entries, prev)
+
+        stream.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref_location)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Merge new bookmarks into the outline a pdf file has already.
+
+The outline of the file is read once and indexed by (title, page, parent). Then each
+new bookmark, in order, is either:
+- kept, an item of the file has the same title and page under the same parent,
+  nothing is written;
+- updated, an item of the file has the same title under the same parent on
+  another page, only its destination is written;
+- added, and linked among its siblings in page order, also when the file has
+  it under another parent.
+The items of the file which are not among the new bookmarks stay as they are.
+
+public:
+- class: OutlineMerger(writer)
+"""
+
+from .outline_reader import ROOT, walk_outline
+
+class OutlineMerger(object):
+    """
+    Reconcile the outline of the file with the new bookmarks, in one pass over them.
+
+    Usage:
+
+    >>> merger = OutlineMerger(IncrementalWriter(reader))
+    >>> chapter = merger.add('Chapter 1', 0)
+    >>> merger.add('1.1 Section', 1, parent=chapter)
+    >>> merger.kept, merger.updated, merger.added
+    (1, 0, 1)
+
+    :param writer: pdf.incremental.IncrementalWriter or pdf.streaming.StreamingWriter.
+    """
+    def __init__(self, writer):
+        self.writer   = writer
+        self.kept     = 0
+        self.updated  = 0
+        self.added    = 0
+
+        self._exact    = {}             # {(title, page, parent idnum): [idnum ...]}, the items not merged yet.
+        self._titles   = {}             # {(title, parent idnum): [idnum ...]}, the same items by title.
+        self._refs     = {}             # {idnum: IndirectObject}, of the reader or the writer.
+        self._pages    = {}             # {idnum: page index}
+        self._parents  = {}             # {idnum: parent idnum}, ROOT at the top level.
+        self._children = {ROOT: []}     # {parent idnum: [idnum ...]}, in sibling order.
+
+        self._read()
+
+    def _read(self):
+        for ref, node, parent, depth, title, page in walk_outline(self.writer.reader, self.writer.page_refs):
+            self._refs[ref.idnum]  = ref
+            self._pages[ref.idnum]   = page
+            self._parents[ref.idnum] = parent
+            self._children.setdefault(parent, []).append(ref.idnum)
+            self._exact.setdefault((title, page, parent), []).append(ref.idnum)
+            self._titles.setdefault((title, parent), []).append(ref.idnum)
+
+    def _take(self, idnum, title):
+        parent = self._parents[idnum]
+        self._exact[(title, self._pages[idnum], parent)].remove(idnum)
+        self._titles[(title, parent)].remove(idnum)
+
+    def add(self, title, page_num, parent=None):
+        """
+        Merge a bookmark, after its parent.
+            :param page_num: int, the page index.
+            :param parent: what add returned for the parent, None for a top level bookmark.
+            :return: IndirectObject, the parent of the children of this bookmark.
+        """
+        key       = title.strip()
+        # a bookmark under another parent than in the file is a new one there.
+        parent_id = ROOT if parent is None else parent.idnum
+
+        same = self._exact.get((key, page_num, parent_id))
+        if same:
+            idnum = same[0]
+            self._take(idnum, key)
+            self.kept += 1
+            return self._refs[idnum]
+
+        moved = self._titles.get((key, parent_id))
+        if moved:
+            idnum = moved[0]
+            self._take(idnum, key)
+            self._refs[idnum]  = self.writer.update_bookmark(self._refs[idnum], page_num)
+            self._pages[idnum] = page_num
+            self.updated += 1
+            return self._refs[idnum]
+
+        # after the last sibling on this page or before it.
+        siblings = self._children.setdefault(parent_id, [])
+        position = len(siblings)
+        while position and (self._pages[siblings[position - 1]] is None or
+                            self._pages[siblings[position - 1]] > page_num):
+            position -= 1
+
+        after = self._refs[siblings[position - 1]] if position else None
+        ref   = self.writer.insert_bookmark(title, page_num, parent or self.writer.adopt_outline_root(), after)
+
+        siblings.insert(position, ref.idnum)
+        self._refs[ref.idnum]    = ref
+        self._pages[ref.idnum]   = page_num
+        self._parents[ref.idnum] = parent_id
+        self.added += 1
+        return ref
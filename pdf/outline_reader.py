@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read the outline a pdf file has, without PyPDF4's getOutlines.
+
+The items are walked in document order with a stack instead of recursion,
+and the page of each destination is looked up in a map from the page
+objects to their indexes, made once from the page tree, instead of
+getDestinationPageNumber scanning all pages for each item.
+
+public:
+- function: walk_outline(reader, page_refs=None)
+- function: outline_from_reader(reader, page_refs=None)
+- function: read_outline(source)
+"""
+
+from PyPDF4 import PdfFileReader
+from PyPDF4.generic import ArrayObject, IndirectObject, NumberObject
+
+from src.outline import Outline
+from .page_tree import page_references
+from .source import open_source
+
+ROOT = None
+
+def destination_page(node, page_index, named_destinations):
+    """
+    The page index of an outline item, None if it has no page of this file.
+        :param page_index: dict, {idnum of a page object: page index}.
+        :param named_destinations: callable(), the named destinations of the file, only called for a named one.
+    """
+    dest = node.get('/Dest')
+    if dest is None:
+        action = node.get('/A')
+        if action is not None and action.getObject().get('/S') == '/GoTo':
+            dest = action.getObject().get('/D')
+    if dest is None:
+        return None
+
+    dest = dest.getObject()
+    if not isinstance(dest, ArrayObject):
+        named = named_destinations().get(str(dest))
+        page  = named.raw_get('/Page') if named is not None else None
+    else:
+        page  = dest[0] if dest else None
+
+    if isinstance(page, IndirectObject):
+        return page_index.get(page.idnum)
+    if isinstance(page, NumberObject):
+        return int(page)
+    return None
+
+def walk_outline(reader, page_refs=None):
+    """
+    Yield the outline items of a file in document order, a parent before its children.
+        :param page_refs: list of IndirectObject, the pages, if they are known already.
+        :return: iterator of (ref, node, parent idnum or ROOT, depth, title, page index or None)
+    """
+    root = reader.trailer['/Root'].getObject().get('/Outlines')
+    if root is None:
+        return
+    root = root.getObject()
+    if '/First' not in root:
+        return
+
+    page_refs  = page_refs if page_refs is not None else page_references(reader)
+    page_index = {ref.idnum: index for index, ref in enumerate(page_refs)}
+    named      = []
+
+    def named_destinations():
+        if not named:
+            named.append(reader.getNamedDestinations())
+        return named[0]
+
+    # (ref, parent idnum, depth), the /Next of an item is pushed under its /First, so the children come first.
+    stack = [(root.raw_get('/First'), ROOT, 0)]
+    seen  = set()
+
+    while stack:
+        ref, parent, depth = stack.pop()
+        # a broken file may loop.
+        if not isinstance(ref, IndirectObject) or ref.idnum in seen:
+            continue
+        seen.add(ref.idnum)
+
+        node = ref.getObject()
+        yield (ref, node, parent, depth, str(node.get('/Title', '')).strip(),
+               destination_page(node, page_index, named_destinations))
+
+        if '/Next' in node:
+            stack.append((node.raw_get('/Next'), parent, depth))
+        if '/First' in node:
+            stack.append((node.raw_get('/First'), ref.idnum, depth + 1))
+
+def outline_from_reader(reader, page_refs=None):
+    """
+    The outline of a file as a src.outline.Outline, the page numbers start at 1,
+    0 is an item without a page of this file.
+    """
+    outline = Outline()
+    indexes = {}
+
+    for ref, node, parent, depth, title, page in walk_outline(reader, page_refs):
+        indexes[ref.idnum] = outline.append(title, 0 if page is None else page + 1,
+                                            None if parent is ROOT else indexes[parent])
+    return outline
+
+def read_outline(source):
+    """
+    The outline of a pdf file, see outline_from_reader.
+        :param source: str, the path, or the pdf as bytes or a binary stream.
+    """
+    with open_source(source) as stream:
+        return outline_from_reader(PdfFileReader(stream, strict=False))
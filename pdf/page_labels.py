@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""
+The printed page labels of a pdf file, like 'xii', 'A-3' or '42'.
+
+The /PageLabels number tree is read once into a few arrays, one slot per
+labelling range, and both ways are a binary search over the ranges:
+label(index) gives the label of a page, find(label) the page of a label.
+
+public:
+- class: PageLabels(num_pages)
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+
+ROMAN        = ((1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'),
+                (50, 'l'), (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i'))
+ROMAN_RE     = re.compile(r'^m{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+DIGITS_RE    = re.compile(r'^\d+$')
+LETTERS_RE   = re.compile(r'^([a-z])\1*$')
+
+# the /S names, None is a label of the prefix only.
+STYLES       = ('/D', '/R', '/r', '/A', '/a', None)
+
+def to_roman(value):
+    roman = ''
+    for num, letters in ROMAN:
+        while value >= num:
+            roman += letters
+            value -= num
+    return roman
+
+def from_roman(text):
+    if not text or not ROMAN_RE.match(text):
+        return None
+    value, index = 0, 0
+    for num, letters in ROMAN:
+        while text.startswith(letters, index):
+            value += num
+            index += len(letters)
+    return value
+
+def format_value(style, value):
+    """
+    The label of value in a style, without the prefix.
+    """
+    if style == '/D':
+        return str(value)
+    if style in ('/R', '/r'):
+        roman = to_roman(value)
+        return roman.upper() if style == '/R' else roman
+    if style in ('/A', '/a'):
+        letter = chr(ord('a') + (value - 1) % 26) * ((value - 1) // 26 + 1)
+        return letter.upper() if style == '/A' else letter
+    return ''
+
+def parse_value(style, text):
+    """
+    The value of a label in a style, without the prefix, None if it is not of that style.
+    """
+    if style == '/D':
+        return int(text) if DIGITS_RE.match(text) else None
+    if style in ('/R', '/r'):
+        if text != (text.upper() if style == '/R' else text.lower()):
+            return None
+        return from_roman(text.lower())
+    if style in ('/A', '/a'):
+        if text != (text.upper() if style == '/A' else text.lower()):
+            return None
+        match = LETTERS_RE.match(text.lower())
+        return (len(text) - 1) * 26 + ord(match.group(1)) - ord('a') + 1 if match else None
+    return 0 if text == '' else None
+
+
+class PageLabels(object):
+    """
+    The page labels of a file, a file without /PageLabels is labelled 1, 2, 3 ...
+
+    Usage:
+
+    >>> labels = PageLabels.from_reader(PdfFileReader(open('book.pdf', 'rb')))
+    >>> labels.label(0)
+    'i'
+    >>> labels.find('42')
+    53
+
+    :param num_pages: int, the pages of the file.
+    """
+    __slots__ = ('num_pages', 'starts', 'firsts', 'styles', 'prefixes', '_groups')
+
+    def __init__(self, num_pages):
+        self.num_pages = num_pages
+        self.starts    = array('i')
+        self.firsts    = array('i')
+        self.styles    = []
+        self.prefixes  = []
+        self._groups   = None
+
+    def add_range(self, start, style='/D', prefix='', first=1):
+        """
+        Label the pages from start on, until the next range. The ranges are added in page order.
+            :param style: one of STYLES.
+            :param first: int, the value of the first page, /St.
+        """
+        if style not in STYLES:
+            style = None
+        if self.starts and start <= self.starts[-1]:
+            # a number tree is sorted, a broken one keeps the first range of a page.
+            return
+        self.starts.append(start)
+        self.firsts.append(max(first, 1))
+        self.styles.append(style)
+        self.prefixes.append(prefix)
+        self._groups = None
+
+    @classmethod
+    def from_reader(cls, reader):
+        """
+        Read the /PageLabels of a PdfFileReader.
+        """
+        labels = cls(reader.getNumPages())
+        root   = reader.trailer['/Root'].getObject().get('/PageLabels')
+
+        nums = []
+        if root is not None:
+            _number_tree(root.getObject(), nums, set())
+        for start, label in sorted(nums, key=lambda num: num[0]):
+            if 0 <= start < labels.num_pages:
+                labels.add_range(start, label.get('/S'), str(label.get('/P', '')), int(label.get('/St', 1)))
+
+        if not labels.starts or labels.starts[0] != 0:
+            # the pages before the first range, or all pages, are numbered from 1.
+            default = cls(labels.num_pages)
+            default.add_range(0)
+            for i in range(len(labels.starts)):
+                default.add_range(labels.starts[i], labels.styles[i], labels.prefixes[i], labels.firsts[i])
+            labels = default
+
+        return labels
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _end(self, range_index):
+        return self.starts[range_index + 1] if range_index + 1 < len(self.starts) else self.num_pages
+
+    def label(self, index):
+        """
+        The label of a page index, starting at 0.
+        """
+        range_index = bisect_right(self.starts, index) - 1
+        if range_index < 0 or index >= self.num_pages:
+            return None
+        value = self.firsts[range_index] + index - self.starts[range_index]
+        return self.prefixes[range_index] + format_value(self.styles[range_index], value)
+
+    def _build_groups(self):
+        # {(prefix, style): (first values, range indexes)}, sorted by the first value then the page.
+        groups = {}
+        for range_index in range(len(self.starts)):
+            key = (self.prefixes[range_index], self.styles[range_index])
+            groups.setdefault(key, []).append((self.firsts[range_index], range_index))
+
+        self._groups = {}
+        for key, ranges in groups.items():
+            ranges.sort()
+            self._groups[key] = (array('i', [first for first, _ in ranges]), [index for _, index in ranges])
+
+    def find(self, label):
+        """
+        The page index of a label, None if no page has it.
+        When ranges share a label, the range whose first value is nearest wins, and the later
+        of ranges numbered alike, like the body after a front matter numbered from 1.
+        """
+        if self._groups is None:
+            self._build_groups()
+
+        label = str(label).strip()
+        for (prefix, style), (firsts, indexes) in self._groups.items():
+            if not label.startswith(prefix):
+                continue
+            value = parse_value(style, label[len(prefix):])
+            if value is None:
+                continue
+            if style is None:
+                # every page of a prefix only range has the same label, the first range has it.
+                return self.starts[min(indexes)]
+
+            # the ranges starting at value or below, the nearest first.
+            for position in range(bisect_right(firsts, value) - 1, -1, -1):
+                range_index = indexes[position]
+                index       = self.starts[range_index] + value - self.firsts[range_index]
+                if index < self._end(range_index):
+                    return index
+
+        return None
+
+
+def _number_tree(node, nums, seen):
+    """
+    Collect the (key, value) pairs of a number tree into nums.
+    """
+    if id(node) in seen:
+        return
+    seen.add(id(node))
+
+    pairs = node.get('/Nums')
+    if pairs is not None:
+        pairs = pairs.getObject()
+        for i in range(0, len(pairs) - 1, 2):
+            nums.append((int(pairs[i]), pairs[i + 1].getObject()))
+
+    for kid in node.get('/Kids', ()):
+        _number_tree(kid.getObject(), nums, seen)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Guess the page offset of a pdf file from the page numbers printed on its pages.
+
+A few pages spread over the file are read, about 2 * log2(pages) of them, and
+the page number in the header or footer of each votes for its offset
+(physical page - printed page). The offset with the most votes wins.
+
+public:
+- class: OffsetGuess(offset, confidence, votes, sampled)
+- function: sample_indexes(num_pages, max_samples=None)
+- function: detect_offset(path, max_samples=None, reader_pool=None)
+"""
+
+import math
+import re
+from collections import namedtuple
+
+from PyPDF4 import PdfFileReader
+
+from .page_tree import load_page, page_references
+from .source import open_source
+from .text_lines import page_lines
+
+# a line which is only a page number, like '12', '- 12 -', '第12页', 'Page 12 of 300', '12 / 300'.
+FOLIO_RE       = re.compile(r'^[\s\-–—\[(（]*(?:page|p\.|第)?\s*(\d{1,5})\s*(?:页)?\s*(?:(?:/|of|共)\s*\d+\s*页?)?[\s\-–—\])）]*$', re.I)
+# a running head with the page number at one end, like '12 Chapter One' or 'Chapter One 13'.
+HEAD_FIRST_RE  = re.compile(r'^(\d{1,5})\s+\D')
+HEAD_LAST_RE   = re.compile(r'\D\s+(\d{1,5})$')
+
+EDGE_LINES     = 2
+HEAD_WEIGHT    = 0.5
+MIN_SAMPLES    = 5
+MIN_AGREE      = 3
+
+OffsetGuess = namedtuple('OffsetGuess', ('offset', 'confidence', 'votes', 'sampled'))
+OffsetGuess.__doc__ = """
+offset: int, physical page = printed page + offset, None if no page number was found.
+confidence: float, 0 to 1, the share of the sampled page numbers agreeing with offset.
+votes: dict, {offset: weight}.
+sampled: list of the page indexes read.
+"""
+
+def sample_indexes(num_pages, max_samples=None):
+    """
+    The page indexes to read, evenly spread over the file.
+        :param max_samples: int, default is 2 * log2(num_pages), at least MIN_SAMPLES.
+    """
+    if max_samples is None:
+        max_samples = max(MIN_SAMPLES, 2 * math.ceil(math.log2(max(num_pages, 1))))
+    samples = min(num_pages, max_samples)
+    return sorted({int((i + 0.5) * num_pages / samples) for i in range(samples)})
+
+def folio_numbers(lines):
+    """
+    The page numbers printed in the first and last lines of a page.
+        :return: dict, {number: weight}, a line of its own weighs 1, a number in a running head HEAD_WEIGHT.
+    """
+    edges   = lines if len(lines) <= 2 * EDGE_LINES else lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+    numbers = {}
+
+    for line in edges:
+        line  = line.strip()
+        match = FOLIO_RE.match(line)
+        if match:
+            weight, number = 1.0, int(match.group(1))
+        else:
+            match = HEAD_FIRST_RE.match(line) or HEAD_LAST_RE.search(line)
+            if not match:
+                continue
+            weight, number = HEAD_WEIGHT, int(match.group(1))
+        numbers[number] = max(numbers.get(number, 0), weight)
+
+    return numbers
+
+def _vote(reader, page_refs, indexes):
+    votes = {}
+    pages = {}
+
+    for index in indexes:
+        try:
+            numbers = folio_numbers(page_lines(load_page(reader, page_refs[index])))
+        except Exception:
+            # a broken content stream has no page number.
+            continue
+
+        for number, weight in numbers.items():
+            offset        = index + 1 - number
+            votes[offset] = votes.get(offset, 0) + weight
+            pages.setdefault(offset, set()).add(index)
+        if numbers:
+            pages.setdefault(None, set()).add(index)
+
+    return votes, pages
+
+def detect_offset(path, max_samples=None, reader_pool=None):
+    """
+    Guess the offset to add to the page numbers of the bookmark text.
+        :param max_samples: int, the most pages read, see sample_indexes.
+        :param path: str, or a seekable binary stream of the pdf.
+        :param reader_pool: pdf.reader_pool.ReaderPool, read with a pooled reader of the file.
+        :return: OffsetGuess
+    """
+    if reader_pool is not None and isinstance(path, str):
+        pooled = reader_pool.acquire(path)
+        try:
+            indexes      = sample_indexes(len(pooled.page_refs), max_samples)
+            votes, pages = _vote(pooled.reader, pooled.page_refs, indexes)
+        finally:
+            reader_pool.release(pooled)
+    else:
+        with open_source(path) as stream:
+            # only the sampled pages are read, reader.getNumPages would flatten the whole page tree.
+            reader       = PdfFileReader(stream, strict=False)
+            page_refs    = page_references(reader)
+            indexes      = sample_indexes(len(page_refs), max_samples)
+            votes, pages = _vote(reader, page_refs, indexes)
+
+    numbered = pages.pop(None, ())
+    if not votes:
+        return OffsetGuess(None, 0.0, votes, indexes)
+
+    offset     = max(votes, key=lambda key: (votes[key], -abs(key)))
+    agree      = len(pages[offset])
+    confidence = agree / len(numbered) * min(1.0, agree / MIN_AGREE)
+    return OffsetGuess(offset, round(confidence, 3), votes, indexes)
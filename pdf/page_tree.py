@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Walk the page tree of a pdf file without copying page dictionaries.
+
+public:
+- function: page_references(reader)
+- function: load_page(reader, ref)
+"""
+
+import re
+
+from PyPDF4.generic import IndirectObject, NameObject
+from PyPDF4.pdf import PageObject
+
+# the /Type of a page or a page tree node, near the start of the object.
+PAGE_TYPE_RE = re.compile(rb'/Type\s*/(Pages?)(?![A-Za-z])')
+SNIFF_BYTES  = 512
+# the attributes a page takes from its /Pages ancestors when it has none of its own.
+INHERITED    = tuple(NameObject(name) for name in ('/Resources', '/MediaBox', '/CropBox', '/Rotate'))
+
+def _sniff_type(reader, ref):
+    """
+    The /Type of an object, b'Page' or b'Pages', read from its bytes without parsing it.
+    None when unsure: the object is in an object stream, its offset is wrong, or /Type is not near the start.
+    """
+    if (ref.generation, ref.idnum) in reader.resolvedObjects:
+        return None
+    offset = reader.xref.get(ref.generation, {}).get(ref.idnum)
+    if offset is None:
+        return None
+
+    stream = reader.stream
+    stream.seek(offset, 0)
+    head   = stream.read(SNIFF_BYTES)
+    if not head.lstrip().startswith(b'%d %d obj' % (ref.idnum, ref.generation)):
+        return None
+    end    = head.find(b'endobj')
+    match  = PAGE_TYPE_RE.search(head if end < 0 else head[:end])
+    return match.group(1) if match else None
+
+def page_references(reader):
+    """
+    Collect the indirect references of all pages, in document order.
+    Only the /Pages nodes are resolved, the page contents are never touched, and a page
+    whose /Type is found in its first bytes is not parsed at all.
+
+        :param reader: PdfFileReader.
+        :return: list of IndirectObject, one for each page.
+    """
+    catalog = reader.trailer['/Root']
+    refs    = []
+    stack   = [catalog.raw_get('/Pages')]
+
+    while stack:
+        node_ref = stack.pop()
+        if isinstance(node_ref, IndirectObject) and _sniff_type(reader, node_ref) == b'Page':
+            refs.append(node_ref)
+            continue
+        node     = node_ref.getObject()
+
+        if node.get('/Type') == '/Pages' or ('/Kids' in node and node.get('/Type') != '/Page'):
+            # push kids reversed, so the first kid is popped first.
+            stack.extend(reversed(node.raw_get('/Kids').getObject()))
+        elif isinstance(node_ref, IndirectObject):
+            refs.append(node_ref)
+
+    return refs
+
+def load_page(reader, ref):
+    """
+    The PageObject of one page reference, like reader.getPage but without flattening the whole tree.
+    The inherited attributes are looked up along /Parent, the page dictionary itself is not changed.
+
+        :param reader: PdfFileReader.
+        :param ref: IndirectObject, one of page_references(reader).
+        :return: PageObject
+    """
+    page   = PageObject(reader, ref)
+    page.update(ref.getObject())
+
+    parent = page.get('/Parent')
+    seen   = set()
+    while parent is not None and id(parent) not in seen and not all(attr in page for attr in INHERITED):
+        seen.add(id(parent))
+        node = parent.getObject()
+        for attr in INHERITED:
+            if attr not in page and attr in node:
+                page[attr] = node.raw_get(attr)
+        parent = node.get('/Parent')
+
+    return page
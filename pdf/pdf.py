@@ -7,10 +7,21 @@ public:
 - class: Pdf(path)
 """
 
+import io
+import mmap
 import os
+import shutil
 from typing import Iterator
 from PyPDF4 import PdfFileWriter, PdfFileReader, utils
 
+from src.metrics import get_metrics
+from .incremental import IncrementalWriter
+from .outline_reader import outline_from_reader
+from .page_labels import PageLabels
+from .page_tree import page_references
+from .source import CountingOutput, seekable_input
+from .streaming import StreamingWriter, DEFAULT_CACHE_BYTES
+
 class PDF(object):
     """
     Add bookmarks to a pdf file.
@@ -33,23 +44,171 @@ class PDF(object):
 
     # the new pdf file will save to save directory with '1_new.pdf'
 
+    # incremental update, only the outlines are appended to a copy of the file:
+    >>> p = PDF('/home/sun/test.pdf', incremental=True)
+
+    # or append them to the file itself:
+    >>> p.save_pdf(in_place=True)
+
+    # streaming, the objects are copied one by one with at most 8MB cached:
+    >>> p = PDF('/home/sun/test.pdf', streaming=True, max_cache_bytes=8 * 1024 * 1024)
+
+    # borrow the reader from a pool, and give it back when done:
+    >>> from pdf.reader_pool import get_reader_pool
+    >>> p = PDF('/home/sun/test.pdf', incremental=True, reader_pool=get_reader_pool())
+    >>> p.save_pdf()
+    >>> p.release_reader()
+
+    # close the file when done, or give the reader back to its pool:
+    >>> with PDF('/home/sun/test.pdf', incremental=True) as p:
+    ...     p.add_bookmark('First bookmark', 1)
+    ...     p.save_pdf()
+
+    # read a memory map of the file instead of buffered reads, the pages of a big file
+    # are read by the system when needed:
+    >>> p = PDF('/home/sun/test.pdf', streaming=True, use_mmap=True)
+
+    # read a stream or bytes, and write to a stream or get the bytes, no file is touched:
+    >>> p = PDF(sys.stdin.buffer, streaming=True)
+    >>> p.save_pdf(output=sys.stdout.buffer)
+    >>> data = PDF(pdf_bytes, incremental=True).save_bytes()
+
     """
-    def __init__(self, path, path_new=None):
-        self.path     = path
-        self.path_new = path_new
+    def __init__(self, path, path_new=None, incremental=False, streaming=False, max_cache_bytes=DEFAULT_CACHE_BYTES,
+                 reader_pool=None, metrics=None, use_mmap=False, check=None):
+        """
+            :param check: callable(num_pages), called once the file is read, before the pages are copied.
+                          It may raise to stop, then nothing is copied or written.
+        """
+        if incremental and streaming:
+            raise ValueError("incremental and streaming can't be used together")
+
+        # a stream is read as it is, unless it can't seek, then it is read into memory.
+        self.path        = seekable_input(path)
+        self.is_stream   = hasattr(self.path, 'read')
+        self.name        = getattr(self.path, 'name', None) if self.is_stream else path
+        self.path_new    = path_new
+        self.incremental = incremental
+        self.streaming   = streaming
+        self.metrics     = get_metrics(metrics)
+
+        self.use_mmap    = use_mmap
+        self.reader_pool = reader_pool
+        self._pooled     = None
+        self._stream     = None
+        self._labels     = None
+        self._outline    = None
+        # a pooled reader reads a plain file, use_mmap opens a reader of its own.
+        if reader_pool is not None and not self.is_stream and not use_mmap:
+            with self.metrics.span('open', pooled=True):
+                self._pooled = reader_pool.acquire(path)
+
+        try:
+            self._init_writer(max_cache_bytes, check)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
 
-        self.reader       = PdfFileReader(open(path, "rb"), strict=False)
-        self.org_outlines = self.reader.getOutlines()
+    def __exit__(self, *args):
+        self.close()
+        return False
 
-        self.writer       = PdfFileWriter()
-        self.writer.appendPagesFromReader(self.reader)
-        self.writer.addMetadata({k: v for k, v in self.reader.getDocumentInfo().items()
-                                 if isinstance(v, (utils.string_type, utils.bytes_type))})
+    def _open(self):
+        """
+        The input stream, a file or a read only memory map of it, or the stream given.
+        """
+        if self.is_stream:
+            return self.path
+        if not self.use_mmap:
+            return open(self.path, "rb")
+
+        # the map keeps its own handle, the file is closed here.
+        with open(self.path, "rb") as stream:
+            return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _init_writer(self, max_cache_bytes, check=None):
+        metrics = self.metrics
+
+        if self._pooled:
+            self.reader = self._pooled.reader
+        else:
+            with metrics.span('open', mmap=self.use_mmap and not self.is_stream):
+                self._stream = self._open()
+            with metrics.span('xref_parse'):
+                self.reader = PdfFileReader(self._stream, strict=False)
+
+        page_refs = self._pooled and self._pooled.page_refs
+        if check is not None:
+            # the page tree only, the writers below take the pages found.
+            page_refs = page_refs or page_references(self.reader)
+            check(len(page_refs))
+
+        if self.incremental:
+            self.writer = IncrementalWriter(self.reader, page_refs)
+        elif self.streaming:
+            self.writer = StreamingWriter(self.reader, max_cache_bytes, page_refs)
+        else:
+            with metrics.span('page_copy'):
+                self.writer = PdfFileWriter()
+                self.writer.appendPagesFromReader(self.reader)
+            self.writer.addMetadata({k: v for k, v in self.reader.getDocumentInfo().items()
+                                     if isinstance(v, (utils.string_type, utils.bytes_type))})
+
+    def release_reader(self):
+        """
+        Give the reader back to its pool, the PDF can't be used after this.
+        """
+        if self._pooled:
+            # PdfFileWriter changes the page objects it copies.
+            self.reader_pool.release(self._pooled, dirty=not (self.incremental or self.streaming))
+            self._pooled = None
+
+    def close(self):
+        """
+        Close the file, or give the reader back to its pool. It is safe to call twice.
+        """
+        self.release_reader()
+        if self._stream is not None:
+            # the stream given is closed by its owner.
+            if not self.is_stream:
+                self._stream.close()
+            self._stream = None
+
+    @property
+    def org_outlines(self):
+        """
+        The outlines of the file as PyPDF4's getOutlines gives them, read when asked.
+        """
+        return self.reader.getOutlines()
+
+    @property
+    def outline(self):
+        """
+        The src.outline.Outline the file has, read once, see pdf.outline_reader.
+        """
+        if self._outline is None:
+            with self.metrics.span('outline_read'):
+                self._outline = outline_from_reader(self.reader, self._pooled and self._pooled.page_refs)
+        return self._outline
+
+    @property
+    def page_labels(self):
+        """
+        The pdf.page_labels.PageLabels of the file, read once.
+        """
+        if self._labels is None:
+            self._labels = PageLabels.from_reader(self.reader)
+        return self._labels
 
     @property
     def _new_path(self):
         if self.path_new:
             return self.path_new
+        elif self.is_stream:
+            raise ValueError("a pdf read from a stream is saved to a path_new or an output stream")
         else:
             name, ext     = os.path.splitext(self.path)
             self.path_new = name + '_new' + ext
@@ -80,15 +239,106 @@ class PDF(object):
         """
         return self.writer.addBookmark(title, page_num, parent=parent, color=color, bold=bold, italic=italic, fit=fit, *args)
 
-    def save_pdf(self):
+    def save_pdf(self, in_place=False, progress=None, fsync=False, output=None):
         """
          save the writer to a pdf file with name 'name_new.pdf' 
+         in_place: bool, only for incremental mode, append the update to the original file.
+         progress: callable(stage, done, total), called while saving, it may raise to cancel.
+                   A cancelled or failed save leaves no partial output.
+         fsync: bool, flush the new file to the disk before returning.
+         output: a writable binary stream, like sys.stdout.buffer, the new file is written to it and it is
+                 returned instead of a path. A cancelled or failed save may leave part of the file in it.
         """
-        
+        if in_place and (self.is_stream or output is not None):
+            raise ValueError("in_place appends to the original file, not to a stream")
+
+        if output is not None:
+            self._write_output(output, progress)
+            return output
+
+        if self.incremental and not self.is_stream:
+            return self._save_incremental(in_place, progress, fsync)
+
         if os.path.exists(self._new_path):
             os.remove(self._new_path)
 
+        # an error of open() itself, like PermissionError, is raised as it is, there is no file to remove.
         with open(self._new_path, 'wb') as out:
-            self.writer.write(out)
+            try:
+                self._write_output(out, progress, fsync)
+            except BaseException:
+                out.close()
+                os.remove(self._new_path)
+                raise
 
         return self._new_path
+
+    def save_bytes(self, progress=None):
+        """
+        The new file as bytes, see save_pdf.
+        """
+        output = io.BytesIO()
+        self._write_output(output, progress)
+        return output.getvalue()
+
+    def _write_output(self, out, progress=None, fsync=False):
+        out = CountingOutput(out)
+        if self.incremental:
+            # the original bytes, then the update.
+            source = self.reader.stream
+            source.seek(0, 0)
+            shutil.copyfileobj(source, out)
+        self._write(out, progress, fsync)
+        out.flush()
+
+    def _write(self, out, progress=None, fsync=False):
+        metrics = self.metrics
+        start   = out.tell()
+
+        if progress:
+            progress('save', 0, 1)
+
+        with metrics.span('serialize', streaming=self.streaming, incremental=self.incremental):
+            if self.streaming:
+                self.writer.write(out, progress)
+            else:
+                self.writer.write(out)
+
+        if metrics.enabled:
+            metrics.count('bytes_written', out.tell() - start)
+            metrics.count('objects_written', self.writer.objects_written if isinstance(self.writer, IncrementalWriter)
+                                             else len(self.writer._objects))
+
+        if fsync:
+            with metrics.span('fsync'):
+                out.flush()
+                os.fsync(out.fileno())
+
+        if progress:
+            progress('save', 1, 1)
+
+    def _save_incremental(self, in_place=False, progress=None, fsync=False):
+        if in_place:
+            new_path = self.path
+        else:
+            new_path = self._new_path
+            if os.path.exists(new_path):
+                os.remove(new_path)
+            shutil.copyfile(self.path, new_path)
+
+        try:
+            with open(new_path, 'r+b') as out:
+                out.seek(0, os.SEEK_END)
+                size = out.tell()
+                try:
+                    self._write(out, progress, fsync)
+                except BaseException:
+                    # drop the partial update, the original bytes are untouched.
+                    out.truncate(size)
+                    raise
+        except BaseException:
+            if not in_place:
+                os.remove(new_path)
+            raise
+
+        return new_path
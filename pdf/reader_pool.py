@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep parsed pdf readers between exports of the same file.
+
+A reader is keyed by the file path, size and modification time, so a file
+changed on disk is parsed again. A reader is lent to one PDF at a time.
+
+public:
+- class: ReaderPool(max_readers=4)
+- function: get_reader_pool()
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from PyPDF4 import PdfFileReader
+
+from .page_tree import page_references
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PooledReader(object):
+    """
+    A PdfFileReader with the references of its pages, both kept by the pool.
+    """
+    def __init__(self, path, key):
+        self.path       = path
+        self.key        = key
+        self.reader     = PdfFileReader(open(path, "rb"), strict=False)
+        self._page_refs = None
+
+    @property
+    def page_refs(self):
+        if self._page_refs is None:
+            self._page_refs = page_references(self.reader)
+        return self._page_refs
+
+    def reset(self):
+        """
+        Drop the objects read so far, they are read from the file again when needed.
+        PdfFileWriter changes the page objects it copies, they can't be lent again.
+        The xref and the page references are kept.
+        """
+        self.reader.resolvedObjects.clear()
+        self.reader.flattenedPages = None
+        self.reader._pageId2Num    = None
+
+    def close(self):
+        self.reader.stream.close()
+
+
+class ReaderPool(object):
+    """
+    LRU pool of parsed readers.
+
+    Usage:
+
+    >>> pool = ReaderPool(max_readers=4)
+    >>> pooled = pool.acquire('/home/sun/test.pdf')
+    >>> pooled.reader.getNumPages()
+    >>> pool.release(pooled)
+
+    # close all readers of a file, or of the pool:
+    >>> pool.evict('/home/sun/test.pdf')
+    >>> pool.close()
+
+    max_readers: int, the most idle readers kept open.
+    """
+    def __init__(self, max_readers=4):
+        self.max_readers = max(max_readers, 0)
+        self._idle       = OrderedDict()
+        self._lock       = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def acquire(self, path):
+        """
+        Lend a reader of the file, an idle one if the file is unchanged, else a new one.
+            :return: PooledReader, give it back with release().
+        """
+        path = os.path.abspath(path)
+        key  = _file_key(path)
+
+        with self._lock:
+            pooled = self._idle.pop(path, None)
+
+        if pooled is not None:
+            if pooled.key == key:
+                return pooled
+            pooled.close()
+
+        return PooledReader(path, key)
+
+    def release(self, pooled, dirty=False):
+        """
+        Give a reader back to the pool.
+            :param dirty: bool, the objects of the reader were changed, like PdfFileWriter does.
+        """
+        try:
+            key = _file_key(pooled.path)
+        except OSError:
+            key = None
+
+        # the file was written since, like an in place update.
+        if key != pooled.key or not self.max_readers:
+            pooled.close()
+            return
+
+        if dirty:
+            pooled.reset()
+
+        closing = []
+        with self._lock:
+            if pooled.path in self._idle:
+                closing.append(self._idle.pop(pooled.path))
+            self._idle[pooled.path] = pooled
+            while len(self._idle) > self.max_readers:
+                closing.append(self._idle.popitem(last=False)[1])
+
+        for old in closing:
+            old.close()
+
+    def evict(self, path):
+        """
+        Close the idle reader of a file.
+        """
+        with self._lock:
+            pooled = self._idle.pop(os.path.abspath(path), None)
+        if pooled is not None:
+            pooled.close()
+
+    def close(self):
+        """
+        Close all idle readers, the lent ones are closed when they come back.
+        """
+        with self._lock:
+            idle, self._idle = list(self._idle.values()), OrderedDict()
+            self.max_readers = 0
+        for pooled in idle:
+            pooled.close()
+
+
+_pool = None
+
+def get_reader_pool():
+    """
+    The shared ReaderPool of this process.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ReaderPool()
+    return _pool
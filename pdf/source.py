@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+The input and output of a pdf file: a path, bytes, or a binary stream like stdin and stdout.
+
+public:
+- function: is_stream(source)
+- function: seekable_input(source)
+- function: open_source(source)
+- class: CountingOutput(stream)
+"""
+
+import io
+from contextlib import contextmanager
+
+def is_stream(source):
+    return hasattr(source, 'read') or hasattr(source, 'write')
+
+def seekable_input(source):
+    """
+    A source PyPDF4 can read: a path is returned as it is, so is a stream which can seek.
+    Bytes, and a stream which can't seek like a pipe on stdin, are read into memory.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if not hasattr(source, 'read'):
+        return source
+
+    try:
+        if source.seekable():
+            return source
+    except (AttributeError, ValueError):
+        pass
+    return io.BytesIO(source.read())
+
+@contextmanager
+def open_source(source):
+    """
+    A binary stream to read the source, a path is opened and closed, a stream is left open.
+    """
+    source = seekable_input(source)
+    if hasattr(source, 'read'):
+        yield source
+        return
+
+    with open(source, 'rb') as stream:
+        yield stream
+
+
+class CountingOutput(object):
+    """
+    A writable stream as the writers see it: tell() is the bytes written through it.
+    The offsets of the new file are right on a pipe, or on a stream which had bytes before.
+
+    :param stream: a writable binary stream, like sys.stdout.buffer.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.size   = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        self.stream.flush()
+
+    def fileno(self):
+        return self.stream.fileno()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming writer for an exist pdf file.
+
+Every object of the original file is read, written and released one by one,
+with its original object number, so the peak memory does not depend on the
+number of pages. Objects of object streams are written uncompressed, one
+object stream decoded at a time.
+
+public:
+- class: StreamingWriter(reader, max_cache_bytes=DEFAULT_CACHE_BYTES, page_refs=None)
+"""
+
+from collections import OrderedDict
+from io import BytesIO
+
+from PyPDF4.generic import IndirectObject, NumberObject, StreamObject, readObject
+from PyPDF4.utils import readNonWhitespace
+
+from .incremental import IncrementalWriter
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+class StreamingWriter(IncrementalWriter):
+    """
+    A writer with the bookmark api of PdfFileWriter, which copies the original objects lazily.
+
+    Usage:
+
+    >>> writer = StreamingWriter(reader, max_cache_bytes=8 * 1024 * 1024)
+    >>> writer.addBookmark('First bookmark', 0)
+    >>> writer.write(stream)
+
+    max_cache_bytes: int, the most bytes of copied objects kept in the reader cache.
+    """
+    def __init__(self, reader, max_cache_bytes=DEFAULT_CACHE_BYTES, page_refs=None):
+        super(StreamingWriter, self).__init__(reader, page_refs)
+        self.max_cache_bytes = max_cache_bytes
+        self._cached         = OrderedDict()
+        self._cached_bytes   = 0
+
+    def _release(self, key, size):
+        """
+        Keep a copied object in the reader cache until the cache is over the ceiling.
+        """
+        self._cached[key]   = size
+        self._cached_bytes += size
+
+        while self._cached and self._cached_bytes > self.max_cache_bytes:
+            old_key, old_size   = self._cached.popitem(last=False)
+            self._cached_bytes -= old_size
+            self.reader.resolvedObjects.pop(old_key, None)
+
+    def _plain_objects(self, skip):
+        """
+        (offset, idnum, generation) of the uncompressed objects, in file order.
+        """
+        latest = {}
+        for generation, xref in self.reader.xref.items():
+            for idnum, offset in xref.items():
+                if idnum in skip or not offset:
+                    continue
+                if generation >= latest.get(idnum, (0, -1))[1]:
+                    latest[idnum] = (offset, generation)
+
+        return sorted((offset, idnum, generation) for idnum, (offset, generation) in latest.items())
+
+    def _object_streams(self):
+        """
+        {object stream number: [object numbers]}, in object stream order.
+        """
+        streams = OrderedDict()
+        for idnum, (stmnum, index) in sorted(self.reader.xref_objStm.items(), key=lambda x: x[1]):
+            streams.setdefault(stmnum, []).append(idnum)
+        return streams
+
+    def _read_object_stream(self, stmnum):
+        """
+        Decode an object stream once and yield (idnum, object) for all of its objects.
+        """
+        key     = (0, stmnum)
+        cached  = key in self.reader.resolvedObjects
+        obj_stm = self.reader.getObject(self._reference(stmnum, 0))
+        data    = BytesIO(obj_stm.getData())
+
+        pairs = []
+        for _ in range(obj_stm['/N']):
+            readNonWhitespace(data)
+            data.seek(-1, 1)
+            idnum = NumberObject.readFromStream(data)
+            readNonWhitespace(data)
+            data.seek(-1, 1)
+            pairs.append((idnum, NumberObject.readFromStream(data)))
+
+        for idnum, offset in pairs:
+            data.seek(obj_stm['/First'] + offset, 0)
+            yield idnum, readObject(data, self.reader)
+
+        if not cached:
+            self.reader.resolvedObjects.pop(key, None)
+
+    def _reference(self, idnum, generation):
+        return IndirectObject(idnum, generation, self.reader)
+
+    def _copy(self, stream, entries, idnum, generation, obj):
+        """
+        Write an original object, return the bytes written.
+        """
+        if isinstance(obj, StreamObject) and obj.get('/Type') in ('/XRef', '/ObjStm'):
+            return 0
+
+        offset = stream.tell()
+        self._write_object(stream, idnum, generation, obj)
+        entries.append((idnum, generation, offset))
+        return stream.tell() - offset
+
+    def _header(self):
+        stream = self.reader.stream
+        stream.seek(0, 0)
+        header = stream.readline().strip()
+        return header if header.startswith(b'%PDF-') else b'%PDF-1.4'
+
+    def write(self, stream, progress=None):
+        """
+        Write a whole new pdf file to the stream, the original objects are copied one by one.
+            :param progress: callable(stage, done, total), called about every 1% of the objects.
+        """
+        # the outline only needs the page references, drop everything resolved so far.
+        self.reader.resolvedObjects.clear()
+
+        stream.write(self._header() + b'\n%\xE2\xE3\xCF\xD3\n')
+
+        entries        = []
+        object_streams = self._object_streams()
+        # the adopted objects are written changed, after the others.
+        skip           = set(self.reader.xref_objStm) | set(object_streams) | set(self._adopted) | {0, self._root.idnum}
+        plain_objects  = self._plain_objects(skip)
+
+        total = len(plain_objects) + len(self.reader.xref_objStm)
+        step  = max(total // 100, 1)
+        done  = 0
+
+        for offset, idnum, generation in plain_objects:
+            done += 1
+            if progress and done % step == 0:
+                progress('save', done, total)
+
+            # read as the reader reads it for the other writers, a slightly wrong offset is not a missing object.
+            obj  = self.reader.getObject(self._reference(idnum, generation))
+            size = self._copy(stream, entries, idnum, generation, obj)
+            self._release((generation, idnum), size)
+
+        for stmnum in object_streams:
+            for idnum, obj in self._read_object_stream(stmnum):
+                done += 1
+                if progress and done % step == 0:
+                    progress('save', done, total)
+
+                # skip the objects replaced by a later revision.
+                if (idnum != self._root.idnum and idnum not in self._adopted and
+                        self.reader.xref_objStm.get(idnum, (None,))[0] == stmnum):
+                    self._copy(stream, entries, idnum, 0, obj)
+
+        entries.append((self._root.idnum, self._root.generation, stream.tell()))
+        self._write_object(stream, self._root.idnum, self._root.generation, self._root_object)
+
+        self._write_objects(stream, entries)
+
+        entries.sort()
+        self.objects_written = len(entries)
+        xref_location = self._write_xref_table(stream, entries)
+        stream.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref_location)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read the text lines of a pdf page, in reading order.
+
+PageObject.extractText gives one line per text operator, so a title and
+its page number come out on separate lines, and CID fonts come out empty.
+Here the text runs are placed with the text matrix, grouped by baseline,
+and decoded with the /ToUnicode map of their font.
+
+public:
+- function: page_lines(page)
+"""
+
+import re
+
+from PyPDF4.generic import ByteStringObject, TextStringObject, NumberObject, FloatObject
+from PyPDF4.pdf import ContentStream
+
+_CODESPACE_RE = re.compile(rb'begincodespacerange(.*?)endcodespacerange', re.S)
+_BFCHAR_RE    = re.compile(rb'beginbfchar(.*?)endbfchar', re.S)
+_BFRANGE_RE   = re.compile(rb'beginbfrange(.*?)endbfrange', re.S)
+_HEX_RE       = re.compile(rb'<([0-9A-Fa-f\s]*)>')
+_RANGE_RE     = re.compile(rb'<([0-9A-Fa-f\s]*)>\s*<([0-9A-Fa-f\s]*)>\s*(<[0-9A-Fa-f\s]*>|\[[^\]]*\])')
+
+# a TJ gap wider than this, in thousandths of the font size, is a space.
+SPACE_GAP = 250
+
+def _hex(value):
+    return bytes.fromhex(re.sub(rb'\s', b'', value).decode('ascii'))
+
+def _utf16(value):
+    return _hex(value).decode('utf-16-be', 'replace')
+
+def parse_to_unicode(data):
+    """
+    Parse a /ToUnicode CMap.
+        :return: (code lengths, {code bytes: unicode str})
+    """
+    lengths = set()
+    codes   = {}
+
+    for block in _CODESPACE_RE.findall(data):
+        lengths.update(len(_hex(low)) for low in _HEX_RE.findall(block)[::2])
+
+    for block in _BFCHAR_RE.findall(data):
+        pairs = _HEX_RE.findall(block)
+        for code, text in zip(pairs[::2], pairs[1::2]):
+            codes[_hex(code)] = _utf16(text)
+
+    for block in _BFRANGE_RE.findall(data):
+        for low, high, target in _RANGE_RE.findall(block):
+            low, high = _hex(low), _hex(high)
+            first     = int.from_bytes(low, 'big')
+            count     = int.from_bytes(high, 'big') - first + 1
+            if target.startswith(b'['):
+                targets = [_utf16(text) for text in _HEX_RE.findall(target)]
+            else:
+                start   = _hex(target[1:-1])
+                base    = int.from_bytes(start, 'big')
+                targets = [(base + i).to_bytes(len(start), 'big').decode('utf-16-be', 'replace') for i in range(count)]
+            for i, text in enumerate(targets[:count]):
+                codes[(first + i).to_bytes(len(low), 'big')] = text
+
+    if not lengths:
+        lengths = {len(code) for code in codes} or {1}
+    return sorted(lengths, reverse=True), codes
+
+
+class _Font(object):
+    def __init__(self, font):
+        self.lengths, self.codes = None, None
+        to_unicode = font.get('/ToUnicode') if font else None
+        if to_unicode is not None:
+            try:
+                self.lengths, self.codes = parse_to_unicode(to_unicode.getObject().getData())
+            except Exception:
+                self.codes = None
+
+    def decode(self, string):
+        if not self.codes:
+            if isinstance(string, TextStringObject):
+                return str(string)
+            return bytes(string).decode('latin-1')
+
+        data  = string.original_bytes if isinstance(string, TextStringObject) else bytes(string)
+        text  = []
+        index = 0
+        while index < len(data):
+            for length in self.lengths:
+                code = data[index:index + length]
+                if code in self.codes:
+                    text.append(self.codes[code])
+                    index += length
+                    break
+            else:
+                index += self.lengths[-1]
+        return ''.join(text)
+
+
+def _multiply(m, n):
+    return [m[0] * n[0] + m[1] * n[2],         m[0] * n[1] + m[1] * n[3],
+            m[2] * n[0] + m[3] * n[2],         m[2] * n[1] + m[3] * n[3],
+            m[4] * n[0] + m[5] * n[2] + n[4],  m[4] * n[1] + m[5] * n[3] + n[5]]
+
+def _runs(page):
+    """
+    Yield (y, x, height, text) of every text showing operator.
+    """
+    resources = page.get('/Resources')
+    resources = resources.getObject() if resources is not None else {}
+    font_dict = resources.get('/Font')
+    font_dict = font_dict.getObject() if font_dict is not None else {}
+    fonts     = {}
+
+    contents = page.get('/Contents')
+    if contents is None:
+        return
+    content = ContentStream(contents.getObject(), page.pdf)
+
+    identity = [1, 0, 0, 1, 0, 0]
+    ctm, stack = identity, []
+    tm = tlm = identity
+    font, size, leading = None, 1.0, 0.0
+
+    def show(text):
+        if not text.strip():
+            return
+        x, y   = _multiply(tm, ctm)[4:]
+        height = abs(size * _multiply(tm, ctm)[3]) or abs(size)
+        yield y, x, height, text
+
+    for operands, operator in content.operations:
+        operator = operator.decode('latin-1') if isinstance(operator, bytes) else operator
+
+        if operator == 'q':
+            stack.append(ctm)
+        elif operator == 'Q':
+            ctm = stack.pop() if stack else identity
+        elif operator == 'cm':
+            ctm = _multiply([float(v) for v in operands], ctm)
+        elif operator == 'BT':
+            tm = tlm = identity
+        elif operator == 'Tf':
+            name = operands[0]
+            if name not in fonts:
+                fonts[name] = _Font(font_dict.get(name).getObject() if font_dict.get(name) is not None else None)
+            font, size = fonts[name], float(operands[1])
+        elif operator == 'TL':
+            leading = float(operands[0])
+        elif operator in ('Td', 'TD'):
+            if operator == 'TD':
+                leading = -float(operands[1])
+            tm = tlm = _multiply([1, 0, 0, 1, float(operands[0]), float(operands[1])], tlm)
+        elif operator == 'Tm':
+            tm = tlm = [float(v) for v in operands]
+        elif operator == 'T*':
+            tm = tlm = _multiply([1, 0, 0, 1, 0, -leading], tlm)
+        elif operator in ('Tj', "'", '"'):
+            if operator != 'Tj':
+                tm = tlm = _multiply([1, 0, 0, 1, 0, -leading], tlm)
+            string = operands[-1]
+            if isinstance(string, (TextStringObject, ByteStringObject)):
+                yield from show((font or _Font(None)).decode(string))
+        elif operator == 'TJ':
+            parts = []
+            for item in operands[0]:
+                if isinstance(item, (TextStringObject, ByteStringObject)):
+                    parts.append((font or _Font(None)).decode(item))
+                elif isinstance(item, (NumberObject, FloatObject)) and -float(item) >= SPACE_GAP:
+                    parts.append(' ')
+            yield from show(''.join(parts))
+
+
+def page_lines(page):
+    """
+    The text lines of a page from top to bottom, the runs of a line joined by spaces.
+        :param page: PageObject.
+        :return: list of str
+    """
+    runs  = sorted(((-y, x, order, height, text) for order, (y, x, height, text) in enumerate(_runs(page))))
+    lines = []
+    last  = None
+
+    for neg_y, x, order, height, text in runs:
+        # runs less than half a line apart are on the same baseline.
+        if last is not None and neg_y - last[0] <= max(last[1], height) * 0.5:
+            lines[-1].append((x, order, text))
+        else:
+            lines.append([(x, order, text)])
+            last = (neg_y, height)
+
+    return [' '.join(text.strip() for x, order, text in sorted(line)) for line in lines]
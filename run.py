@@ -6,11 +6,77 @@ Intro:    Entry of add bookmark
 Author:   Sunic
 '''
 
+import argparse
 import os
+import sys
 from src.add_bookmark_wrapper import add_bookmark_wrapper
-from src.level_dict import get_level_re
+from src.level_dict import get_level_res
+from src.metrics import JsonLineSink
+from src.outline_check import POLICIES
+from src.outline_import import guess_format
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Add bookmarks to a PDF file, the paths and levels are asked for '
+                                                 'unless the PDF is given.')
+    parser.add_argument('pdf', nargs='?', default=None, help="the PDF file, '-' reads it from stdin, no question is asked")
+    parser.add_argument('-o', '--output', default=None,
+                        help="the new PDF file, '-' writes it to stdout, default is name_new.pdf, or stdout for stdin")
+    parser.add_argument('--toc', default=None, help='the bookmark text file, or a JSON, JSONL, CSV or pdftk dump_data '
+                                                     'outline, default reads the contents pages of the PDF')
+    parser.add_argument('--offset', default='', help="the pages offset, empty or 'auto' to guess it")
+    parser.add_argument('--level', action='append', default=[], help='the example of level0, level1 ... in order')
+    parser.add_argument('--is-re', action='store_true', help='the level examples are expressions')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true', help='append the outlines instead of rewriting the PDF')
+    mode.add_argument('--streaming', action='store_true', help='copy the PDF objects one by one with bounded memory')
+    parser.add_argument('--validate', choices=POLICIES, default=None,
+                        help='check the bookmarks against the pages before writing: fail stops, warn lists the issues, '
+                             'fix clamps the pages, drops the empty and repeated bookmarks')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help="write the time of each stage and the counters as JSON lines to PATH, '-' for stderr")
+    return parser.parse_args(argv)
+
+def run_args(args):
+    """
+    Add the bookmarks without questions, for pipes like: cat a.pdf | python run.py - --toc toc.txt > a_new.pdf
+    """
+    # the pdf may go to stdout, the messages go to stderr then.
+    to_stdout = args.output == '-' or (args.pdf == '-' and args.output is None)
+    log       = sys.stderr if to_stdout else sys.stdout
+
+    bookmark_text = None
+    if args.toc:
+        with open(args.toc, 'r', encoding='utf-8') as toc_file:
+            bookmark_text = toc_file.readlines()
+
+    offset  = args.offset.strip()
+    options = {'incremental': args.incremental, 'streaming': args.streaming,
+               'toc_format': guess_format(args.toc, bookmark_text) if args.toc else None,
+               'validate': args.validate, 'on_issue': lambda issue: print("[-]: %s" % str(issue), file=log)}
+    if to_stdout:
+        options['output'] = sys.stdout.buffer
+    elif args.output:
+        options['output'] = args.output
+
+    sink = JsonLineSink(None if args.metrics == '-' else args.metrics) if args.metrics else None
+    try:
+        add_bookmark_wrapper(bookmark_text, int(offset) if offset not in ('', 'auto') else None,
+                             sys.stdin.buffer if args.pdf == '-' else args.pdf,
+                             level_res=get_level_res(args.level, is_re=args.is_re), metrics=sink,
+                             verbose=not to_stdout, **options)
+    except (OSError, ValueError) as e:
+        print("[-]: %s" % e, file=log)
+        return 1
+    finally:
+        if sink:
+            sink.close()
+    return 0
+
+def run(argv=None):
+    args = parse_args(argv)
+    if args.pdf:
+        return run_args(args)
 
-def run():
     pdf_file_path = input("Please input PDF file path:")
     if os.path.isfile(pdf_file_path):
         pass
@@ -18,25 +84,40 @@ def run():
         print("[-]: Error input PDF file path.")
         return
     
-    bookmark_file = input("Please input Bookmark file path:")
-    if os.path.isfile(pdf_file_path):
+    bookmark_file = input("Please input Bookmark file path (empty to read the contents pages of the PDF):")
+    if not bookmark_file or os.path.isfile(bookmark_file):
         pass
     else:
         print("[-]: Error input bookmark file path.")
         return
 
-    pages_offset  = int(input("Please input offset number: "))
+    pages_offset  = input("Please input offset number (empty to guess it from the page numbers): ").strip()
+    pages_offset  = int(pages_offset) if pages_offset else None
+
+    level_examples = [input("Please input level%d example: " % level) for level in range(3)]
+    while True:
+        level_example = input("Please input level%d example (empty to finish): " % len(level_examples))
+        if not level_example:
+            break
+        level_examples.append(level_example)
+    level_res      = get_level_res(level_examples)
 
-    level0_example = input("Please input level0 example: ")
-    level1_example = input("Please input level1 example: ")
-    level2_example = input("Please input level2 example: ")
-    level0_re      = get_level_re("level0", level0_example)
-    level1_re      = get_level_re("level1", level1_example)
-    level2_re      = get_level_re("level2", level2_example)
+    bookmark_text = None
+    toc_format    = None
+    if bookmark_file:
+        bookmark_file_p = open(bookmark_file, 'r')
+        bookmark_text   = bookmark_file_p.readlines()
+        toc_format      = guess_format(bookmark_file, bookmark_text)
 
-    bookmark_file_p = open(bookmark_file, 'r')
-    bookmark_text   = bookmark_file_p.readlines()
-    add_bookmark_wrapper(bookmark_text, pages_offset, pdf_file_path, level0_re, level1_re, level2_re)
+    sink = JsonLineSink(None if args.metrics == '-' else args.metrics) if args.metrics else None
+    try:
+        add_bookmark_wrapper(bookmark_text, pages_offset, pdf_file_path, level_res=level_res, metrics=sink,
+                             toc_format=toc_format)
+    except ValueError as e:
+        print("[-]: %s" % e)
+    finally:
+        if sink:
+            sink.close()
 
 if __name__ == '__main__':
-    run()
+    sys.exit(run())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     run_batch.py
+Intro:    Entry of add bookmark to many PDF files listed in a manifest
+Author:   Sunic
+'''
+
+import argparse
+import json
+import os
+import sys
+from src.batch import read_manifest, run_batch
+from src.outline_check import POLICIES
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Add bookmarks to the PDF files listed in a manifest.')
+    parser.add_argument('manifest', help='CSV or JSONL manifest, fields: pdf, toc, offset, level0, level1, level2, is_re')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='max jobs queued in the pool, default 2 per worker')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true', help='append the outlines instead of rewriting the PDF')
+    mode.add_argument('--streaming', action='store_true', help='copy the PDF objects one by one with bounded memory')
+    parser.add_argument('--mmap', action='store_true', help='read the PDF files through a memory map')
+    parser.add_argument('--merge', action='store_true',
+                        help='keep the bookmarks of the PDF, write only the new and moved ones')
+    parser.add_argument('--by-label', action='store_true',
+                        help='the page numbers of the tocs are the printed page labels, like xii or 42, the offset is ignored')
+    parser.add_argument('--validate', choices=POLICIES, default=None,
+                        help='check the bookmarks against the pages before writing: fail stops, warn lists the issues, '
+                             'fix clamps the pages, drops the empty and repeated bookmarks')
+    parser.add_argument('--parse-cache', default=None, metavar='DIR',
+                        help='keep the parsed bookmark texts in this directory for later runs')
+    parser.add_argument('--report', default=None, help='write one JSON line per file to this path')
+    return parser.parse_args(argv)
+
+def run(argv=None):
+    args = parse_args(argv)
+
+    if not os.path.isfile(args.manifest):
+        print("[-]: Error manifest file path.")
+        return 1
+
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+
+    def on_result(result):
+        if result['ok']:
+            print("[+]: %s -> %s (%.2fs)" % (result['pdf'], result['output'], result['seconds']))
+            for issue in result.get('issues', ()):
+                print("[-]: %s: %s" % (result['pdf'], issue))
+        else:
+            print("[-]: %s: %s" % (result['pdf'] or 'line %s' % result['line'], result['error']))
+        if report:
+            report.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    try:
+        options = {'incremental': args.incremental, 'streaming': args.streaming, 'by_label': args.by_label,
+                   'merge': args.merge, 'use_mmap': args.mmap, 'validate': args.validate}
+        summary = run_batch(read_manifest(args.manifest), args.workers, args.max_in_flight,
+                            options, on_result, args.parse_cache)
+    finally:
+        if report:
+            report.close()
+
+    print("[*]: %d files, %d ok, %d failed in %.2fs, %.2f files/s, %.2f MB/s" %
+          (summary['total'], summary['ok'], summary['failed'], summary['seconds'],
+           summary['files_per_sec'], summary['mb_per_sec']))
+
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     run_daemon.py
+Intro:    Entry of the bookmark server, and of its client submitting one PDF file
+Author:   Sunic
+
+Usage:    python run_daemon.py serve [--socket PATH | --port PORT] [-j 4]
+          python run_daemon.py submit book.pdf --toc toc.txt --offset 4 --level 第1章 --level 1.1
+'''
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+from src.daemon import DEFAULT_SOCKET, DEFAULT_TOKEN, BookmarkServer, new_token, read_token, submit
+from src.outline_check import POLICIES
+from src.outline_import import guess_format
+
+def _add_address(parser):
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='the Unix socket, default %s' % DEFAULT_SOCKET)
+    parser.add_argument('--port', type=int, default=None, help='use a TCP port on 127.0.0.1 instead of the socket, '
+                                                               'the requests carry the token of --token-file')
+    parser.add_argument('--token-file', default=DEFAULT_TOKEN,
+                        help='the token of a TCP server, made by serve, read by submit, default %s' % DEFAULT_TOKEN)
+
+def parse_args(argv=None):
+    parser   = argparse.ArgumentParser(description='Keep a warm bookmark server, and submit PDF files to it.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    serve = commands.add_parser('serve', help='run the server until interrupted')
+    _add_address(serve)
+    serve.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    serve.add_argument('--max-queue', type=int, default=None, help='jobs waiting for a worker, default 2 per worker')
+    serve.add_argument('--parse-cache', default=None, metavar='DIR', help='share the parsed bookmark texts in DIR')
+
+    client = commands.add_parser('submit', help='bookmark one PDF file with a running server')
+    _add_address(client)
+    client.add_argument('pdf', help='the PDF file')
+    client.add_argument('--toc', default=None, help='the bookmark text file, or a JSON, JSONL, CSV or pdftk dump_data '
+                                                     'outline, default reads the contents pages of the PDF')
+    client.add_argument('--offset', default='0', help="the pages offset, 'auto' to guess it")
+    client.add_argument('--level', action='append', default=[], help='the example of level0, level1 ... in order')
+    client.add_argument('--is-re', action='store_true', help='the level examples are expressions')
+    mode = client.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true', help='append the outlines instead of rewriting the PDF')
+    mode.add_argument('--streaming', action='store_true', help='copy the PDF objects one by one with bounded memory')
+    client.add_argument('--validate', choices=POLICIES, default=None,
+                        help='check the bookmarks against the pages before writing: fail, warn or fix')
+    client.add_argument('--send-bytes', default=None, metavar='OUTPUT',
+                        help='send the PDF bytes instead of its path, and write the new PDF to OUTPUT')
+    return parser.parse_args(argv)
+
+def _address(args):
+    return (None, ('127.0.0.1', args.port)) if args.port else (args.socket, None)
+
+def serve(args):
+    socket_path, address = _address(args)
+    # any local user can connect to a port, a new token is made for each server.
+    token  = new_token(args.token_file) if address else None
+    server = BookmarkServer(socket_path, address, args.workers, args.max_queue, args.parse_cache, token)
+
+    # shutdown() waits for serve_forever, it can't run in the signal handler of the same thread.
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print("[+]: serving on %s with %d workers%s" % (server.address, server.workers,
+                                                   ", token in %s" % args.token_file if token else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def client(args):
+    socket_path, address = _address(args)
+    token   = read_token(args.token_file) if address else None
+    request = {'offset': args.offset, 'levels': args.level, 'is_re': args.is_re,
+               'options': {'incremental': args.incremental, 'streaming': args.streaming, 'validate': args.validate}}
+    if args.toc:
+        with open(args.toc, 'r', encoding='utf-8') as toc_file:
+            request['toc'] = toc_file.read()
+        request['toc_format'] = guess_format(args.toc, request['toc'])
+
+    if args.send_bytes:
+        with open(args.pdf, 'rb') as pdf_file:
+            result, output = submit(request, pdf_bytes=pdf_file.read(), socket_path=socket_path, address=address,
+                                    token=token)
+        if result['ok']:
+            with open(args.send_bytes, 'wb') as output_file:
+                output_file.write(output)
+            result['output'] = args.send_bytes
+    else:
+        result, _ = submit(request, pdf_path=args.pdf, socket_path=socket_path, address=address, token=token)
+
+    for issue in result.get('issues', ()):
+        print("[-]: %s" % str(issue))
+    if result['ok']:
+        print("[+]: %s (%.3fs, queued %.3fs) %s" % (result['output'], result['seconds'], result['wait_seconds'],
+                                                  json.dumps(result['stages'])))
+        return 0
+    print("[-]: %s" % result['error'])
+    return 1
+
+def run(argv=None):
+    args = parse_args(argv)
+    return serve(args) if args.command == 'serve' else client(args)
+
+if __name__ == '__main__':
+    sys.exit(run())
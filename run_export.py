@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+'''
+Name:     run_export.py
+Intro:    Entry of export the bookmarks a PDF file has, or audit the bookmarks of many PDF files
+Author:   Sunic
+
+Usage:    python run_export.py book.pdf -f json -o book.json
+          python run_export.py --audit archive/ -j 8 --report audit.jsonl
+'''
+
+import argparse
+import json
+import os
+import sys
+
+from src.batch import pdf_paths, run_audit
+from src.outline_export import FORMATS, write_outline
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Export the bookmarks of a PDF file as a bookmark text, JSON or CSV, '
+                                                 'or audit the bookmarks of many PDF files.')
+    parser.add_argument('pdf', nargs='+', help="the PDF file, '-' reads it from stdin, or with --audit PDF files and directories")
+    parser.add_argument('-f', '--format', choices=FORMATS, default='text', help='the output format, default text')
+    parser.add_argument('-o', '--output', default=None, help='the output file, default is stdout')
+    parser.add_argument('--offset', type=int, default=0, help='subtracted from the page numbers, to write the printed ones')
+    parser.add_argument('--audit', action='store_true', help='count the bookmarks, the missing and out of range pages '
+                                                             'of each file instead of exporting them')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='number of worker processes of --audit')
+    parser.add_argument('--report', default=None, help='with --audit, write one JSON line per file to this path')
+    return parser.parse_args(argv)
+
+def export(args):
+    from pdf.outline_reader import read_outline
+
+    if len(args.pdf) > 1:
+        print("[-]: Export one PDF file at a time, or use --audit.", file=sys.stderr)
+        return 1
+
+    path = args.pdf[0]
+    try:
+        outline = read_outline(sys.stdin.buffer if path == '-' else path)
+    except (OSError, ValueError) as e:
+        print("[-]: %s" % e, file=sys.stderr)
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as output:
+            write_outline(outline, output, args.format, args.offset)
+        print("[+]: %d bookmarks written to %s" % (len(outline), args.output))
+    else:
+        write_outline(outline, sys.stdout, args.format, args.offset)
+    return 0
+
+def audit(args):
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+
+    def on_result(result):
+        if result['ok']:
+            print("[+]: %s %d pages, %d bookmarks, depth %d, %d without page, %d out of range" %
+                  (result['pdf'], result['pages'], result['entries'], result['depth'], result['no_page'],
+                   result['out_of_range']))
+        else:
+            print("[-]: %s: %s" % (result['pdf'], result['error']))
+        if report:
+            report.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    try:
+        summary = run_audit(pdf_paths(args.pdf), args.workers, on_result=on_result)
+    finally:
+        if report:
+            report.close()
+
+    print("[*]: %d files, %d ok, %d failed, %d without bookmarks, %d bookmarks in %.2fs, %.2f files/s" %
+          (summary['total'], summary['ok'], summary['failed'], summary['no_outline'], summary['entries'],
+           summary['seconds'], summary['files_per_sec']))
+    return 1 if summary['failed'] else 0
+
+def run(argv=None):
+    args = parse_args(argv)
+    return audit(args) if args.audit else export(args)
+
+if __name__ == '__main__':
+    sys.exit(run())
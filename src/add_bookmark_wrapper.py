@@ -4,10 +4,93 @@ Intro:    The wrapper of add_bookmarks
 Author:   Sunic
 '''
 import re
-from pdf.bookmark import add_bookmark
-from src.bookmark_dict_generator import bookmark_dict_generator
+from src.bookmark_dict_generator import outline_generator
+from src.metrics import get_metrics
+from src.outline_check import OutlineCheck
+from src.parse_cache import get_parse_cache
 
-def add_bookmark_wrapper(bookmark_text, pages_offset, pdf_file_path, level0_re=None, level1_re=None, level2_re=None, other=0):
-    bookmark_dict = bookmark_dict_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other)
-    print(bookmark_dict)
-    return add_bookmark(pdf_file_path, bookmark_dict)
+def add_bookmark_wrapper(bookmark_text, pages_offset, pdf_file_path, level0_re=None, level1_re=None, level2_re=None, other=0,
+                         verbose=True, level_res=None, parse_cache=None, metrics=None, toc_workers=None,
+                         min_offset_confidence=0.5, toc_format=None, validate=None, on_issue=None, **options):
+    """
+    bookmark_text: str or list of lines, None to read them from the contents pages of the pdf file.
+    pdf_file_path: str, or the pdf as bytes or a readable binary stream, then pass output or as_bytes in options.
+    pages_offset: int, None to guess it from the page numbers printed on the pages, see pdf.page_offset.
+    level_res: list, the expressions of level0, level1 ... replace level0_re-level2_re.
+    parse_cache: src.parse_cache.ParseCache, default is the shared in-memory cache of this process.
+    metrics: src.metrics.Metrics or callable(event), gets the time of each stage and the counters.
+    toc_workers: int, the processes scanning the contents pages, see pdf.contents.extract_toc.
+    min_offset_confidence: float, a guessed offset less sure than this raises ValueError.
+    toc_format: str, 'json', 'csv' or 'pdftk', bookmark_text is an outline of that format which knows its
+                levels already, it is read without the level expressions, see src.outline_import.
+    validate: 'fail', 'warn' or 'fix', or a dict {kind: policy}, check the bookmarks against the pages of the pdf
+              before they are copied, see src.outline_check. The pages and levels written in a bookmark text
+              are checked, not the ones the parser carried forward.
+    on_issue: callable(src.outline_check.Issue), gets the issues which did not fail, default prints them if verbose.
+    options: the keyword arguments of pdf.bookmark.add_bookmark, like incremental=True or streaming=True.
+    """
+    metrics     = get_metrics(metrics)
+    parse_cache = parse_cache or get_parse_cache()
+    misses      = parse_cache.misses
+
+    if not isinstance(pdf_file_path, str):
+        from pdf.source import seekable_input
+        # read a pipe once, the contents, the offset and the bookmarks read it again.
+        pdf_file_path = seekable_input(pdf_file_path)
+    pdf_name = pdf_file_path if isinstance(pdf_file_path, str) else getattr(pdf_file_path, 'name', 'the pdf stream')
+
+    if bookmark_text is None:
+        from pdf.contents import extract_toc_text
+        with metrics.span('toc_extract'):
+            bookmark_text = extract_toc_text(pdf_file_path, workers=toc_workers)
+        if not bookmark_text:
+            raise ValueError("no contents page found in %s" % pdf_name)
+
+    # page labels need no offset.
+    by_label = options.get('by_label', False)
+    if by_label:
+        pages_offset = 0
+
+    if pages_offset is None:
+        from pdf.page_offset import detect_offset
+        with metrics.span('offset_detect'):
+            guess = detect_offset(pdf_file_path, reader_pool=options.get('reader_pool'))
+        if guess.offset is None or guess.confidence < min_offset_confidence:
+            raise ValueError("can't guess the page offset of %s, confidence %.2f" % (pdf_name, guess.confidence))
+        pages_offset = guess.offset
+        if verbose:
+            print("[+]: page offset %d, confidence %.2f" % (guess.offset, guess.confidence))
+
+    pages, levels = None, None
+    if toc_format:
+        from src.outline_import import import_outline
+        with metrics.span('toc_import', format=toc_format):
+            outline = import_outline(bookmark_text, toc_format, pages_offset)
+    elif validate is not None:
+        # the parse itself, the check needs the pages and levels written in the lines.
+        with metrics.span('parse'):
+            parsed  = parse_cache.parse(bookmark_text, (level0_re, level1_re, level2_re) if level_res is None else
+                                        level_res, other, by_label)
+            outline = parsed.to_outline(pages_offset)
+        pages, levels = list(parsed.written_pages(pages_offset)), parsed.levels
+    else:
+        with metrics.span('parse'):
+            outline = outline_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other, level_res,
+                                        cache=parse_cache, labels=by_label)
+
+    if not toc_format and parse_cache.misses != misses:
+        metrics.count('entries_classified', len(outline))
+
+    if validate is not None:
+        if on_issue is None and verbose:
+            on_issue = lambda issue: print("[-]: %s" % str(issue))
+        options['validate'] = OutlineCheck(validate, pages, levels, on_issue=on_issue)
+
+    # the pdf stack is imported on the first export, a parse error costs no PyPDF4 import.
+    from pdf.bookmark import add_bookmark
+    new_path = add_bookmark(pdf_file_path, outline, metrics=metrics, **options)
+    if validate is not None:
+        outline = options['validate'].outline
+    if verbose and isinstance(new_path, str):
+        print("[+]: %d bookmarks written to %s" % (len(outline), new_path))
+    return new_path
@@ -0,0 +1,299 @@
+'''
+Name:     batch.py
+Intro:    Add bookmarks to many PDF files with a process pool
+Author:   Sunic
+'''
+
+import csv
+import json
+import os
+import re
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.add_bookmark_wrapper import add_bookmark_wrapper
+from src.metrics import Metrics
+from src.outline_export import outline_stats
+from src.outline_import import guess_format
+from src.level_dict import get_level_res
+from src.parse_cache import get_parse_cache
+
+MANIFEST_FIELDS = ('pdf', 'toc', 'offset', 'level0', 'level1', 'level2', 'is_re')
+LEVEL_FIELD_RE  = re.compile(r'level(\d+)$')
+
+def _resolve(path, base_dir):
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.join(base_dir, path)
+
+def _to_job(row, base_dir, line_num):
+    job = {k: (row.get(k) if row.get(k) is not None else '') for k in MANIFEST_FIELDS}
+    job['line']   = line_num
+    job['pdf']    = _resolve(str(job['pdf']).strip(), base_dir)
+    job['toc']    = _resolve(str(job['toc']).strip(), base_dir)
+    job['offset'] = None if str(job['offset']).strip().lower() == 'auto' else int(job['offset'] or 0)
+    job['is_re']  = str(job['is_re']).strip().lower() in ('1', 'true', 'yes')
+
+    # level3, level4 ... are optional.
+    levels = sorted(int(match.group(1)) for match in map(LEVEL_FIELD_RE.match, filter(None, row)) if match)
+    job['levels'] = [row.get('level%d' % level) or '' for level in range(levels[-1] + 1)] if levels else []
+    return job
+
+def trim_toc(bookmark_text):
+    """
+    A toc text without its blank last lines, a file ending in a newline has no empty last bookmark.
+    """
+    lines = bookmark_text.split('\n')
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return '\n'.join(lines)
+
+def read_manifest(manifest_path):
+    """
+    Yield jobs from a manifest file one by one, so a huge manifest is never loaded at once.
+        :param manifest_path: a '.csv' file with a header row, or a '.jsonl' file with one object per line.
+                              The fields are: pdf, toc, offset, level0, level1, level2, is_re, and optional level3 ...
+                              An empty toc reads the contents pages of the pdf, a .json, .jsonl, .csv or
+                              pdftk dump_data toc is read with its own levels, an offset 'auto' is guessed
+                              from the page numbers printed on the pages.
+                              levelN are examples of src.level_dict, or expressions when is_re is set.
+                              Relative paths are relative to the manifest.
+    A row which can't be read, like an offset 'x', yields {'line', 'pdf', 'error'}, run_batch reports it as failed.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    with open(manifest_path, 'r', encoding='utf-8', newline='') as manifest:
+        if manifest_path.lower().endswith('.csv'):
+            rows = csv.DictReader(manifest)
+            for line_num, row in enumerate(rows, start=2):
+                yield _read_row(lambda: row, base_dir, line_num)
+        else:
+            for line_num, line in enumerate(manifest, start=1):
+                if line.strip():
+                    yield _read_row(partial(json.loads, line), base_dir, line_num)
+
+def _read_row(read, base_dir, line_num):
+    # one bad row fails alone, the rows after it still run.
+    row = None
+    try:
+        row = read()
+        return _to_job(row, base_dir, line_num)
+    except (ValueError, TypeError, AttributeError) as e:
+        pdf_path = row.get('pdf') if isinstance(row, dict) else None
+        return {'line': line_num, 'pdf': _resolve(str(pdf_path or '').strip(), base_dir),
+                'error': '%s: %s' % (type(e).__name__, e)}
+
+def _failed(job, error=None):
+    return {'line': job['line'], 'pdf': job['pdf'], 'ok': False, 'output': None, 'error': error or job['error'],
+            'stages': {}, 'seconds': 0.0}
+
+def run_job(job, options=None, parse_cache_dir=None):
+    """
+    Bookmark one PDF of the manifest. This runs in a worker process and never raises.
+        :param job: dict, like read_manifest() yields, with 'pool': True the readers of the reader pool
+                    of the process are lent, for the daemon, which sees the same files again.
+        :param options: dict, the keyword arguments of pdf.bookmark.add_bookmark.
+        :param parse_cache_dir: str, share the parsed bookmark texts through this directory.
+        :return: dict, the result of this job, with the seconds of each stage and the counters of src.metrics.
+    """
+    result = {'line': job['line'], 'pdf': job['pdf'], 'ok': False, 'output': None, 'error': None, 'stages': {}}
+    start  = time.perf_counter()
+
+    def on_event(event):
+        if event['event'] == 'span':
+            result['stages'][event['name']] = result['stages'].get(event['name'], 0) + event['seconds']
+        else:
+            result.update((k, v) for k, v in event.items() if k not in ('event', 'pdf', 'output'))
+
+    # a manifest opens each file once, a pool would only keep idle readers after the job.
+    reader_pool = None
+    if job.get('pool', False):
+        # imported in the worker, the main process only reads the manifest.
+        from pdf.reader_pool import get_reader_pool
+        reader_pool = get_reader_pool()
+
+    try:
+        # no toc file, read the contents pages of the pdf, this process is one of the pool already.
+        bookmark_text = job.get('toc_text')
+        toc_format    = job.get('toc_format')
+        if bookmark_text is None and job['toc']:
+            with open(job['toc'], 'r', encoding='utf-8') as toc_file:
+                bookmark_text = toc_file.read()
+            toc_format = toc_format or guess_format(job['toc'], bookmark_text)
+        if bookmark_text is not None:
+            bookmark_text = trim_toc(bookmark_text)
+
+        level_res = get_level_res(job['levels'], is_re=job['is_re'])
+
+        result['output'] = add_bookmark_wrapper(bookmark_text, job['offset'], job['pdf'],
+                                                level_res=level_res, verbose=False,
+                                                parse_cache=get_parse_cache(parse_cache_dir),
+                                                reader_pool=reader_pool,
+                                                metrics=Metrics(on_event), toc_workers=1, toc_format=toc_format,
+                                                on_issue=lambda issue: result.setdefault('issues', []).append(str(issue)),
+                                                **(options or {}))
+        result['bytes']  = os.path.getsize(job['pdf'])
+        result['ok']     = True
+
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _run_pool(func, items, workers, max_in_flight, on_result, failed, *args):
+    """
+    Call func(item, *args) for each item on a process pool, with at most max_in_flight items submitted
+    and not finished, and on_result(result) in this process as each one finishes.
+    An item whose worker died, like BrokenProcessPool, gets on_result(failed(item, error)) instead, and
+    the items after it go to a new pool.
+    """
+    workers       = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or workers * 2, 1)
+    pool          = ProcessPoolExecutor(max_workers=workers)
+    # {future: item}
+    pending       = {}
+
+    def finish(done):
+        for future in done:
+            item = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # func never raises itself, this is the pool.
+                result = failed(item, '%s: %s' % (type(e).__name__, e))
+            on_result(result)
+
+    try:
+        for item in items:
+            if len(pending) >= max_in_flight:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+            try:
+                future = pool.submit(func, item, *args)
+            except BrokenProcessPool:
+                # a broken pool takes no more items, its pending ones have failed already.
+                finish(wait(pending)[0])
+                pool.shutdown(wait=True)
+                pool   = ProcessPoolExecutor(max_workers=workers)
+                future = pool.submit(func, item, *args)
+            pending[future] = item
+
+        finish(wait(pending)[0])
+    finally:
+        pool.shutdown(wait=True)
+
+def run_batch(jobs, workers=None, max_in_flight=None, options=None, on_result=None, parse_cache_dir=None):
+    """
+    Run jobs on a process pool.
+        :param jobs: iterable of jobs, like read_manifest() yields.
+        :param workers: int, the number of processes, default is the cpu count.
+        :param max_in_flight: int, the most jobs submitted and not finished, bounds the memory of the pool.
+                              Default is two per worker.
+        :param options: dict, the keyword arguments of pdf.bookmark.add_bookmark, like {'incremental': True}.
+        :param on_result: callable(result), called in the main process as each job finishes.
+        :param parse_cache_dir: str, keep the parsed bookmark texts in this directory, a rerun with other
+                                offsets skips the parse.
+        :return: dict, the summary of this batch.
+    """
+    summary = {'total': 0, 'ok': 0, 'failed': 0, 'bytes': 0}
+    start   = time.perf_counter()
+
+    def collect(result):
+        summary['total'] += 1
+        if result['ok']:
+            summary['ok']    += 1
+            summary['bytes'] += result['bytes']
+        else:
+            summary['failed'] += 1
+        if on_result:
+            on_result(result)
+
+    def readable(jobs):
+        # the rows of the manifest which could not be read fail here, not in the pool.
+        for job in jobs:
+            if job.get('error'):
+                collect(_failed(job))
+            else:
+                yield job
+
+    _run_pool(run_job, readable(jobs), workers, max_in_flight, collect, _failed, options, parse_cache_dir)
+
+    summary['seconds']       = time.perf_counter() - start
+    summary['files_per_sec'] = summary['total'] / summary['seconds'] if summary['seconds'] else 0.0
+    summary['mb_per_sec']    = summary['bytes'] / 1048576 / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+def pdf_paths(paths):
+    """
+    Yield the pdf files among paths, the directories are walked.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith('.pdf'):
+                    yield os.path.join(dir_path, file_name)
+
+def audit_job(path):
+    """
+    Read the outline of one pdf file, in a worker process.
+        :return: dict, the result: pdf, ok, pages, bytes, seconds, the counts of src.outline_export.outline_stats,
+                 and error when not ok.
+    """
+    from PyPDF4 import PdfFileReader
+    from pdf.outline_reader import outline_from_reader
+    from pdf.page_tree import page_references
+
+    result = {'pdf': path, 'ok': False}
+    start  = time.perf_counter()
+
+    try:
+        with open(path, 'rb') as stream:
+            reader    = PdfFileReader(stream, strict=False)
+            page_refs = page_references(reader)
+            outline   = outline_from_reader(reader, page_refs)
+        result.update(outline_stats(outline, len(page_refs)))
+        result['pages'] = len(page_refs)
+        result['bytes'] = os.path.getsize(path)
+        result['ok']    = True
+
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _audit_failed(path, error):
+    return {'pdf': path, 'ok': False, 'error': error, 'seconds': 0.0}
+
+def run_audit(paths, workers=None, max_in_flight=None, on_result=None):
+    """
+    Read the outlines of many pdf files on a process pool.
+        :param paths: iterable of pdf paths, like pdf_paths() yields.
+        :param on_result: callable(result), called in the main process as each file is read, see audit_job.
+        :return: dict, the summary: total, ok, failed, no_outline, entries, seconds, files_per_sec.
+    """
+    summary = {'total': 0, 'ok': 0, 'failed': 0, 'no_outline': 0, 'entries': 0}
+    start   = time.perf_counter()
+
+    def collect(result):
+        summary['total'] += 1
+        if result['ok']:
+            summary['ok']         += 1
+            summary['entries']    += result['entries']
+            summary['no_outline'] += not result['entries']
+        else:
+            summary['failed'] += 1
+        if on_result:
+            on_result(result)
+
+    _run_pool(audit_job, paths, workers, max_in_flight, collect, _audit_failed)
+
+    summary['seconds']       = time.perf_counter() - start
+    summary['files_per_sec'] = summary['total'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
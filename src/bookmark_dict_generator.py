@@ -5,18 +5,14 @@ Convert a Bookmark text or list to bookmark index dict
 """
 
 import re
+from src.level_classifier import split_title_page
+from src.parse_cache import parse_text
 
 def split_page_num(bookmark):
     """
     split between title and page number
     """
-    bookmark = bookmark.strip()
-    bookmark_list = re.split(r'([-]?\d*$)', bookmark)
-
-    if len(bookmark_list) > 1:
-        return bookmark_list[0].rstrip(' .-'), int(bookmark_list[1] or 0)
-    
-    return bookmark_list[0], 0
+    return split_title_page(bookmark)
 
 def text_to_list(text):
     if  type(text) == list:
@@ -43,39 +39,29 @@ def check_level(title, level0_re, level1_re, level2_re, other=0):
 
     return other
 
-def _bookmark_dict_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0):
-    current_level0 = None
-    current_level1 = None
-    page_num       = 0
-    bookmark_dict  = {}
-
-    bookmark_list  = text_to_list(bookmark_text)
-
-    for index, bookmark in enumerate(bookmark_list):
-        title, num = split_page_num(bookmark)
-
-        page_num_temp = num + pages_offset
-
-        if page_num_temp > page_num:
-            page_num = page_num_temp
+def _outline_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0, level_res=None,
+                       cache=None, labels=False):
+    if level_res is None:
+        level_res = (level0_re, level1_re, level2_re)
 
-        bookmark_dict[index] = {'title': title, 'page_num': page_num}
+    if cache is not None:
+        return cache.outline(bookmark_text, pages_offset, level_res, other, labels)
 
-        level = check_level(title, level0_re, level1_re, level2_re, other)
+    return parse_text(text_to_list(bookmark_text), level_res, other, labels).to_outline(pages_offset)
 
-        if level == 2:
-            bookmark_dict[index]['parent'] = current_level1
+def _bookmark_dict_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0, level_res=None):
+    return _outline_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other, level_res).to_dict()
 
-        elif level == 1:
-            bookmark_dict[index]['parent'] = current_level0
-            current_level1 = index
-
-        elif level == 0:
-            current_level0 = index
-
-    return bookmark_dict
+def outline_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0, level_res=None,
+                      cache=None, labels=False):
+    """
+    convert bookmark text to a src.outline.Outline, the arguments are the same as bookmark_dict_generator.
+        :param: cache: src.parse_cache.ParseCache, reuse the parse of the same text and levels, whatever the offset.
+        :param: labels: bool, keep the printed page labels like 'xii' or 'A-3' at the end of the lines.
+    """
+    return _outline_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other, level_res, cache, labels)
 
-def bookmark_dict_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0):
+def bookmark_dict_generator(bookmark_text, pages_offset=0, level0_re=None, level1_re=None, level2_re=None, other=0, level_res=None):
     """
     convert bookmark text to dict.
         :param: bookmark_text: unicode, the directory text, usually copy from a bookstore like amazon.
@@ -83,7 +69,9 @@ def bookmark_dict_generator(bookmark_text, pages_offset=0, level0_re=None, level
         :param: level0_re: unicode, the expression to find level0 title.
         :param: level1_re: unicode, the expression to find level1 title.
         :param: level2_re: unicode, the expression to find level2 title.
-        :param: other    : int(0-2), three level can't match title, then this is the level.
+        :param: other    : int, no level can match title, then this is the level.
+        :param: level_res: list, the expressions of level0, level1, level2, level3 ... replace level0_re-level2_re.
+                           A title is a child of the nearest title before it with a lower level.
         :return: the dict of directory, like {0:{'title':'A', 'page_num':1}, 1:{'title':'B', page_num:2, parent: 0} ......}
     """
-    return _bookmark_dict_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other)
+    return _bookmark_dict_generator(bookmark_text, pages_offset, level0_re, level1_re, level2_re, other, level_res)
@@ -0,0 +1,310 @@
+'''
+Name:     daemon.py
+Intro:    A long running bookmark server on a Unix socket or a local TCP port, and its client
+Author:   Sunic
+'''
+
+import hmac
+import json
+import os
+import secrets
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.batch import run_job
+
+# a message is a JSON header line, then 'size' bytes of payload, like the bytes of a pdf file.
+MAX_HEADER     = 16 * 1024 * 1024
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'pdfbookmark.sock')
+DEFAULT_TOKEN  = os.path.join(os.path.expanduser('~'), '.pdfbookmark', 'daemon.token')
+# the add_bookmark options a client may set, the others like in_place or output could write any file.
+ALLOWED_OPTIONS = ('incremental', 'streaming', 'merge', 'validate', 'by_label')
+
+def write_message(wfile, header, payload=b''):
+    header = dict(header, size=len(payload))
+    wfile.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+    if payload:
+        wfile.write(payload)
+    wfile.flush()
+
+def read_message(rfile):
+    """
+        :return: (header dict, payload bytes), (None, b'') at the end of the stream.
+    """
+    line = rfile.readline(MAX_HEADER)
+    if not line:
+        return None, b''
+    header  = json.loads(line.decode('utf-8'))
+    size    = int(header.get('size', 0))
+    payload = rfile.read(size) if size else b''
+    if len(payload) != size:
+        raise ValueError("message cut short, %d of %d bytes" % (len(payload), size))
+    return header, payload
+
+def new_token(token_path=DEFAULT_TOKEN):
+    """
+    Make a token for a TCP server and keep it in a file only this user can read, for the clients.
+        :return: str, the token.
+    """
+    token = secrets.token_hex(16)
+    os.makedirs(os.path.dirname(token_path) or '.', exist_ok=True)
+    if os.path.exists(token_path):
+        os.remove(token_path)
+    with os.fdopen(os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as token_file:
+        token_file.write(token)
+    return token
+
+def read_token(token_path=DEFAULT_TOKEN):
+    with open(token_path, 'r') as token_file:
+        return token_file.read().strip()
+
+def to_job(request, pdf_path):
+    """
+    The run_job job of a request, like {'toc': 'text', 'offset': 4, 'levels': ['第1章', '1.1'], 'is_re': False}.
+    A missing toc reads the contents pages, an offset None or 'auto' is guessed from the page numbers.
+    A toc_format 'json', 'csv' or 'pdftk' reads the toc with its own levels, see src.outline_import.
+    """
+    offset = request.get('offset', 0)
+    return {'line': request.get('id'), 'pdf': pdf_path, 'toc': '', 'toc_text': request.get('toc'),
+            'offset': None if offset in (None, 'auto') else int(offset),
+            'levels': list(request.get('levels') or []), 'is_re': bool(request.get('is_re')),
+            'toc_format': request.get('toc_format')}
+
+def to_options(request):
+    """
+    The add_bookmark options of a request, only ALLOWED_OPTIONS.
+        :raise ValueError: for any other option.
+    """
+    options = request.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError("options must be an object")
+    refused = sorted(set(options) - set(ALLOWED_OPTIONS))
+    if refused:
+        raise ValueError("options not allowed: %s, the allowed ones are %s" %
+                         (', '.join(refused), ', '.join(ALLOWED_OPTIONS)))
+    return options
+
+
+def _warm():
+    # the jobs import the pdf stack on first use, a warm worker has it already.
+    import pdf.bookmark, pdf.contents, pdf.page_offset, pdf.reader_pool
+    return os.getpid()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # a connection sends any number of requests, one after the other.
+        while True:
+            try:
+                request, payload = read_message(self.rfile)
+            except ValueError as e:
+                write_message(self.wfile, {'ok': False, 'error': 'ValueError: %s' % e})
+                return
+            if request is None:
+                return
+            header, payload = self.server.bookmark.handle(request, payload)
+            write_message(self.wfile, header, payload)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+
+class BookmarkServer(object):
+    """
+    Keep warm worker processes, with the pdf stack imported and their parse caches and
+    reader pools filled, and bookmark the pdf files sent to the socket.
+
+    Usage:
+
+    >>> server = BookmarkServer(socket_path='/tmp/pdfbookmark.sock', workers=4)
+    >>> server.serve_forever()
+
+    # in another process:
+    >>> submit({'toc': '第1章 A 1', 'offset': 4, 'levels': ['第1章']}, pdf_path='a.pdf',
+    ...        socket_path='/tmp/pdfbookmark.sock')
+    {'ok': True, 'output': 'a_new.pdf', 'stages': {...}, 'seconds': 0.02 ...}
+
+    A request is a JSON header: the fields of to_job, and
+        pdf     : the path of the pdf file, or no pdf and the bytes of the file as payload.
+        options : the keyword arguments of pdf.bookmark.add_bookmark in ALLOWED_OPTIONS.
+        op      : 'bookmark', or 'stats' for the counters of the server.
+        token   : the token of the server, when it has one.
+    The response is the result of src.batch.run_job, with the bytes of the new file as payload
+    when the pdf was sent as bytes.
+
+    :param socket_path: str, the Unix socket, or None with address.
+    :param address: (host, port), a TCP address, only bind it to localhost. Any local user can connect to
+                    a port, so a TCP server needs a token; the Unix socket is only open to this user.
+    :param token: str, the token the requests must carry, a TCP server without one refuses to start.
+    :param workers: int, the worker processes, default is the cpu count.
+    :param max_queue: int, the jobs waiting for a worker, more are answered 'busy'. Default is two per worker.
+    :param parse_cache_dir: str, share the parsed bookmark texts of the workers through this directory.
+    """
+    def __init__(self, socket_path=None, address=None, workers=None, max_queue=None, parse_cache_dir=None,
+                 token=None):
+        if not socket_path and not address:
+            raise ValueError("a socket path or an address is needed")
+        if not socket_path and not token:
+            raise ValueError("a TCP server needs a token")
+
+        self.workers         = workers or os.cpu_count() or 1
+        self.max_queue       = self.workers * 2 if max_queue is None else max_queue
+        self.parse_cache_dir = parse_cache_dir
+        self.socket_path     = socket_path
+        self.token           = token
+        self.stats           = {'jobs': 0, 'succeeded': 0, 'failed': 0, 'busy': 0, 'in_flight': 0}
+
+        self._slots    = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock     = threading.Lock()
+        self._pool     = ProcessPoolExecutor(max_workers=self.workers)
+        self._temp_dir = tempfile.mkdtemp(prefix='pdfbookmark_')
+
+        # start the workers now, before the connection threads, so the first job doesn't wait for them.
+        for future in [self._pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            # only this user may send files to bookmark, the socket is made 0600, not changed after bind.
+            umask = os.umask(0o177)
+            try:
+                self._server = _UnixServer(socket_path, _Handler)
+            finally:
+                os.umask(umask)
+        else:
+            self._server = _TCPServer(tuple(address), _Handler)
+        self._server.bookmark = self
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def handle(self, request, payload=b''):
+        """
+        Run one request, in the thread of its connection.
+            :return: (response header, response payload)
+        """
+        if self.token and not hmac.compare_digest(str(request.get('token', '')).encode('utf-8'),
+                                                  self.token.encode('utf-8')):
+            return {'ok': False, 'error': 'PermissionError: wrong token', 'id': request.get('id')}, b''
+
+        if request.get('op', 'bookmark') == 'stats':
+            with self._lock:
+                return dict(self.stats, ok=True), b''
+
+        if not self._slots.acquire(blocking=False):
+            self._count(busy=1)
+            return {'ok': False, 'error': 'busy', 'id': request.get('id')}, b''
+
+        self._count(in_flight=1)
+        job_dir = None
+        try:
+            pdf_path = request.get('pdf')
+            if not pdf_path:
+                if not payload:
+                    return {'ok': False, 'error': 'ValueError: no pdf path or bytes', 'id': request.get('id')}, b''
+                job_dir  = tempfile.mkdtemp(dir=self._temp_dir)
+                pdf_path = os.path.join(job_dir, 'input.pdf')
+                with open(pdf_path, 'wb') as pdf_file:
+                    pdf_file.write(payload)
+
+            try:
+                job     = to_job(request, pdf_path)
+                options = to_options(request)
+            except (TypeError, ValueError) as e:
+                return {'ok': False, 'error': '%s: %s' % (type(e).__name__, e), 'id': request.get('id')}, b''
+            # a pooled reader would keep the removed temporary file open.
+            job['pool'] = job_dir is None
+
+            start  = time.perf_counter()
+            try:
+                result = self._pool.submit(run_job, job, options, self.parse_cache_dir).result()
+            except Exception as e:
+                # run_job never raises, this is the pool, like a worker killed.
+                result = {'line': job['line'], 'pdf': job['pdf'], 'ok': False, 'output': None, 'stages': {},
+                          'error': '%s: %s' % (type(e).__name__, e), 'seconds': 0}
+            result['id']           = request.get('id')
+            result['wait_seconds'] = time.perf_counter() - start - result['seconds']
+
+            output = b''
+            if job_dir and result['ok']:
+                with open(result['output'], 'rb') as output_file:
+                    output = output_file.read()
+                result['pdf'] = result['output'] = None
+
+            self._count(jobs=1, succeeded=int(result['ok']), failed=int(not result['ok']))
+            return result, output
+        finally:
+            self._count(in_flight=-1)
+            self._slots.release()
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """
+        Stop serve_forever, from another thread.
+        """
+        self._server.shutdown()
+
+    def close(self):
+        self._server.server_close()
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def connect(socket_path=None, address=None, timeout=None):
+    if socket_path:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        return client
+    return socket.create_connection(tuple(address), timeout)
+
+def submit(request, pdf_path=None, pdf_bytes=None, socket_path=None, address=None, timeout=None, token=None):
+    """
+    Send one request to a BookmarkServer and wait for the result.
+        :param request: dict, see BookmarkServer.
+        :param pdf_path: str, a pdf file the server can read, it writes the new file next to it.
+        :param pdf_bytes: bytes, the pdf file itself, the new file comes back as bytes.
+        :param token: str, the token of the server.
+        :return: (result dict, bytes of the new file or b'')
+    """
+    request = dict(request)
+    if pdf_path:
+        request['pdf'] = os.path.abspath(pdf_path)
+    if token:
+        request['token'] = token
+
+    with connect(socket_path, address, timeout) as client:
+        with client.makefile('rwb') as stream:
+            write_message(stream, request, pdf_bytes or b'')
+            result, output = read_message(stream)
+
+    if result is None:
+        raise ConnectionError("the server closed the connection")
+    return result, output
@@ -0,0 +1,109 @@
+'''
+Name:     level_classifier.py
+Intro:    Classify bookmark lines with precompiled level expressions
+Author:   Sunic
+'''
+
+import re
+
+from src.outline import clamp_page_num
+
+# a backreference would point to the wrong group once the patterns are joined.
+_BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+# a printed page label at the end of a line, lower case roman like 'xii', or letters and a number like 'A-3'.
+_LABEL_RE   = re.compile(r'^(?P<title>.*?)[\s.…·]+'
+                         r'(?P<label>(?=[ivxlc])c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})'
+                         r'|[A-Za-z]{1,3}-\d+|[A-Z]\d+)$')
+
+def split_title_page(line):
+    """
+    Split a line to title and page number, like re.split(r'([-]?\\d*$)', line) without a regex.
+        :return: (title, page_num), a page number past src.outline.MAX_PAGE_NUM is clamped to it.
+    """
+    line  = line.strip()
+    index = len(line)
+
+    while index and line[index - 1].isdecimal():
+        index -= 1
+
+    if index == len(line):
+        return line.rstrip(' .-'), 0
+
+    page_num = int(line[index:])
+    if index and line[index - 1] == '-':
+        index   -= 1
+        page_num = -page_num
+
+    return line[:index].rstrip(' .-'), clamp_page_num(page_num)
+
+def split_title_label(line):
+    """
+    Split a line to title, page number and page label, a label is kept for lines like 'Preface xii' or 'Appendix A-3'.
+        :return: (title, page_num, label), label is None for a page number, page_num is 0 for a label.
+    """
+    match = _LABEL_RE.match(line.strip())
+    if match:
+        return match.group('title').rstrip(' .-'), 0, match.group('label')
+
+    title, page_num = split_title_page(line)
+    return title, page_num, None
+
+
+class LevelClassifier(object):
+    """
+    Compile the level expressions once, and classify every line with a single match.
+
+    Usage:
+
+    >>> classifier = LevelClassifier(r'第\\d+章', r'\\d+\\.\\d+', None)
+    >>> classifier.parse('1.1 Title  12')
+    ('1.1 Title', 12, 1)
+
+    :param level_res: the expressions of level0, level1 ... the empty ones are skipped.
+    :param other: the level of titles no expression matches.
+    """
+    def __init__(self, *level_res, other=0):
+        self.level_res = level_res
+        self.other     = other
+
+        # the deepest level is checked first, like check_level does.
+        levels = [(level, level_re) for level, level_re in enumerate(level_res) if level_re][::-1]
+
+        self._match    = None
+        self._patterns = []
+
+        if not levels:
+            return
+
+        if not any(_BACKREF_RE.search(level_re) for _, level_re in levels):
+            pattern = '|'.join('(?P<l%d>%s)' % (level, level_re) for level, level_re in levels)
+            try:
+                self._match = re.compile(pattern).match
+                return
+            except re.error:
+                # inline flags or clashing group names, keep the patterns apart.
+                pass
+
+        self._patterns = [(level, re.compile(level_re)) for level, level_re in levels]
+
+    def level(self, title):
+        """
+        The level of a title.
+        """
+        if self._match:
+            match = self._match(title)
+            return int(match.lastgroup[1:]) if match else self.other
+
+        for level, pattern in self._patterns:
+            if pattern.match(title):
+                return level
+
+        return self.other
+
+    def parse(self, line):
+        """
+        Split a bookmark line and classify it.
+            :return: (title, page_num, level)
+        """
+        title, page_num = split_title_page(line)
+        return title, page_num, self.level(title)
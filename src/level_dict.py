@@ -23,7 +23,19 @@ level_dict = {
     'level2': {
         '1.1': r'\d+\.\d+',
         '1.1.1': r'\d+\.\d+\.\d+',
-    }
+    },
+    'level3': {
+        '1.1.1': r'\d+\.\d+\.\d+',
+        '1.1.1.1': r'\d+\.\d+\.\d+\.\d+',
+    },
+    'level4': {
+        '1.1.1.1': r'\d+\.\d+\.\d+\.\d+',
+        '1.1.1.1.1': r'\d+\.\d+\.\d+\.\d+\.\d+',
+    },
+    'level5': {
+        '1.1.1.1.1': r'\d+\.\d+\.\d+\.\d+\.\d+',
+        '1.1.1.1.1.1': r'\d+\.\d+\.\d+\.\d+\.\d+\.\d+',
+    },
 }
 
 def get_level_re(level, level_example, is_re=0):
@@ -42,6 +54,12 @@ def get_level_re(level, level_example, is_re=0):
 
     return level_re
 
+def get_level_res(level_examples, is_re=0):
+    """
+    The expressions of level0, level1 ... from their examples, like ['第1章', '1.1', '1.1.1', '1.1.1.1'].
+    """
+    return [get_level_re('level%d' % level, example, is_re) for level, example in enumerate(level_examples)]
+
 def main():
     print(get_level_re('level0', "第1章"))
     print(re.match(get_level_re('level0', "第1章"), "第2章"))
@@ -0,0 +1,132 @@
+'''
+Name:     metrics.py
+Intro:    Timed spans and counters of the bookmark pipeline, reported to a callback or a JSON line sink
+Author:   Sunic
+'''
+
+import json
+import sys
+import time
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class NullMetrics(object):
+    """
+    The metrics when nobody listens, every call is a no-op.
+    """
+    enabled = False
+
+    _span = _NullSpan()
+
+    def span(self, name, **fields):
+        return self._span
+
+    def count(self, name, value=1):
+        pass
+
+    def flush(self, **fields):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class _Span(object):
+    __slots__ = ('metrics', 'name', 'fields', 'start')
+
+    def __init__(self, metrics, name, fields):
+        self.metrics = metrics
+        self.name    = name
+        self.fields  = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event = {'event': 'span', 'name': self.name, 'seconds': time.perf_counter() - self.start}
+        if exc_type is not None:
+            event['error'] = exc_type.__name__
+        event.update(self.fields)
+        self.metrics.sink(event)
+        return False
+
+
+class Metrics(object):
+    """
+    Time the stages of the pipeline and count what they do.
+
+    Usage:
+
+    >>> metrics = Metrics(JsonLineSink('metrics.jsonl'))
+    >>> with metrics.span('serialize', path='a.pdf'):
+    ...     write()
+    >>> metrics.count('bytes_written', 1024)
+
+    # report the counters, and reset them:
+    >>> metrics.flush(path='a.pdf')
+
+    The spans of the pipeline are: toc_extract, offset_detect, toc_import, open, xref_parse, validate,
+    outline_read, page_copy, parse, outline_build, serialize and fsync. The counters are: entries_classified,
+    outline_issues, objects_written, bytes_written, and bookmarks_kept, bookmarks_updated and bookmarks_added
+    of a merge.
+
+    :param sink: callable(event), event is a dict like {'event': 'span', 'name': 'open', 'seconds': 0.01}
+                 or {'event': 'counters', 'bytes_written': 1024 ...}.
+    """
+    enabled = True
+
+    def __init__(self, sink):
+        self.sink     = sink
+        self.counters = {}
+
+    def span(self, name, **fields):
+        return _Span(self, name, fields)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def flush(self, **fields):
+        event = {'event': 'counters'}
+        event.update(fields)
+        event.update(self.counters)
+        self.counters = {}
+        self.sink(event)
+
+
+class JsonLineSink(object):
+    """
+    Write every event as one JSON line, to a path or an open text stream.
+    """
+    def __init__(self, output=None):
+        if output is None or hasattr(output, 'write'):
+            self.stream = output or sys.stderr
+            self._owned = False
+        else:
+            self.stream = open(output, 'a', encoding='utf-8')
+            self._owned = True
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        if self._owned:
+            self.stream.close()
+
+
+def get_metrics(metrics=None):
+    """
+    The metrics to use: metrics itself, a Metrics around a callable sink, or NULL_METRICS for None.
+    """
+    if metrics is None:
+        return NULL_METRICS
+    if callable(metrics) and not isinstance(metrics, (Metrics, NullMetrics)):
+        return Metrics(metrics)
+    return metrics
@@ -0,0 +1,173 @@
+'''
+Name:     outline.py
+Intro:    Compact array-backed outline, shared by the parser, the GUI and the writer
+Author:   Sunic
+'''
+
+from array import array
+from collections.abc import Mapping
+
+NO_INDEX = -1
+# the page numbers are kept in int arrays, a bigger number like an ISBN at the end of a line is clamped
+# to this, far past the last page of any file, where the writer clamps it to the last page.
+MAX_PAGE_NUM = 2 ** 30
+
+def clamp_page_num(page_num):
+    return max(-MAX_PAGE_NUM, min(page_num, MAX_PAGE_NUM))
+
+class Outline(Mapping):
+    """
+    An outline stored in parallel arrays, one slot per entry, in document order.
+    A parent always comes before its children.
+
+    Usage:
+
+    >>> outline = Outline()
+    >>> chapter = outline.append('Chapter 1', 1)
+    >>> outline.append('1.1 Section', 2, parent=chapter)
+    >>> list(outline.children(chapter))
+    [1]
+
+    It is also a read-only mapping like the old bookmark dict:
+
+    >>> outline[1]
+    {'title': '1.1 Section', 'page_num': 2, 'parent': 0}
+    """
+    __slots__ = ('titles', '_page_nums', '_parents', '_levels',
+                 '_first_child', '_last_child', '_next_sibling', '_first_root', '_last_root', '_labels')
+
+    def __init__(self):
+        self.titles        = []
+        self._page_nums    = array('i')
+        self._parents      = array('i')
+        self._levels       = array('H')
+        self._first_child  = array('i')
+        self._last_child   = array('i')
+        self._next_sibling = array('i')
+        self._first_root   = NO_INDEX
+        self._last_root    = NO_INDEX
+        # the printed page labels, only made when an entry has one.
+        self._labels       = None
+
+    def append(self, title, page_num, parent=None, label=None):
+        """
+        Add an entry after all others.
+            :param parent: int, index of the parent entry, None for a top level entry.
+            :param label: str, the printed page label like 'xii', found with pdf.page_labels instead of page_num.
+            :return: int, index of the new entry.
+        """
+        index  = len(self.titles)
+        parent = NO_INDEX if parent is None else parent
+
+        if label is not None and self._labels is None:
+            self._labels = [None] * index
+        if self._labels is not None:
+            self._labels.append(label)
+
+        self.titles.append(title)
+        self._page_nums.append(page_num if -MAX_PAGE_NUM <= page_num <= MAX_PAGE_NUM else clamp_page_num(page_num))
+        self._parents.append(parent)
+        self._levels.append(0 if parent == NO_INDEX else self._levels[parent] + 1)
+        self._first_child.append(NO_INDEX)
+        self._last_child.append(NO_INDEX)
+        self._next_sibling.append(NO_INDEX)
+
+        if parent == NO_INDEX:
+            if self._last_root == NO_INDEX:
+                self._first_root = index
+            else:
+                self._next_sibling[self._last_root] = index
+            self._last_root = index
+        else:
+            if self._last_child[parent] == NO_INDEX:
+                self._first_child[parent] = index
+            else:
+                self._next_sibling[self._last_child[parent]] = index
+            self._last_child[parent] = index
+
+        return index
+
+    def title(self, index):
+        return self.titles[index]
+
+    def page_num(self, index):
+        return self._page_nums[index]
+
+    def label(self, index):
+        return self._labels[index] if self._labels is not None else None
+
+    def set_page_num(self, index, page_num):
+        self._page_nums[index] = page_num
+
+    def parent(self, index):
+        parent = self._parents[index]
+        return None if parent == NO_INDEX else parent
+
+    def level(self, index):
+        return self._levels[index]
+
+    def first_child(self, index=None):
+        """
+        The first child of an entry, or the first top level entry when index is None.
+        """
+        child = self._first_root if index is None else self._first_child[index]
+        return None if child == NO_INDEX else child
+
+    def next_sibling(self, index):
+        sibling = self._next_sibling[index]
+        return None if sibling == NO_INDEX else sibling
+
+    def children(self, index=None):
+        """
+        Iterate the children indexes of an entry, or the top level entries when index is None.
+        """
+        child = self._first_root if index is None else self._first_child[index]
+        while child != NO_INDEX:
+            yield child
+            child = self._next_sibling[child]
+
+    # Mapping, the adapter of the old {index: {'title':..., 'page_num':..., 'parent':...}} dict.
+    def __getitem__(self, index):
+        if not isinstance(index, int) or not 0 <= index < len(self.titles):
+            raise KeyError(index)
+
+        value = {'title': self.titles[index], 'page_num': self._page_nums[index]}
+        if self._parents[index] != NO_INDEX:
+            value['parent'] = self._parents[index]
+        if self._labels is not None and self._labels[index] is not None:
+            value['label'] = self._labels[index]
+        return value
+
+    def __iter__(self):
+        return iter(range(len(self.titles)))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        return {index: self[index] for index in self}
+
+    @classmethod
+    def from_dict(cls, bookmark_dict):
+        """
+        Build an outline from a bookmark dict, like {0:{'title':'A', 'page_num':1}, 1:{'title':'B', page_num:2, parent: 0} ......}
+        """
+        if isinstance(bookmark_dict, cls):
+            return bookmark_dict
+
+        outline = cls()
+        if not bookmark_dict:
+            return outline
+
+        for index in range(max(bookmark_dict.keys()) + 1):
+            value  = bookmark_dict[index]
+            parent = value.get('parent')
+            # a parent must come first, else the entry goes to the top level.
+            if parent is not None and not 0 <= parent < index:
+                parent = None
+            outline.append(value.get('title', ''), value.get('page_num', 1), parent, value.get('label'))
+
+        return outline
@@ -0,0 +1,216 @@
+'''
+Name:     outline_check.py
+Intro:    Check an outline against the pages of the file before it is written, and fail, warn or fix
+Author:   Sunic
+'''
+
+from collections import namedtuple
+
+from src.outline import Outline
+
+KINDS    = ('out_of_range', 'backwards', 'orphan', 'empty_title', 'duplicate')
+POLICIES = ('fail', 'warn', 'fix')
+# the issues listed in the message of OutlineError.
+MAX_LISTED = 10
+
+class Issue(namedtuple('Issue', 'index kind title page_num message')):
+    """
+    One problem of an outline entry.
+        index   : int, the index of the entry in the outline checked.
+        kind    : one of KINDS.
+        page_num: int, the page written for the entry, None if it has none.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return "entry %d %r: %s" % (self.index, self.title, self.message)
+
+
+class OutlineError(ValueError):
+    """
+    Raised by the fail policy, before anything is written.
+        issues: list of Issue.
+    """
+    def __init__(self, issues):
+        self.issues = issues
+        lines       = [str(issue) for issue in issues[:MAX_LISTED]]
+        if len(issues) > MAX_LISTED:
+            lines.append("... %d more" % (len(issues) - MAX_LISTED))
+        super(OutlineError, self).__init__("%d outline issues:\n  %s" % (len(issues), '\n  '.join(lines)))
+
+
+def find_issues(outline, num_pages=None, pages=None, levels=None, kinds=KINDS):
+    """
+    Check the entries in one pass, in order.
+        out_of_range: the page is not in 1 ... num_pages.
+        backwards   : the page is before the page of an entry above it.
+        orphan      : the level asked is deeper than the entry got, like a 1.1.1 with no 1.1 before it,
+                      it is a child of the nearest entry above with a lower level.
+        empty_title : the title is empty, like a blank line of the text.
+        duplicate   : an entry above has the same title, page and level.
+        :param num_pages: int, the pages of the file, None skips the page checks, for page labels.
+        :param pages: list, the page written for each entry with the offset, None where none was written.
+                      The parser keeps the highest page so far for each line, so a page going back
+                      only shows here, see ParsedText.written_pages. Default is the page numbers of the outline.
+        :param levels: list, the level asked for each entry, like ParsedText.levels, None skips the orphan check.
+        :return: list of Issue, in the order of the entries.
+    """
+    issues = []
+    check  = set(kinds)
+    seen   = set()
+    # the highest page in range so far.
+    last   = 0
+    # looked up once, this runs for every entry of a big outline.
+    titles, page_of, level_of = outline.titles, outline.page_num, outline.level
+    if pages is None:
+        pages = [page_of(index) for index in range(len(outline))]
+
+    for index, title in enumerate(titles):
+        page_num = pages[index]
+        level    = level_of(index)
+
+        if not title:
+            if 'empty_title' in check:
+                issues.append(Issue(index, 'empty_title', title, page_num, "the title is empty"))
+        elif 'duplicate' in check:
+            key = (title, page_of(index), level)
+            if key in seen:
+                issues.append(Issue(index, 'duplicate', title, page_num,
+                                    "the same title, page and level as an entry above"))
+            seen.add(key)
+
+        if num_pages is not None and page_num is not None:
+            if not 1 <= page_num <= num_pages:
+                if 'out_of_range' in check:
+                    issues.append(Issue(index, 'out_of_range', title, page_num,
+                                        "page %d is not in the %d pages of the file" % (page_num, num_pages)))
+            else:
+                if page_num < last and 'backwards' in check:
+                    issues.append(Issue(index, 'backwards', title, page_num,
+                                        "page %d is before page %d of an entry above" % (page_num, last)))
+                last = max(last, page_num)
+
+        if levels is not None and levels[index] > level and 'orphan' in check:
+            issues.append(Issue(index, 'orphan', title, page_num,
+                                "level %d has no level %d entry above, it is put at level %d" %
+                                (levels[index], levels[index] - 1, level)))
+
+    return issues
+
+def fix_outline(outline, issues, num_pages=None, pages=None):
+    """
+    A new outline with the issues fixed, in one pass:
+        out_of_range: the page is clamped to the file, backwards: it takes the page above,
+        empty_title : the entry is dropped, its children go to its parent,
+        duplicate   : the entry is dropped, its children go to the first one,
+        orphan      : it stays under the nearest entry above with a lower level.
+        :param issues: list of Issue of find_issues with the same arguments, the ones to fix.
+        :return: src.outline.Outline
+    """
+    fixes  = {}
+    for issue in issues:
+        fixes.setdefault(issue.index, set()).add(issue.kind)
+
+    fixed  = Outline()
+    # the new index of each entry, for a dropped one the entry its children go to.
+    mapped = []
+    firsts = {}
+    last   = 0
+
+    for index in range(len(outline)):
+        title    = outline.title(index)
+        page_num = outline.page_num(index)
+        parent   = outline.parent(index)
+        parent   = None if parent is None else mapped[parent]
+        kinds    = fixes.get(index, ())
+        key      = (title, page_num, outline.level(index))
+
+        if 'empty_title' in kinds:
+            mapped.append(parent)
+            continue
+        if 'duplicate' in kinds and key in firsts:
+            mapped.append(firsts[key])
+            continue
+
+        # the page written, the parser may have carried a page fixed here to the entries below.
+        written  = page_num if pages is None else pages[index]
+        if written is None:
+            written = last or page_num
+        if 'out_of_range' in kinds:
+            page_num = max(1, written if num_pages is None else min(written, num_pages))
+        elif 'backwards' in kinds:
+            page_num = last
+        else:
+            page_num = written
+
+        new_index = fixed.append(title, page_num, parent, outline.label(index))
+        mapped.append(new_index)
+        firsts.setdefault(key, new_index)
+        last = max(last, page_num)
+
+    return fixed
+
+def _policies(policy):
+    policies = dict.fromkeys(KINDS, policy) if isinstance(policy, str) else dict.fromkeys(KINDS, 'warn')
+    if not isinstance(policy, str):
+        policies.update(policy)
+    for kind, value in policies.items():
+        if kind not in KINDS or value not in POLICIES:
+            raise ValueError("unknown outline check policy %r: %r, the kinds are %s and the policies %s" %
+                             (kind, value, ', '.join(KINDS), ', '.join(POLICIES)))
+    return policies
+
+def check_outline(outline, num_pages=None, policy='fail', pages=None, levels=None, kinds=KINDS):
+    """
+    Find the issues of an outline and apply the policy of each.
+        :param policy: one of POLICIES for all kinds, or a dict {kind: policy}, the kinds not in it warn.
+                       fail raises OutlineError, warn only reports, fix returns a fixed outline.
+        :param num_pages, pages, levels, kinds: see find_issues.
+        :return: (outline, list of Issue), the outline is a new one if some issues were fixed.
+    """
+    policies = _policies(policy)
+    issues   = find_issues(outline, num_pages, pages, levels, kinds)
+
+    failed   = [issue for issue in issues if policies[issue.kind] == 'fail']
+    if failed:
+        raise OutlineError(failed)
+
+    to_fix   = [issue for issue in issues if policies[issue.kind] == 'fix']
+    if to_fix:
+        outline = fix_outline(outline, to_fix, num_pages, pages)
+    return outline, issues
+
+
+class OutlineCheck(object):
+    """
+    The check of pdf.bookmark.add_bookmark, called with the outline once the pages of the file are known,
+    before they are copied.
+
+    Usage:
+
+    >>> parsed = parse_text(lines, level_res)
+    >>> check  = OutlineCheck('fix', pages=list(parsed.written_pages(offset)), levels=parsed.levels)
+    >>> add_bookmark('/home/sun/test.pdf', parsed.to_outline(offset), validate=check)
+    >>> check.issues
+    """
+    def __init__(self, policy='fail', pages=None, levels=None, kinds=KINDS, on_issue=None):
+        """
+            :param on_issue: callable(Issue), called for each issue found which does not fail.
+        """
+        _policies(policy)
+        self.policy   = policy
+        self.pages    = pages
+        self.levels   = levels
+        self.kinds    = kinds
+        self.on_issue = on_issue
+        self.issues   = []
+        # the outline checked, or fixed, once called.
+        self.outline  = None
+
+    def __call__(self, outline, num_pages=None):
+        self.outline, self.issues = check_outline(outline, num_pages, self.policy, self.pages, self.levels,
+                                                  self.kinds)
+        if self.on_issue is not None:
+            for issue in self.issues:
+                self.on_issue(issue)
+        return self.outline
@@ -0,0 +1,85 @@
+'''
+Name:     outline_export.py
+Intro:    Write an outline as a bookmark text, JSON, JSONL or CSV, the formats src.outline_import reads back
+Author:   Sunic
+'''
+
+import csv
+import json
+
+FORMATS = ('text', 'json', 'jsonl', 'csv')
+
+def _entries(outline, pages_offset=0):
+    """
+    Yield (level, title, page) in order, page is None for an entry without a page.
+    """
+    for index in range(len(outline)):
+        page_num = outline.page_num(index)
+        yield outline.level(index), outline.title(index), page_num - pages_offset if page_num > 0 else None
+
+def write_text(outline, stream, pages_offset=0, indent=''):
+    """
+    'title page' lines, the bookmark text of src.bookmark_dict_generator.
+        :param indent: str, written once per level before the title, the parser ignores it.
+    """
+    for level, title, page in _entries(outline, pages_offset):
+        stream.write('%s%s %d\n' % (indent * level, title, page) if page is not None else
+                     '%s%s\n' % (indent * level, title))
+
+def write_jsonl(outline, stream, pages_offset=0):
+    for level, title, page in _entries(outline, pages_offset):
+        stream.write(json.dumps({'title': title, 'page': page, 'level': level}, ensure_ascii=False) + '\n')
+
+def write_json(outline, stream, pages_offset=0):
+    # a list of entries, one a line, so a big outline is never held as one string.
+    stream.write('[')
+    for index, (level, title, page) in enumerate(_entries(outline, pages_offset)):
+        stream.write(',\n' if index else '\n')
+        stream.write(json.dumps({'title': title, 'page': page, 'level': level}, ensure_ascii=False))
+    stream.write('\n]\n')
+
+def write_csv(outline, stream, pages_offset=0):
+    writer = csv.writer(stream, lineterminator='\n')
+    writer.writerow(('level', 'title', 'page'))
+    writer.writerows((level, title, '' if page is None else page)
+                     for level, title, page in _entries(outline, pages_offset))
+
+WRITERS = {'text': write_text, 'json': write_json, 'jsonl': write_jsonl, 'csv': write_csv}
+
+def write_outline(outline, stream, fmt='text', pages_offset=0):
+    """
+    Write an outline to a text stream.
+        :param outline: src.outline.Outline, a page number 0 is an entry without a page.
+        :param fmt: one of FORMATS.
+        :param pages_offset: int, subtracted from the page numbers, to write the printed page numbers.
+    """
+    if fmt not in WRITERS:
+        raise ValueError("unknown outline format %r, one of %s" % (fmt, ', '.join(FORMATS)))
+    WRITERS[fmt](outline, stream, pages_offset)
+
+def outline_stats(outline, num_pages=None):
+    """
+    The summary of an outline for an audit.
+        :param num_pages: int, the pages of the file, to count the entries past its end.
+        :return: dict, entries, depth, no_page (entries without a page), out_of_range,
+                 backwards (entries on an earlier page than the entry before them), empty_titles.
+    """
+    stats = {'entries': len(outline), 'depth': 0, 'no_page': 0, 'out_of_range': 0, 'backwards': 0,
+             'empty_titles': 0}
+    last  = 0
+
+    for index in range(len(outline)):
+        page_num = outline.page_num(index)
+        stats['depth'] = max(stats['depth'], outline.level(index) + 1)
+        if not outline.title(index):
+            stats['empty_titles'] += 1
+        if page_num <= 0:
+            stats['no_page'] += 1
+            continue
+        if num_pages is not None and page_num > num_pages:
+            stats['out_of_range'] += 1
+        if page_num < last:
+            stats['backwards'] += 1
+        last = page_num
+
+    return stats
@@ -0,0 +1,318 @@
+'''
+Name:     outline_import.py
+Intro:    Read outlines which know their levels already, JSON, JSONL, CSV and pdftk dump_data, without classifying
+Author:   Sunic
+'''
+
+import csv
+import html
+import json
+import os
+from itertools import chain
+
+from src.outline import Outline
+
+FORMATS      = ('json', 'csv', 'pdftk')
+EXTENSIONS   = {'.json': 'json', '.jsonl': 'json', '.ndjson': 'json', '.csv': 'csv'}
+# the first keys of a pdftk dump_data file.
+PDFTK_KEYS   = ('InfoBegin', 'InfoKey', 'PdfID0', 'PdfID1', 'NumberOfPages', 'BookmarkBegin', 'PageMediaBegin',
+                'PageLabelBegin')
+
+TITLE_FIELDS = ('title', 'name', 'text')
+PAGE_FIELDS  = ('page', 'page_num', 'pagenumber')
+LEVEL_FIELDS = ('level', 'depth', 'indent')
+# the JSONL lines decoded at once.
+JSONL_CHUNK  = 1024
+
+class _Builder(object):
+    """
+    Append entries by level or by parent. An entry without a page number keeps the page before it,
+    an entry without a level or parent is a top level entry.
+    """
+    def __init__(self, pages_offset=0):
+        self.outline      = Outline()
+        self.pages_offset = pages_offset
+        # (level, index) of the open ancestors, the levels are strictly increasing.
+        self.parents      = []
+
+    def add(self, title, page=None, level=None, parent=None, label=None):
+        outline = self.outline
+        parents = self.parents
+        index   = len(outline.titles)
+
+        if page is None or page == '':
+            page_num = outline.page_num(index - 1) if index else 1 + self.pages_offset
+        else:
+            page_num = int(page) + self.pages_offset
+
+        if parent is None:
+            level = int(level) if level else 0
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            parent = parents[-1][1] if parents else None
+        else:
+            # a parent must come first, else the entry goes to the top level.
+            parent = parent if 0 <= parent < index else None
+            level  = 0 if parent is None else outline.level(parent) + 1
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+        parents.append((level, index))
+
+        return outline.append(title.strip() if isinstance(title, str) else str(title), page_num, parent,
+                              None if label in (None, '') else str(label))
+
+
+def _field(entry, names):
+    for name in names:
+        if name in entry:
+            return entry[name]
+    return None
+
+def _lines(source):
+    """
+    The lines of a text, a list of lines or a text file.
+    """
+    if isinstance(source, str):
+        return source.splitlines()
+    return source
+
+def outline_from_json(source, pages_offset=0):
+    """
+    Read a JSON outline, the entries are objects with the fields:
+        title, page (or page_num), label,
+        level : int, 0 for a top level entry, a child of the nearest entry before it with a lower level;
+        parent: the id of an earlier entry, or its index when the entries have no id;
+        children: a list of the child entries, nested.
+    The file is a list of entries, a dict like {'0': entry, '1': entry ...} as the bookmark dict,
+    or JSONL, one entry a line, which is read a line at a time.
+        :param source: str, the text, or a list of lines or a text file.
+        :param pages_offset: int, added to the page numbers.
+        :return: src.outline.Outline
+    """
+    builder = _Builder(pages_offset)
+
+    if not isinstance(source, str):
+        lines = iter(source)
+        first = next((line for line in lines if line.strip()), '')
+        if _is_json_line(first):
+            # JSONL is read a line at a time.
+            _add_json_lines(builder, chain([first], lines))
+            return builder.outline
+        source = '\n'.join(line.rstrip('\n') for line in chain([first], lines))
+
+    try:
+        value = json.loads(source)
+    except ValueError:
+        _add_json_lines(builder, source.splitlines())
+        return builder.outline
+
+    if isinstance(value, dict) and not _field(value, TITLE_FIELDS):
+        # the bookmark dict, keyed by index.
+        value = [value[key] for key in sorted(value, key=int)]
+    elif isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError("a JSON outline is a list of entries, not %s" % type(value).__name__)
+
+    _add_tree(builder, value)
+    return builder.outline
+
+def _is_json_line(line):
+    # an entry of JSONL, not the first line of a JSON document or a bookmark dict.
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(value, dict) and _field(value, TITLE_FIELDS) is not None
+
+def _add_json_lines(builder, lines):
+    ids   = {}
+    chunk = []
+    nums  = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(line)
+        nums.append(line_num)
+        if len(chunk) == JSONL_CHUNK:
+            _add_json_chunk(builder, chunk, nums, ids)
+            chunk, nums = [], []
+    _add_json_chunk(builder, chunk, nums, ids)
+
+def _add_json_chunk(builder, chunk, nums, ids):
+    # one decode of many lines costs about as much as one of a single line.
+    try:
+        entries = json.loads('[' + ','.join(chunk) + ']')
+    except ValueError:
+        for line_num, line in zip(nums, chunk):
+            try:
+                json.loads(line)
+            except ValueError as e:
+                raise ValueError("line %d: %s" % (line_num, e))
+        raise
+    for entry in entries:
+        _add_entry(builder, entry, ids)
+
+def _add_entry(builder, entry, ids, parent=None):
+    if not isinstance(entry, dict):
+        raise ValueError("an outline entry is an object, not %s" % type(entry).__name__)
+
+    get   = entry.get
+    title = get('title')
+    page  = get('page')
+    level = get('level')
+    if title is None:
+        title = _field(entry, TITLE_FIELDS) or ''
+    if page is None:
+        page  = _field(entry, PAGE_FIELDS)
+    if level is None:
+        level = _field(entry, LEVEL_FIELDS)
+
+    if parent is None and get('parent') is not None:
+        parent = ids.get(entry['parent']) if ids else int(entry['parent'])
+    index = builder.add(title, page, level, parent, get('label'))
+    if get('id') is not None:
+        ids[entry['id']] = index
+    return index
+
+def _add_tree(builder, entries):
+    ids   = {}
+    # (iterator of the siblings, their parent index), walked without recursion.
+    stack = [(iter(entries), None)]
+    while stack:
+        siblings, parent = stack[-1]
+        for entry in siblings:
+            index = _add_entry(builder, entry, ids, parent)
+            if entry.get('children'):
+                stack.append((iter(entry['children']), index))
+                break
+        else:
+            stack.pop()
+
+def outline_from_csv(source, pages_offset=0):
+    """
+    Read a CSV outline. With a header, the columns are:
+        title, page (or page_num), label, parent (the index of an earlier row),
+        level (or depth, indent): int, 0 for a top level entry.
+    Without a header the columns are level, title, page, like '1,1.1 Background,5'.
+        :param source: str, the text, or a list of lines or a text file.
+        :return: src.outline.Outline
+    """
+    builder = _Builder(pages_offset)
+    rows    = csv.reader(_lines(source))
+    header  = next(rows, None)
+    if header is None:
+        return builder.outline
+
+    names = [name.strip().lower() for name in header]
+    if not set(names) & set(TITLE_FIELDS):
+        rows, names = chain([header], rows), ['level', 'title', 'page', 'label']
+
+    # the column of each field, found once, -1 for a missing one.
+    title, page, level, label, parent = (_column(names, fields) for fields in
+                                         (TITLE_FIELDS, PAGE_FIELDS, LEVEL_FIELDS, ('label',), ('parent',)))
+    width = len(names)
+    add   = builder.add
+
+    for row in rows:
+        if len(row) < width:
+            if not any(cell.strip() for cell in row):
+                continue
+            row += [''] * (width - len(row))
+        row.append('')
+        add(row[title], row[page].strip() or None, row[level].strip() or None,
+            int(row[parent]) if row[parent].strip() else None, row[label].strip())
+
+    return builder.outline
+
+def _column(names, fields):
+    for field in fields:
+        if field in names:
+            return names.index(field)
+    return -1
+
+def outline_from_pdftk(source, pages_offset=0):
+    """
+    Read the bookmarks of a pdftk dump_data file:
+        BookmarkBegin
+        BookmarkTitle: Chapter 1
+        BookmarkLevel: 1
+        BookmarkPageNumber: 3
+    The other records are skipped, the titles may have HTML entities like &#20013;.
+        :param source: str, the text, or a list of lines or a text file.
+        :return: src.outline.Outline
+    """
+    builder  = _Builder(pages_offset)
+    bookmark = None
+
+    for line in _lines(source):
+        line = line.rstrip('\r\n')
+        # a record begins with a line like 'BookmarkBegin', a title like 'Where to Begin' has a key.
+        if ':' not in line and line.strip().endswith('Begin'):
+            # a bookmark ends where the next record begins.
+            if bookmark is not None:
+                _add_pdftk(builder, bookmark)
+            bookmark = {} if line.strip() == 'BookmarkBegin' else None
+            continue
+        if bookmark is None:
+            continue
+
+        key, _, value = line.partition(':')
+        if key == 'BookmarkTitle':
+            bookmark['title'] = html.unescape(value[1:] if value.startswith(' ') else value)
+        elif key == 'BookmarkLevel':
+            bookmark['level'] = int(value)
+        elif key == 'BookmarkPageNumber':
+            bookmark['page']  = int(value)
+
+    if bookmark is not None:
+        _add_pdftk(builder, bookmark)
+    return builder.outline
+
+def _add_pdftk(builder, bookmark):
+    # the levels of pdftk start at 1, a page 0 is a bookmark without a page.
+    builder.add(bookmark.get('title', ''), bookmark.get('page') or None, bookmark.get('level', 1) - 1)
+
+IMPORTERS = {'json': outline_from_json, 'csv': outline_from_csv, 'pdftk': outline_from_pdftk}
+
+def guess_format(path=None, text=None):
+    """
+    The format of a bookmark file, by its extension, or by its first line for pdftk.
+        :param text: str or list of lines, the content, or its first lines.
+        :return: one of FORMATS, None for a bookmark text.
+    """
+    if path:
+        fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if fmt:
+            return fmt
+
+    if text is None and path:
+        with open(path, 'r', encoding='utf-8') as toc_file:
+            text = toc_file.readline()
+    lines = _lines(text or '')
+    first = next((line.strip() for line in lines if line.strip()), '')
+    if first.split(':')[0] in PDFTK_KEYS:
+        return 'pdftk'
+    return None
+
+def import_outline(source, fmt, pages_offset=0):
+    """
+    Read an outline of one of FORMATS.
+        :param source: str, the text, or a list of lines or a text file.
+        :return: src.outline.Outline
+    """
+    if fmt not in IMPORTERS:
+        raise ValueError("unknown outline format %r, one of %s" % (fmt, ', '.join(FORMATS)))
+    return IMPORTERS[fmt](source, pages_offset)
+
+def read_outline(path, fmt=None, pages_offset=0):
+    """
+    Read an outline file, the format is guessed from the file unless given.
+        :return: src.outline.Outline
+    """
+    fmt = fmt or guess_format(path)
+    if fmt is None:
+        raise ValueError("%s is not a JSON, CSV or pdftk outline" % path)
+    with open(path, 'r', encoding='utf-8', newline='' if fmt == 'csv' else None) as toc_file:
+        return import_outline(toc_file, fmt, pages_offset)
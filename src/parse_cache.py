@@ -0,0 +1,227 @@
+'''
+Name:     parse_cache.py
+Intro:    Cache the parse of bookmark texts, the pages offset is applied on each lookup
+Author:   Sunic
+'''
+
+import hashlib
+import json
+import os
+from array import array
+from collections import OrderedDict
+
+from src.level_classifier import LevelClassifier, split_title_label
+from src.outline import Outline, NO_INDEX
+
+# bump this when the parse changes, the old files on disk are ignored then.
+CACHE_VERSION = 1
+
+class ParsedText(object):
+    """
+    The offset-free parse of a bookmark text, one slot per line.
+        titles  : the titles.
+        nums    : the page numbers written in the lines.
+        levels  : the levels found by the classifier.
+        parents : the parent indexes, NO_INDEX for a top level line.
+        max_nums: the running max of nums, a line without a page number keeps the page before it.
+        labels  : the printed page labels like 'xii', None unless parsed with labels.
+    """
+    __slots__ = ('titles', 'nums', 'levels', 'parents', 'max_nums', 'labels')
+
+    def __init__(self):
+        self.titles   = []
+        self.nums     = array('i')
+        self.levels   = array('i')
+        self.parents  = array('i')
+        self.max_nums = array('i')
+        self.labels   = None
+
+    def __len__(self):
+        return len(self.titles)
+
+    def page_nums(self, pages_offset=0):
+        """
+        Iterate the page numbers with the offset, the same as outline_generator gives.
+        """
+        # max(0, n0 + offset, n1 + offset ...) == max(0, max(n0, n1 ...) + offset)
+        return (max(0, max_num + pages_offset) for max_num in self.max_nums)
+
+    def written_pages(self, pages_offset=0):
+        """
+        Iterate the page numbers written in the lines with the offset, None for a line without one,
+        the pages src.outline_check looks at before the running max hides them.
+        """
+        return (num + pages_offset if num else None for num in self.nums)
+
+    def to_outline(self, pages_offset=0):
+        outline = Outline()
+        labels  = self.labels or [None] * len(self.titles)
+        for title, page_num, parent, label in zip(self.titles, self.page_nums(pages_offset), self.parents, labels):
+            outline.append(title, page_num, None if parent == NO_INDEX else parent, label)
+        return outline
+
+    def to_json(self):
+        return {'titles': self.titles, 'nums': self.nums.tolist(), 'levels': self.levels.tolist(),
+                'parents': self.parents.tolist(), 'max_nums': self.max_nums.tolist(), 'labels': self.labels}
+
+    @classmethod
+    def from_json(cls, value):
+        parsed = cls()
+        parsed.titles = list(value['titles'])
+        parsed.labels = value.get('labels')
+        for name in ('nums', 'levels', 'parents', 'max_nums'):
+            getattr(parsed, name).extend(value[name])
+        return parsed
+
+
+def parse_text(bookmark_text, level_res=(), other=0, labels=False):
+    """
+    Parse a bookmark text or list of lines in one pass.
+        :param labels: bool, keep page labels like 'xii' or 'A-3' at the end of the lines, see split_title_label.
+        :return: ParsedText
+    """
+    lines      = bookmark_text if isinstance(bookmark_text, list) else bookmark_text.split('\n')
+    classifier = LevelClassifier(*level_res, other=other)
+    parsed     = ParsedText()
+    # (level, index) of the open ancestors, the levels are strictly increasing.
+    parents    = []
+    max_num    = None
+
+    if labels:
+        parsed.labels = []
+
+    for index, line in enumerate(lines):
+        if labels:
+            title, num, label = split_title_label(line)
+            level             = classifier.level(title)
+            parsed.labels.append(label)
+        else:
+            title, num, level = classifier.parse(line)
+
+        if max_num is None or num > max_num:
+            max_num = num
+
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+
+        parsed.titles.append(title)
+        parsed.nums.append(num)
+        parsed.levels.append(level)
+        parsed.parents.append(parents[-1][1] if parents else NO_INDEX)
+        parsed.max_nums.append(max_num)
+        parents.append((level, index))
+
+    return parsed
+
+
+class ParseCache(object):
+    """
+    LRU cache of ParsedText, keyed by the text and the level settings but not the offset,
+    so changing the offset never parses again.
+
+    Usage:
+
+    >>> cache = ParseCache(directory='~/.pdfbookmark/parse')
+    >>> outline = cache.outline(text, 4, level_res=[r'第\\d+章', r'\\d+\\.\\d+'])
+
+    :param max_entries: int, the most texts kept in memory.
+    :param directory: str, keep the parses in this directory too, so other processes and later runs reuse them.
+    """
+    def __init__(self, max_entries=16, directory=None):
+        self.max_entries = max(max_entries, 1)
+        self.directory   = os.path.expanduser(directory) if directory else None
+        self._entries    = OrderedDict()
+        self.hits        = 0
+        self.misses      = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(bookmark_text, level_res=(), other=0, labels=False):
+        lines   = bookmark_text if isinstance(bookmark_text, list) else bookmark_text.split('\n')
+        setting = json.dumps([CACHE_VERSION, list(level_res), other] + (['labels'] if labels else []))
+        digest  = hashlib.sha1(setting.encode('utf-8'))
+        for line in lines:
+            digest.update(b'\n' + line.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as cache_file:
+                return ParsedText.from_json(json.load(cache_file))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _store(self, key, parsed):
+        if not self.directory:
+            return
+        # write a temporary file first, a reader never sees half a file.
+        path      = self._path(key)
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(parsed.to_json(), cache_file, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def parse(self, bookmark_text, level_res=(), other=0, labels=False):
+        """
+        The ParsedText of a text, from memory, from the directory, or parsed now.
+        """
+        level_res = tuple(level_res or ())
+        key       = self.key(bookmark_text, level_res, other, labels)
+        parsed    = self._entries.get(key)
+
+        if parsed is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return parsed
+
+        parsed = self._load(key)
+        if parsed is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            parsed = parse_text(bookmark_text, level_res, other, labels)
+            self._store(key, parsed)
+
+        self._entries[key] = parsed
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return parsed
+
+    def outline(self, bookmark_text, pages_offset=0, level_res=(), other=0, labels=False):
+        """
+        The same Outline as src.bookmark_dict_generator.outline_generator.
+        """
+        return self.parse(bookmark_text, level_res, other, labels).to_outline(pages_offset)
+
+    def clear(self, disk=False):
+        """
+        Drop the parses in memory, and the files in the directory when disk is set.
+        """
+        self._entries.clear()
+        if disk and self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+_caches = {}
+
+def get_parse_cache(directory=None):
+    """
+    The shared ParseCache of this process, one per directory.
+    """
+    directory = os.path.expanduser(directory) if directory else None
+    if directory not in _caches:
+        _caches[directory] = ParseCache(directory=directory)
+    return _caches[directory]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+Small pdf files for the tests, made with PyPDF4.
+"""
+
+import pytest
+from PyPDF4 import PdfFileWriter
+from PyPDF4.generic import ArrayObject, DictionaryObject, NameObject, NumberObject, TextStringObject
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """
+    make_pdf(pages, bookmarks=(), labels=(), name='book.pdf') writes a file of blank pages and gives its path.
+        bookmarks: (title, page index, parent index or None) in order, the parent is an earlier bookmark.
+        labels   : (start, style, prefix) of the /PageLabels ranges.
+    """
+    def make(pages=10, bookmarks=(), labels=(), name='book.pdf'):
+        writer = PdfFileWriter()
+        for _ in range(pages):
+            writer.addBlankPage(200, 200)
+
+        refs = []
+        for title, page, parent in bookmarks:
+            refs.append(writer.addBookmark(title, page, None if parent is None else refs[parent]))
+
+        if labels:
+            nums = ArrayObject()
+            for start, style, prefix in labels:
+                label = DictionaryObject()
+                if style:
+                    label[NameObject('/S')] = NameObject(style)
+                if prefix:
+                    label[NameObject('/P')] = TextStringObject(prefix)
+                nums.extend([NumberObject(start), label])
+            writer._root_object[NameObject('/PageLabels')] = DictionaryObject({NameObject('/Nums'): nums})
+
+        path = tmp_path / name
+        with open(path, 'wb') as pdf_file:
+            writer.write(pdf_file)
+        return str(path)
+
+    return make
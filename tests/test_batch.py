@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""
+The process pool of the batch and audit runs, see src.batch.
+"""
+
+import os
+
+from src.batch import _run_pool, run_audit
+
+
+def _crash(item):
+    if item == 'crash':
+        # a worker killed, like by a segfault or the OOM killer.
+        os._exit(1)
+    return {'item': item, 'ok': True}
+
+
+def _failed(item, error):
+    return {'item': item, 'ok': False, 'error': error}
+
+
+def test_dead_worker_fails_its_item_only():
+    results = []
+    _run_pool(_crash, ['a', 'crash', 'b', 'c'], 1, 1, results.append, _failed)
+
+    assert [(result['item'], result['ok']) for result in results] == \
+           [('a', True), ('crash', False), ('b', True), ('c', True)]
+    assert results[1]['error'].startswith('BrokenProcessPool')
+
+
+def test_audit_reports_each_file(make_pdf, tmp_path):
+    results = []
+    missing = str(tmp_path / 'missing.pdf')
+    summary = run_audit([make_pdf(3, [('A', 0, None), ('B', 2, None)]), missing], workers=1,
+                        on_result=results.append)
+
+    assert (summary['total'], summary['ok'], summary['failed'], summary['entries']) == (2, 1, 1, 2)
+    assert [result['pdf'] for result in results if not result['ok']] == [missing]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+"""
+The bookmark lines read from a contents page, see pdf.contents.toc_entries.
+"""
+
+from pdf.contents import toc_entries
+
+
+def test_numbered_chapter_lines():
+    lines = ['Contents',
+             'Chapter 1 ........ 5',
+             '1.1 Intro ..... 6',
+             '1.2 Where to go 9',
+             'Part 2 .... 30',
+             'Chapter 2 · · · 31']
+    entries, found = toc_entries(lines)
+    assert found
+    assert entries == ['Chapter 1 5', '1.1 Intro 6', '1.2 Where to go 9', 'Part 2 30', 'Chapter 2 31']
+
+
+def test_wrapped_and_glued_lines():
+    entries, found = toc_entries(['目录', '第一章总论1', '1.1 A title wrapped', 'over two lines 7', '1.2'])
+    assert entries == ['第一章总论 1', '1.1 A title wrapped over two lines 7']
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+The bookmark server and its client, see src.daemon.
+"""
+
+import threading
+
+import pytest
+
+from pdf.outline_reader import read_outline
+from src.daemon import BookmarkServer, submit
+
+REQUEST = {'id': 1, 'toc': '第1章 绪论 1\n1.1 背景 2\n第2章 方法 4', 'offset': 1, 'levels': ['第1章', '1.1']}
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / 'pdfbookmark.sock')
+    server      = BookmarkServer(socket_path=socket_path, workers=1, token='secret')
+    thread      = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    thread.join(10)
+
+
+def test_bookmark_a_path_and_bytes(server, make_pdf):
+    path = make_pdf(8)
+    result, output = submit(REQUEST, pdf_path=path, socket_path=server, token='secret', timeout=60)
+    assert result['ok'], result['error']
+    assert result['id'] == 1 and output == b''
+    outline = read_outline(result['output'])
+    assert [(outline.title(index), outline.page_num(index), outline.parent(index)) for index in outline] == \
+           [('第1章 绪论', 2, None), ('1.1 背景', 3, 0), ('第2章 方法', 5, None)]
+
+    with open(path, 'rb') as pdf_file:
+        result, output = submit(dict(REQUEST, options={'streaming': True}), pdf_bytes=pdf_file.read(),
+                                socket_path=server, token='secret', timeout=60)
+    assert result['ok'] and result['output'] is None
+    assert read_outline(output).title(2) == '第2章 方法'
+
+    stats, _ = submit({'op': 'stats'}, socket_path=server, token='secret', timeout=60)
+    assert (stats['jobs'], stats['succeeded'], stats['in_flight']) == (2, 2, 0)
+
+
+def test_requests_refused(server, make_pdf):
+    path = make_pdf(8)
+    result, _ = submit(REQUEST, pdf_path=path, socket_path=server, token='wrong', timeout=60)
+    assert not result['ok'] and result['error'].startswith('PermissionError')
+
+    # an option like output could write any file.
+    result, _ = submit(dict(REQUEST, options={'output': '/tmp/x.pdf'}), pdf_path=path, socket_path=server,
+                       token='secret', timeout=60)
+    assert not result['ok'] and 'options not allowed: output' in result['error']
+
+    result, _ = submit(REQUEST, socket_path=server, token='secret', timeout=60)
+    assert not result['ok'] and 'no pdf' in result['error']
+
+
+def test_tcp_server_needs_a_token():
+    with pytest.raises(ValueError):
+        BookmarkServer(address=('127.0.0.1', 0), workers=1)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""
+Merge new bookmarks into the outline of a file, see pdf.merge.
+"""
+
+from pdf.bookmark import add_bookmark
+from pdf.outline_reader import read_outline
+from src.metrics import Metrics
+
+EXISTING = [('Chapter 1', 0, None), ('1.1 Section', 2, 0), ('Chapter 2', 5, None), ('Index', 9, None)]
+
+
+def _entries(outline):
+    return [(outline.title(index), outline.page_num(index), outline.parent(index)) for index in outline]
+
+
+def _merge(path, bookmarks, **options):
+    counts  = {}
+    metrics = Metrics(lambda event: counts.update(event) if event['event'] == 'counters' else None)
+    output  = add_bookmark(path, bookmarks, merge=True, metrics=metrics, **options)
+    return output, counts
+
+
+def test_kept_moved_and_new_bookmarks(make_pdf):
+    path = make_pdf(10, EXISTING)
+    output, counts = _merge(path, {0: {'title': 'Chapter 1', 'page_num': 1},
+                                   1: {'title': '1.1 Section', 'page_num': 4, 'parent': 0},
+                                   2: {'title': '1.2 Section', 'page_num': 5, 'parent': 0},
+                                   3: {'title': 'Chapter 2', 'page_num': 6}})
+
+    assert (counts['bookmarks_kept'], counts['bookmarks_updated'], counts['bookmarks_added']) == (2, 1, 1)
+    assert _entries(read_outline(output)) == [('Chapter 1', 1, None), ('1.1 Section', 4, 0), ('1.2 Section', 5, 0),
+                                              ('Chapter 2', 6, None), ('Index', 10, None)]
+
+
+def test_bookmark_under_another_parent_is_added_there(make_pdf):
+    path = make_pdf(10, EXISTING)
+    output, counts = _merge(path, {0: {'title': 'Chapter 2', 'page_num': 6},
+                                   1: {'title': '1.1 Section', 'page_num': 3, 'parent': 0}}, streaming=True)
+
+    assert (counts['bookmarks_kept'], counts['bookmarks_added']) == (1, 1)
+    # the file keeps its own 1.1 Section under Chapter 1.
+    entries = _entries(read_outline(output))
+    assert ('1.1 Section', 3, 0) in entries
+    assert ('1.1 Section', 3, entries.index(('Chapter 2', 6, None))) in entries
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+The array-backed outline and the parse of the bookmark lines, see src.outline and src.level_classifier.
+"""
+
+from src.bookmark_dict_generator import bookmark_dict_generator, outline_generator
+from src.level_classifier import split_title_page
+from src.outline import MAX_PAGE_NUM, Outline
+from src.parse_cache import parse_text
+
+
+def test_outline_tree():
+    outline = Outline()
+    chapter = outline.append('Chapter 1', 1)
+    outline.append('1.1 Section', 2, parent=chapter)
+    outline.append('Chapter 2', 5)
+    assert list(outline.children(chapter)) == [1]
+    assert outline[1] == {'title': '1.1 Section', 'page_num': 2, 'parent': 0}
+    assert Outline.from_dict(outline.to_dict()).to_dict() == outline.to_dict()
+
+
+def test_big_number_at_the_end_of_a_line_is_clamped():
+    # an ISBN is no page, the arrays must not overflow, the writer clamps it to the last page.
+    assert split_title_page('ISBN 9787111544937') == ('ISBN', MAX_PAGE_NUM)
+    assert split_title_page('Minus -99999999999') == ('Minus', -MAX_PAGE_NUM)
+
+    bookmarks = bookmark_dict_generator(['ISBN 9787111544937', 'Chapter 1 5'], 0)
+    assert [bookmarks[index]['page_num'] for index in (0, 1)] == [MAX_PAGE_NUM, MAX_PAGE_NUM]
+
+    parsed = parse_text(['ISBN 9787111544937', 'Chapter 1 5'])
+    assert list(parsed.nums) == [MAX_PAGE_NUM, 5]
+    outline = parsed.to_outline(4)
+    assert [outline.page_num(0), outline.page_num(1)] == [MAX_PAGE_NUM, MAX_PAGE_NUM]
+    assert outline_generator(['ISBN 9787111544937'], 4).page_num(0) == MAX_PAGE_NUM
+
+
+def test_outline_clamps_appended_pages():
+    outline = Outline()
+    outline.append('big', 2 ** 40)
+    outline.append('small', -2 ** 40)
+    assert [outline.page_num(0), outline.page_num(1)] == [MAX_PAGE_NUM, -MAX_PAGE_NUM]
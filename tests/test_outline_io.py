@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read and write outlines which know their levels, see src.outline_import and src.outline_export.
+"""
+
+import io
+
+import pytest
+
+from src.outline import Outline
+from src.outline_export import FORMATS, outline_stats, write_outline
+from src.outline_import import guess_format, import_outline, read_outline
+
+
+def _outline():
+    outline = Outline()
+    chapter = outline.append('第1章 绪论', 5)
+    outline.append('1.1 "Background", and more', 6, chapter)
+    outline.append('Part without a page', 0)
+    outline.append('第2章 方法', 9)
+    return outline
+
+
+def _entries(outline):
+    return [(outline.title(index), outline.page_num(index), outline.level(index)) for index in outline]
+
+
+@pytest.mark.parametrize('fmt', [fmt for fmt in FORMATS if fmt != 'text'])
+def test_export_reads_back(fmt):
+    stream = io.StringIO()
+    write_outline(_outline(), stream, fmt, pages_offset=4)
+    outline = import_outline(stream.getvalue(), 'json' if fmt == 'jsonl' else fmt, pages_offset=4)
+
+    # an entry without a page keeps the page before it.
+    assert _entries(outline) == [('第1章 绪论', 5, 0), ('1.1 "Background", and more', 6, 1),
+                                 ('Part without a page', 6, 0), ('第2章 方法', 9, 0)]
+
+
+def test_bookmark_text_export():
+    stream = io.StringIO()
+    write_outline(_outline(), stream, 'text', pages_offset=4)
+    assert stream.getvalue().splitlines() == ['第1章 绪论 1', '1.1 "Background", and more 2', 'Part without a page',
+                                              '第2章 方法 5']
+
+
+def test_json_parents_and_children():
+    text = ('[{"id": "a", "title": "A", "page": 1, "children": [{"title": "A.1", "page": 2}]},'
+            ' {"title": "B", "page": 3}, {"title": "A.2", "page": 4, "parent": "a"}]')
+    outline = import_outline(text, 'json')
+    assert [(outline.title(index), outline.parent(index)) for index in outline] == \
+           [('A', None), ('A.1', 0), ('B', None), ('A.2', 0)]
+
+
+def test_pdftk_dump_data():
+    text = '\n'.join(['InfoBegin', 'InfoKey: Title', 'BookmarkBegin', 'BookmarkTitle: &#20013;&#25991;',
+                      'BookmarkLevel: 1', 'BookmarkPageNumber: 3', 'BookmarkBegin', 'BookmarkTitle: Where to Begin',
+                      'BookmarkLevel: 2', 'BookmarkPageNumber: 4', 'PageMediaBegin', 'PageMediaNumber: 1'])
+    assert guess_format(text=text) == 'pdftk'
+    assert _entries(import_outline(text, 'pdftk')) == [('中文', 3, 0), ('Where to Begin', 4, 1)]
+
+
+def test_read_outline_guesses_the_format(tmp_path):
+    path = tmp_path / 'toc.csv'
+    path.write_text('level,title,page\n0,A,1\n1,"A, one",2\n', encoding='utf-8')
+    assert guess_format(str(path)) == 'csv'
+    assert _entries(read_outline(str(path))) == [('A', 1, 0), ('A, one', 2, 1)]
+
+    with pytest.raises(ValueError):
+        import_outline('', 'yaml')
+
+
+def test_outline_stats():
+    stats = outline_stats(_outline(), num_pages=8)
+    assert stats == {'entries': 4, 'depth': 2, 'no_page': 1, 'out_of_range': 1, 'backwards': 0, 'empty_titles': 0}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+The printed page labels, see pdf.page_labels.
+"""
+
+from pdf.page_labels import PageLabels
+
+
+def test_prefix_only_range_is_found():
+    # a cover labelled 'Cover' has no /S, the label is the prefix alone.
+    labels = PageLabels(10)
+    labels.add_range(0, None, 'Cover')
+    labels.add_range(1, '/r')
+    labels.add_range(4, '/D')
+    assert labels.label(0) == 'Cover'
+    assert labels.find('Cover') == 0
+    assert labels.find('ii') == 2
+    assert labels.find('3') == 6
+
+
+def test_labels_both_ways():
+    labels = PageLabels(40)
+    labels.add_range(0, '/r')
+    labels.add_range(6, '/D')
+    labels.add_range(30, '/A', 'A-')
+
+    assert [labels.label(index) for index in (0, 5, 6, 29, 30, 31)] == ['i', 'vi', '1', '24', 'A-A', 'A-B']
+    assert labels.label(40) is None
+    for index in range(40):
+        assert labels.find(labels.label(index)) == index
+    assert labels.find('25') is None
+    assert labels.find('VI') is None
+
+
+def test_front_matter_numbered_from_one():
+    # the body is found before a front matter which is also numbered from 1.
+    labels = PageLabels(20)
+    labels.add_range(0, '/D')
+    labels.add_range(4, '/D')
+    assert labels.find('2') == 5
+    assert labels.find('1') == 4
+
+
+def test_labels_from_a_file(make_pdf):
+    from pdf.pdf import PDF
+
+    with PDF(make_pdf(12, labels=[(0, None, 'Cover'), (1, '/r', ''), (3, '/D', '')])) as pdf:
+        labels = pdf.page_labels
+    assert [labels.label(index) for index in range(4)] == ['Cover', 'i', 'ii', '1']
+    assert labels.find('Cover') == 0
+    assert labels.find('9') == 11
+
+    # a file without labels is numbered from 1.
+    with PDF(make_pdf(3, name='plain.pdf')) as pdf:
+        assert [pdf.page_labels.label(index) for index in range(3)] == ['1', '2', '3']
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+The cache of the parsed bookmark texts, see src.parse_cache.
+"""
+
+from src.bookmark_dict_generator import outline_generator
+from src.parse_cache import ParseCache
+
+TEXT   = '第1章 绪论 1\n1.1 背景 2\n1.2 目标 5\n第2章 方法 9'
+LEVELS = (r'第\d+章', r'\d+\.\d+')
+
+
+def test_offset_does_not_parse_again():
+    cache = ParseCache()
+    assert cache.outline(TEXT, 0, LEVELS).to_dict() == outline_generator(TEXT, 0, level_res=LEVELS, cache=ParseCache()).to_dict()
+
+    shifted = cache.outline(TEXT, 4, LEVELS)
+    assert [shifted.page_num(index) for index in shifted] == [5, 6, 9, 13]
+    assert [shifted.parent(index) for index in shifted] == [None, 0, 0, None]
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_least_recently_used_text_is_dropped():
+    cache = ParseCache(max_entries=2)
+    cache.parse('A 1')
+    cache.parse('B 2')
+    cache.parse('A 1')
+    cache.parse('C 3')
+    assert (cache.misses, cache.hits) == (3, 1)
+
+    cache.parse('A 1')
+    assert cache.hits == 2
+    cache.parse('B 2')
+    assert cache.misses == 4
+
+
+def test_key_changes_with_the_level_settings():
+    key = ParseCache.key(TEXT, LEVELS)
+    assert key == ParseCache.key(TEXT.split('\n'), LEVELS)
+    assert key != ParseCache.key(TEXT, LEVELS[:1])
+    assert key != ParseCache.key(TEXT, LEVELS, other=1)
+    assert key != ParseCache.key(TEXT, LEVELS, labels=True)
+
+    cache = ParseCache()
+    assert cache.parse(TEXT, LEVELS).levels.tolist() == [0, 1, 1, 0]
+    assert cache.parse(TEXT, LEVELS[1:]).levels.tolist() != [0, 1, 1, 0]
+    assert cache.misses == 2
+
+
+def test_parses_are_read_back_from_the_directory(tmp_path):
+    first  = ParseCache(directory=str(tmp_path))
+    parsed = first.parse(TEXT, LEVELS)
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+    second = ParseCache(directory=str(tmp_path))
+    again  = second.parse(TEXT, LEVELS)
+    assert (second.misses, second.hits) == (0, 1)
+    assert again.to_json() == parsed.to_json()
+
+    second.clear(disk=True)
+    assert not list(tmp_path.glob('*.json'))
+    second.parse(TEXT, LEVELS)
+    assert second.misses == 1
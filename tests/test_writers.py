@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+The incremental and streaming writers, see pdf.incremental, pdf.streaming and pdf.bookmark.
+"""
+
+import pytest
+
+from pdf.bookmark import add_bookmark
+from pdf.outline_reader import read_outline
+from pdf.page_tree import load_page, page_references
+from PyPDF4 import PdfFileReader
+
+BOOKMARKS = {0: {'title': 'Chapter 1', 'page_num': 1},
+             1: {'title': '1.1 Section', 'page_num': 3, 'parent': 0},
+             2: {'title': 'Chapter 2', 'page_num': 6}}
+
+
+def _entries(outline):
+    return [(outline.title(index), outline.page_num(index), outline.parent(index)) for index in outline]
+
+
+@pytest.mark.parametrize('mode', ['plain', 'incremental', 'streaming'])
+def test_writers_give_the_same_outline(make_pdf, mode):
+    path   = make_pdf(8)
+    output = add_bookmark(path, BOOKMARKS, incremental=mode == 'incremental', streaming=mode == 'streaming')
+
+    assert output.endswith('book_new.pdf')
+    assert _entries(read_outline(output)) == [('Chapter 1', 1, None), ('1.1 Section', 3, 0), ('Chapter 2', 6, None)]
+    assert PdfFileReader(open(output, 'rb'), strict=False).getNumPages() == 8
+
+
+def test_incremental_update_appends_to_the_original_bytes(make_pdf):
+    path = make_pdf(4)
+    with open(path, 'rb') as pdf_file:
+        original = pdf_file.read()
+
+    data = add_bookmark(path, BOOKMARKS, incremental=True, as_bytes=True)
+    assert data.startswith(original) and len(data) > len(original)
+
+    add_bookmark(path, BOOKMARKS, incremental=True, in_place=True)
+    with open(path, 'rb') as pdf_file:
+        assert pdf_file.read().startswith(original)
+    # a page past the end goes to the last page.
+    assert _entries(read_outline(path))[-1] == ('Chapter 2', 4, None)
+
+
+def test_streaming_reads_from_bytes(make_pdf):
+    with open(make_pdf(6), 'rb') as pdf_file:
+        data = add_bookmark(pdf_file.read(), BOOKMARKS, streaming=True, as_bytes=True)
+    assert [title for title, page, parent in _entries(read_outline(data))] == ['Chapter 1', '1.1 Section', 'Chapter 2']
+
+
+def test_page_references_do_not_flatten_the_tree(make_pdf):
+    reader = PdfFileReader(open(make_pdf(5), 'rb'), strict=False)
+    refs   = page_references(reader)
+    page   = load_page(reader, refs[2])
+
+    assert len(refs) == 5
+    assert reader.flattenedPages is None
+    assert [float(value) for value in page.mediaBox] == [0, 0, 200, 200]